@@ -1,9 +1,49 @@
 from accounts import models
+from .graph import CHILDREN_FIELDS
+from .merge import merge_persons
 from .resources import PersonResource, RelationResource
-from .models import Person, Relation
+from .search import name_prefix_search
+from .models import DuplicateCandidate, Person, PersonDetail, Relation
+from .versioning import get_tree_version
 from import_export.admin import ImportExportModelAdmin
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.admin import SimpleListFilter
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.db.models.functions import Substr
+from django.utils import timezone
+from django.utils.text import Truncator
+
+
+FAMILY_FILTER_CACHE_TIMEOUT = 60 * 60 * 24
+NOTE_PREVIEW_LENGTH = 80
+
+
+class PersonDetailInline(admin.StackedInline):
+    """
+    Inline for the `PersonDetail` of a person: notes, sources, pictures and the legacy Ahnenblatt columns.
+    """
+    model = PersonDetail
+    can_delete = False
+    max_num = 1
+    fieldsets = (
+        ('Notizen und Quellen', {
+            'fields': ('note', 'sour', 'chan_date', 'chan_date_time')
+        }),
+        ('Bilddateien', {
+            'fields': ('obje_file_1', 'obje_titl_1', 'obje_file_2', 'obje_titl_2', 'obje_file_3', 'obje_titl_3',
+                       'obje_file_4', 'obje_titl_4', 'obje_file_5', 'obje_titl_5', 'obje_file_6', 'obje_titl_6'),
+            'classes': ('collapse',),
+        }),
+        ('Ahnenblatt-Familiendaten', {
+            'fields': ('fath_refn', 'fath_name', 'moth_refn', 'moth_name',
+                'marr_spou_refn_1', 'marr_spou_name_1', 'marr_date_1', 'marr_plac_1', 'fam_chil_1', 'fam_stat_1', 'fam_husb_1', 'fam_wife_1', 'fam_marr_1',
+                'marr_spou_refn_2', 'marr_spou_name_2', 'marr_date_2', 'marr_plac_2', 'fam_chil_2', 'fam_stat_2', 'fam_husb_2', 'fam_wife_2', 'fam_marr_2',
+                'marr_spou_refn_3', 'marr_spou_name_3', 'marr_date_3', 'marr_plac_3', 'fam_chil_3', 'fam_stat_3', 'fam_husb_3', 'fam_wife_3', 'fam_marr_3',
+                'marr_spou_refn_4', 'marr_spou_name_4', 'marr_date_4', 'marr_plac_4', 'fam_chil_4', 'fam_stat_4', 'fam_husb_4', 'fam_wife_4', 'fam_marr_4',),
+            'classes': ('collapse',)
+        }),
+    )
 
 
 class PersonAdmin(ImportExportModelAdmin):
@@ -12,28 +52,32 @@ class PersonAdmin(ImportExportModelAdmin):
 
     This class customizes the admin interface by:
     - Displaying specific fields in the list and filter views.
-    - Providing search functionality for `name` and `id`.
+    - Providing search functionality for `name` and `id`, and an indexed name search for autocomplete widgets.
     - Making certain fields read-only.
     - Organizing fields into collapsible sections for better organization.
     - Filtering the queryset based on the user's allowed families, unless the user is a superuser.
     - Restricting delete permissions to superusers only.
     - Customizing the save behavior to include the current user.
+    - Merging two selected persons (superusers only, s. `ancestors.merge`).
 
     **Fieldsets:**
     - `None`: Basic person information.
     - `Geburts- und Sterbedaten`: Birth and death details.
     - `Taufe und Beerdigung`: Baptism and burial details.
-    - `Name und Notizen`: Names and notes.
-    - `Bilddateien`: Image files, collapsible.
+    - `Namen`: Further names.
     - `Vertraulichkeit`: Confidentiality settings.
     - `Metadaten`: Metadata, collapsible.
-    - `Familiendaten`: Family data, collapsible.
+    - `Familiendaten`: The generation statistics, collapsible.
+    - The notes, sources, pictures and legacy family columns of `PersonDetail` as an inline.
     """
     resource_class = PersonResource
-    list_display = ('id', 'name', 'note', 'family_1', 'family_2', 'birt_date', 'deat_date', 'confidential')  # Felder, die in der Listenansicht angezeigt werden
+    list_display = ('id', 'name', 'note_preview', 'family_1', 'family_2', 'birt_date', 'deat_date', 'confidential')  # Felder, die in der Listenansicht angezeigt werden
     list_filter = ('family_1', 'family_2')
     search_fields = ('name', 'id', 'refn')
-    readonly_fields = ('name', 'refn', 'creation_date', 'last_modified_date', 'created_by', 'last_modified_by')
+    readonly_fields = ('name', 'refn', 'creation_date', 'last_modified_date', 'created_by', 'last_modified_by',
+                       'descendant_count', 'ancestor_generations', 'generation_index')
+    actions = ['merge_selected_persons']
+    inlines = [PersonDetailInline]
 
     fieldsets = (
         (None, {
@@ -45,13 +89,8 @@ class PersonAdmin(ImportExportModelAdmin):
         ('Taufe und Beerdigung', {
             'fields': ('chr_date', 'chr_plac', 'chr_addr', 'reli', 'buri_date', 'buri_plac')
         }),
-        ('Name und Notizen', {
-            'fields': ('name_rufname', 'name_npfx', 'note', 'sour', 'name_nick', 'name_marnm')
-        }),
-        ('Bilddateien', {
-            'fields': ('obje_file_1', 'obje_titl_1', 'obje_file_2', 'obje_titl_2', 'obje_file_3', 'obje_titl_3',
-                       'obje_file_4', 'obje_titl_4', 'obje_file_5', 'obje_titl_5', 'obje_file_6', 'obje_titl_6'),
-            'classes': ('collapse',),
+        ('Namen', {
+            'fields': ('name_rufname', 'name_npfx', 'name_nick', 'name_marnm')
         }),
         ('Vertraulichkeit', {
             'fields': ('confidential', 'family_1', 'family_2')
@@ -61,21 +100,14 @@ class PersonAdmin(ImportExportModelAdmin):
             'classes': ('collapse',),  # Optional: macht diesen Abschnitt einklappbar
         }),
         ('Familiendaten', {
-            'fields': ('fath_refn', 'moth_refn', 'marr_spou_name_1', 'marr_spou_refn_1', 'fam_husb_1',
-                'fam_wife_1', 'marr_date_1', 'marr_plac_1', 'fam_chil_1',
-                'fam_marr_1', 'fam_stat_1',
-                'marr_spou_name_2', 'marr_spou_refn_2', 'fam_husb_2', 'fam_wife_2', 'marr_date_2',
-                'marr_plac_2', 'fam_chil_2', 'fam_marr_2', 'fam_stat_2',
-                'marr_spou_name_3', 'marr_spou_refn_3', 'fam_husb_3', 'fam_wife_3', 'marr_date_3',
-                'marr_plac_3', 'fam_chil_3', 'fam_marr_3', 'fam_stat_3',
-                'marr_spou_name_4', 'marr_spou_refn_4', 'fam_husb_4', 'fam_wife_4', 'marr_date_4',
-                'marr_plac_4', 'fam_chil_4', 'fam_marr_4', 'fam_stat_4',),
+            'fields': ('descendant_count', 'ancestor_generations', 'generation_index'),
             'classes': ('collapse',)
         })
     )
 
     def get_queryset(self, request):
-        qs = super().get_queryset(request)
+        # Only the beginning of the notes is read for the changelist
+        qs = super().get_queryset(request).annotate(note_start=Substr('detail__note', 1, NOTE_PREVIEW_LENGTH + 1))
         if request.user.is_superuser:
             return qs
         allowed_families = request.user.allowed_families
@@ -87,39 +119,81 @@ class PersonAdmin(ImportExportModelAdmin):
     def save_model(self, request, obj, form, change):
         obj.save(user=request.user)
 
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Use the indexed name search for the autocomplete widgets (e.g. of the `RelationAdmin`).
+
+        The queryset is already restricted to the editor's family trees by `get_queryset()`.
+        """
+        if request.resolver_match and request.resolver_match.url_name == 'autocomplete' and search_term:
+            return name_prefix_search(queryset, search_term), False
+        return super().get_search_results(request, queryset, search_term)
 
-class Family1Filter(SimpleListFilter):
+    def note_preview(self, obj):
+        return Truncator(obj.note_start or '').chars(NOTE_PREVIEW_LENGTH)
+    note_preview.short_description = 'Notizen'
+
+    def merge_selected_persons(self, request, queryset):
+        """
+        Merge two selected persons; the person with the lower id is kept.
+        """
+        persons = list(queryset.order_by('id')[:3])
+        if len(persons) != 2:
+            self.message_user(request, 'Bitte genau zwei Personen zum Zusammenführen auswählen.', messages.ERROR)
+            return
+        target, source = persons
+        try:
+            merge_persons(target, source)
+        except ValueError as error:
+            self.message_user(request, f'Zusammenführen nicht möglich: {error}', messages.ERROR)
+            return
+        self.message_user(request, f'{source.name} ({source.refn}) wurde mit {target.name} ({target.refn}) zusammengeführt.', messages.SUCCESS)
+    merge_selected_persons.short_description = 'Ausgewählte Personen zusammenführen'
+    merge_selected_persons.allowed_permissions = ('merge',)
+
+    def has_merge_permission(self, request):
+        return request.user.is_superuser
+
+
+class FamilyFilter(SimpleListFilter):
     """
-    Custom filter for the `RelationAdmin` to filter relations by `family_1` of the related person.
+    Base filter for the `RelationAdmin` to filter relations by a family field of the related person.
+
+    The families in use are cached per tree version, so the DISTINCT scan over Person only
+    runs again after a Person or Relation was changed.
     """
-    title = 'Family 1'
-    parameter_name = 'person__family_1'
+    field_name = None
 
     def lookups(self, request, model_admin):
-        families = set(Person.objects.values_list('family_1', flat=True).distinct())
-        return [(family, family) for family in families if family]
+        cache_key = f'ancestors:admin_families:{self.field_name}:{get_tree_version()}'
+        families = cache.get(cache_key)
+        if families is None:
+            families = sorted(family for family in Person.objects.values_list(self.field_name, flat=True).distinct() if family)
+            cache.set(cache_key, families, FAMILY_FILTER_CACHE_TIMEOUT)
+        return [(family, family) for family in families]
 
     def queryset(self, request, queryset):
         if self.value():
-            return queryset.filter(person__family_1=self.value())
+            return queryset.filter(**{f'person__{self.field_name}': self.value()})
         return queryset
 
 
-class Family2Filter(SimpleListFilter):
+class Family1Filter(FamilyFilter):
+    """
+    Custom filter for the `RelationAdmin` to filter relations by `family_1` of the related person.
+    """
+    title = 'Family 1'
+    parameter_name = 'person__family_1'
+    field_name = 'family_1'
+
+
+class Family2Filter(FamilyFilter):
     """
     Custom filter for the `RelationAdmin` to filter relations by `family_2` of the related person.
     """
     title = 'Family 2'
     parameter_name = 'person__family_2'
-
-    def lookups(self, request, model_admin):
-        families = set(Person.objects.values_list('family_2', flat=True).distinct())
-        return [(family, family) for family in families if family]
-
-    def queryset(self, request, queryset):
-        if self.value():
-            return queryset.filter(person__family_2=self.value())
-        return queryset
+    field_name = 'family_2'
 
 
 class RelationAdmin(ImportExportModelAdmin):
@@ -129,8 +203,8 @@ class RelationAdmin(ImportExportModelAdmin):
     This class customizes the admin interface by:
     - Displaying specific fields in the list view.
     - Providing search functionality across related persons and their relations.
-    - Using `raw_id_fields` for foreign key relations to improve performance.
-    - Enabling horizontal filtering for the `children` fields.
+    - Using autocomplete widgets (indexed name search of the `PersonAdmin`) for the persons and children.
+    - Loading the linked persons and children with the page (`list_select_related`, prefetching).
     - Adding custom filters for `family_1` and `family_2` of the related person.
     - Restricting queryset based on the user's allowed families unless the user is a superuser.
     - Displaying children names in a comma-separated list for each marriage.
@@ -143,12 +217,15 @@ class RelationAdmin(ImportExportModelAdmin):
                     'marr_spou_refn_3', 'display_children_3',
                     'marr_spou_refn_4', 'display_children_4')
     search_fields = ('person__name', 'fath_refn__name', 'moth_refn__name', 'marr_spou_refn_1__name', 'marr_spou_refn_2__name', 'marr_spou_refn_3__name', 'marr_spou_refn_4__name')
-    raw_id_fields = ('fath_refn', 'moth_refn', 'marr_spou_refn_1', 'marr_spou_refn_2', 'marr_spou_refn_3', 'marr_spou_refn_4')
-    filter_horizontal = ('children_1', 'children_2', 'children_3', 'children_4')
+    autocomplete_fields = ('person', 'fath_refn', 'moth_refn', 'marr_spou_refn_1', 'marr_spou_refn_2', 'marr_spou_refn_3', 'marr_spou_refn_4',
+                           'children_1', 'children_2', 'children_3', 'children_4')
     list_filter = (Family1Filter, Family2Filter)
+    list_select_related = ('person', 'fath_refn', 'moth_refn', 'marr_spou_refn_1', 'marr_spou_refn_2', 'marr_spou_refn_3', 'marr_spou_refn_4')
 
     def get_queryset(self, request):
-        qs = super().get_queryset(request)
+        qs = super().get_queryset(request).prefetch_related(
+            *(Prefetch(field_name, queryset=Person.objects.only('name')) for field_name in CHILDREN_FIELDS)
+        )
         if request.user.is_superuser:
             return qs
         allowed_families = request.user.allowed_families
@@ -158,6 +235,14 @@ class RelationAdmin(ImportExportModelAdmin):
             person__family_2__in=allowed_families
         )
 
+    def add_success_message(self, result, request):
+        super().add_success_message(result, request)
+        unresolved = getattr(result, 'unresolved_refns', [])
+        if unresolved:
+            messages.warning(request, 'Unbekannte REFN: ' + ', '.join(
+                f'Zeile {row_number} {column}: {refn}' for row_number, column, refn in unresolved[:50]
+            ) + (f' (und {len(unresolved) - 50} weitere)' if len(unresolved) > 50 else ''))
+
     def display_children_1(self, obj):
         return ", ".join([child.name for child in obj.children_1.all()])
     display_children_1.short_description = 'Kinder aus Ehe 1'
@@ -178,5 +263,51 @@ class RelationAdmin(ImportExportModelAdmin):
         return request.user.is_superuser
 
 
+class DuplicateCandidateAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for the review of the `DuplicateCandidate` pairs (found by `manage.py find_duplicates`).
+
+    - Listing the pairs best matches first, filterable by status.
+    - Only the status can be changed; the reviewing user and time are recorded.
+    - Merging the selected pairs (superusers only): person B is merged into person A.
+    """
+    list_display = ('person_a', 'person_b', 'score', 'status', 'created_date', 'reviewed_by')
+    list_filter = ('status',)
+    list_select_related = ('person_a', 'person_b', 'reviewed_by')
+    ordering = ('-score', 'id')
+    readonly_fields = ('person_a', 'person_b', 'score', 'reasons', 'created_date', 'reviewed_date', 'reviewed_by')
+    actions = ['merge_candidates']
+
+    def has_add_permission(self, request):
+        return False
+
+    def save_model(self, request, obj, form, change):
+        obj.reviewed_date = timezone.now()
+        obj.reviewed_by = request.user
+        super().save_model(request, obj, form, change)
+
+    def merge_candidates(self, request, queryset):
+        merged, failed = 0, []
+        for candidate in queryset.select_related('person_a', 'person_b').order_by('-score', 'id'):
+            # An earlier merge of the selection may have removed the pair
+            if not DuplicateCandidate.objects.filter(pk=candidate.pk).exists():
+                continue
+            try:
+                merge_persons(candidate.person_a, candidate.person_b)
+                merged += 1
+            except ValueError as error:
+                failed.append(str(error))
+        if merged:
+            self.message_user(request, f'{merged} Dubletten zusammengeführt.', messages.SUCCESS)
+        if failed:
+            self.message_user(request, 'Nicht zusammengeführt: ' + ' '.join(failed), messages.ERROR)
+    merge_candidates.short_description = 'Als Dubletten zusammenführen'
+    merge_candidates.allowed_permissions = ('merge',)
+
+    def has_merge_permission(self, request):
+        return request.user.is_superuser
+
+
 admin.site.register(Person, PersonAdmin)
 admin.site.register(Relation, RelationAdmin)
+admin.site.register(DuplicateCandidate, DuplicateCandidateAdmin)
@@ -0,0 +1,259 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, Exists, IntegerField, Max, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import CONFIDENTIAL_VALUES, AncestorClosure, Person, Relation
+
+
+STATS_BATCH_SIZE = 500
+
+
+def _load_parents(condition=None):
+    """
+    Load the parent ids per person from the Relation foreign keys.
+
+    Parameters:
+    - condition: Restrict the lookup to the relations matching this Q object (optional,
+      default: all persons).
+
+    Returns:
+    - dict: Maps each person id with a Relation to the list of its parent ids
+    """
+    relations = Relation.objects.all()
+    if condition is not None:
+        relations = relations.filter(condition)
+
+    parents = defaultdict(list)
+    for person_id, father_id, mother_id in relations.values_list('person_id', 'fath_refn_id', 'moth_refn_id'):
+        # Every person with a Relation gets an entry, even without parents
+        person_parents = parents[person_id]
+        for parent_id in (father_id, mother_id):
+            if parent_id and parent_id != person_id and parent_id not in person_parents:
+                person_parents.append(parent_id)
+    return parents
+
+
+def _compute_ancestors(person_ids, parents, known):
+    """
+    Compute the ancestors with their shortest depth for the given persons.
+
+    Parameters:
+    - person_ids: The persons to compute the ancestors for.
+    - parents: A dictionary mapping person ids to their parent ids.
+    - known: A dictionary of already known ancestor maps ({ancestor_id: depth}) per person,
+      used for persons outside of the recomputed part of the tree. It is extended in place.
+
+    Returns:
+    - list: Unsaved AncestorClosure instances for the given persons
+    """
+    def resolve(person_id, visiting):
+        if person_id in known:
+            return known[person_id]
+        visiting.add(person_id)
+        ancestors = {}
+        for parent_id in parents.get(person_id, ()):
+            # A cycle can only come from inconsistent data; the back edge is ignored.
+            if parent_id in visiting:
+                continue
+            candidates = [(parent_id, 1)]
+            candidates += [(ancestor_id, depth + 1) for ancestor_id, depth in resolve(parent_id, visiting).items()]
+            for ancestor_id, depth in candidates:
+                if depth < ancestors.get(ancestor_id, depth + 1):
+                    ancestors[ancestor_id] = depth
+        visiting.discard(person_id)
+        ancestors.pop(person_id, None)
+        known[person_id] = ancestors
+        return ancestors
+
+    rows = []
+    for person_id in person_ids:
+        for ancestor_id, depth in resolve(person_id, set()).items():
+            rows.append(AncestorClosure(ancestor_id=ancestor_id, descendant_id=person_id, depth=depth))
+    return rows
+
+
+def refresh_closure(person_ids):
+    """
+    Recompute the closure rows after the parents of the given persons changed.
+
+    Only the given persons and their descendants are affected by such a change, so
+    only their rows are deleted and rebuilt, based on the unchanged rows of the parents
+    outside of this subtree. Afterwards the generation statistics of the subtree and of the
+    previous and new ancestors of the given persons are updated.
+
+    The subtree and its parents are read in one query (every descendant has a Relation with
+    the parent link that made it a descendant), and the previous ancestors of the given
+    persons are read together with the rows of the parents outside of the subtree, so the
+    refresh costs five queries (plus the batches of larger trees).
+
+    Parameters:
+    - person_ids: The ids of the persons whose parent links changed.
+    """
+    person_ids = set(person_ids)
+    if not person_ids:
+        return
+
+    with transaction.atomic():
+        descendants = AncestorClosure.objects.filter(ancestor_id__in=person_ids).values('descendant_id')
+        parents = _load_parents(Q(person_id__in=person_ids) | Q(person_id__in=descendants))
+        subtree = person_ids | set(parents)
+        outside = {parent_id for parent_ids in parents.values() for parent_id in parent_ids} - subtree
+
+        previous_ancestors = set()
+        known = {person_id: {} for person_id in outside}
+        for ancestor_id, descendant_id, depth in AncestorClosure.objects.filter(
+            descendant_id__in=person_ids | outside
+        ).values_list('ancestor_id', 'descendant_id', 'depth'):
+            if descendant_id in person_ids:
+                previous_ancestors.add(ancestor_id)
+            else:
+                known[descendant_id][ancestor_id] = depth
+        AncestorClosure.objects.filter(descendant_id__in=subtree).delete()
+
+        rows = _compute_ancestors(subtree, parents, known)
+        AncestorClosure.objects.bulk_create(rows, batch_size=1000)
+
+        ancestors = {row.ancestor_id for row in rows if row.descendant_id in person_ids}
+        refresh_generation_stats(subtree | previous_ancestors | ancestors)
+
+
+def rebuild_closure():
+    """
+    Rebuild the complete closure table from the Relation data.
+
+    Returns:
+    - int: The number of created closure rows
+    """
+    with transaction.atomic():
+        AncestorClosure.objects.all().delete()
+        parents = _load_parents()
+        rows = _compute_ancestors(list(parents), parents, {})
+        AncestorClosure.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def get_ancestor_ids(person_id, max_depth=None):
+    """
+    Return the ids of all ancestors of a person.
+
+    Parameters:
+    - person_id: The id of the person.
+    - max_depth: Only return ancestors up to this number of generations (optional).
+
+    Returns:
+    - QuerySet: The ancestor ids
+    """
+    links = AncestorClosure.objects.filter(descendant_id=person_id)
+    if max_depth is not None:
+        links = links.filter(depth__lte=max_depth)
+    return links.values_list('ancestor_id', flat=True)
+
+
+def get_descendant_ids(person_id, max_depth=None):
+    """
+    Return the ids of all descendants of a person.
+
+    Parameters:
+    - person_id: The id of the person.
+    - max_depth: Only return descendants up to this number of generations (optional).
+
+    Returns:
+    - QuerySet: The descendant ids
+    """
+    links = AncestorClosure.objects.filter(ancestor_id=person_id)
+    if max_depth is not None:
+        links = links.filter(depth__lte=max_depth)
+    return links.values_list('descendant_id', flat=True)
+
+
+def is_descendant(descendant_id, ancestor_id):
+    """
+    Return whether a person is a descendant of another person.
+    """
+    return AncestorClosure.objects.filter(ancestor_id=ancestor_id, descendant_id=descendant_id).exists()
+
+
+def _update_generation_stats(persons):
+    """
+    Write the generation statistics of the persons of a queryset from the closure table with
+    one UPDATE, skipping the persons whose stored values are current.
+
+    The values are correlated subqueries on the indexed closure columns; persons without
+    closure rows get 0. The masked sort key `sort_descendants` is written along with the count.
+
+    Returns:
+    - int: The number of updated persons
+    """
+    descendants = AncestorClosure.objects.filter(ancestor_id=OuterRef('pk')).order_by().values('ancestor_id')
+    ancestors = AncestorClosure.objects.filter(descendant_id=OuterRef('pk')).order_by().values('descendant_id')
+    values = {
+        field_name: Coalesce(Subquery(subquery, output_field=IntegerField()), 0)
+        for field_name, subquery in (
+            ('descendant_count', descendants.annotate(value=Count('*')).values('value')),
+            ('ancestor_generations', ancestors.annotate(value=Max('depth')).values('value')),
+            ('generation_index', descendants.annotate(value=Max('depth')).values('value')),
+        )
+    }
+    values['sort_descendants'] = Case(
+        When(confidential__in=CONFIDENTIAL_VALUES, then=Value(0)), default=values['descendant_count']
+    )
+    return persons.exclude(**values).update(**values)
+
+
+def refresh_generation_stats(person_ids):
+    """
+    Update the descendant count, the number of ancestor generations and the number of
+    descendant generations of the given persons from the closure table.
+
+    Called by `refresh_closure` for the persons whose ancestors or descendants changed, i.e.
+    the changed subtree and the ancestor chains above it, not the whole tree. The values are
+    computed and written by the database (one UPDATE per batch), no person is loaded.
+
+    The generations are the largest depths of the closure rows, like in the statistics.
+
+    Parameters:
+    - person_ids: The ids of the persons to update.
+
+    Returns:
+    - int: The number of updated persons
+    """
+    person_ids = sorted({person_id for person_id in person_ids if person_id})
+    return sum(
+        _update_generation_stats(Person.objects.filter(pk__in=person_ids[start:start + STATS_BATCH_SIZE]))
+        for start in range(0, len(person_ids), STATS_BATCH_SIZE)
+    )
+
+
+def rebuild_generation_stats():
+    """
+    Recompute the generation statistics of all persons, e.g. after `rebuild_closure`.
+
+    Returns:
+    - int: The number of updated persons
+    """
+    return _update_generation_stats(Person.objects.all())
+
+
+def expansion_annotations(persons):
+    """
+    Return the annotations of a Person queryset that a tree node needs for its expand arrows.
+
+    Both are correlated subqueries on the indexed closure table, so they are computed in the
+    same query as the persons. Only the neighbours in `persons` are taken into account, so a
+    node is not shown as expandable if none of its parents or children are visible:
+    - has_parents: Whether the person has a parent.
+    - has_children: Whether the person has a child.
+
+    Parameters:
+    - persons: The queryset of the persons that may be counted (e.g. the visible persons).
+
+    Returns:
+    - dict: The annotations for `QuerySet.annotate()`
+    """
+    person_ids = persons.values('id')
+    return {
+        'has_parents': Exists(AncestorClosure.objects.filter(descendant_id=OuterRef('pk'), depth=1, ancestor_id__in=person_ids)),
+        'has_children': Exists(AncestorClosure.objects.filter(ancestor_id=OuterRef('pk'), depth=1, descendant_id__in=person_ids)),
+    }
@@ -0,0 +1,128 @@
+import re
+from collections import namedtuple
+from datetime import date, timedelta
+
+from django.db import models
+
+
+class DateQualifier(models.IntegerChoices):
+    EXACT = 0, 'genau'
+    ABOUT = 1, 'um'
+    CALCULATED = 2, 'errechnet'
+    ESTIMATED = 3, 'ca.'
+    BEFORE = 4, 'vor'
+    AFTER = 5, 'nach'
+    BETWEEN = 6, 'zwischen'
+
+
+DateRange = namedtuple('DateRange', ('earliest', 'latest', 'qualifier'))
+UNKNOWN_DATE_RANGE = DateRange(None, None, None)
+
+# The free-text date fields and their (earliest, latest, qualifier) columns
+DATE_RANGE_FIELDS = {
+    'birt_date': ('birt_earliest', 'birt_latest', 'birt_qualifier'),
+    'deat_date': ('deat_earliest', 'deat_latest', 'deat_qualifier'),
+    'chr_date': ('chr_earliest', 'chr_latest', 'chr_qualifier'),
+    'buri_date': ('buri_earliest', 'buri_latest', 'buri_qualifier'),
+    **{f'marr_date_{slot}': (f'marr_earliest_{slot}', f'marr_latest_{slot}', f'marr_qualifier_{slot}') for slot in (1, 2, 3, 4)},
+}
+# The dates of the person itself (on Person) and of its marriages (on PersonDetail)
+PERSON_DATE_FIELDS = {date_field: DATE_RANGE_FIELDS[date_field] for date_field in ('birt_date', 'deat_date', 'chr_date', 'buri_date')}
+MARRIAGE_DATE_FIELDS = {date_field: DATE_RANGE_FIELDS[date_field] for date_field in DATE_RANGE_FIELDS if date_field not in PERSON_DATE_FIELDS}
+
+QUALIFIER_WORDS = {
+    'um': DateQualifier.ABOUT, 'abt': DateQualifier.ABOUT, 'etwa': DateQualifier.ABOUT,
+    'errechnet': DateQualifier.CALCULATED, 'err': DateQualifier.CALCULATED, 'cal': DateQualifier.CALCULATED,
+    'ca': DateQualifier.ESTIMATED, 'est': DateQualifier.ESTIMATED, 'geschätzt': DateQualifier.ESTIMATED,
+    'vor': DateQualifier.BEFORE, 'bef': DateQualifier.BEFORE,
+    'nach': DateQualifier.AFTER, 'aft': DateQualifier.AFTER,
+}
+MONTHS = {
+    'JAN': 1, 'FEB': 2, 'MAR': 3, 'APR': 4, 'MAY': 5, 'JUN': 6,
+    'JUL': 7, 'AUG': 8, 'SEP': 9, 'OCT': 10, 'NOV': 11, 'DEC': 12,
+}
+RANGE_PATTERN = re.compile(r'^(?:zwischen|bet|von|from)\s+(.+?)\s+(?:und|and|bis|to)\s+(.+)$', re.IGNORECASE)
+GERMAN_DATE_PATTERN = re.compile(r'^(?:(\d{1,2})\.)?(?:(\d{1,2})\.)?(\d{3,4})$')
+GEDCOM_DATE_PATTERN = re.compile(r'^(?:(\d{1,2})\s+)?([A-Za-z]{3})\s+(\d{3,4})$')
+
+
+def _date_part_range(text):
+    """
+    Return the first and last day of a single date ('12.03.1855', '03.1855', '1855',
+    '12 MAR 1855', 'MAR 1855'), or None if the text is no such date.
+    """
+    match = GERMAN_DATE_PATTERN.match(text)
+    if match:
+        day, month, year = match.groups()
+        if day and not month:
+            day, month = None, day
+    else:
+        match = GEDCOM_DATE_PATTERN.match(text)
+        if not match or match[2].upper() not in MONTHS:
+            return None
+        day, month, year = match[1], MONTHS[match[2].upper()], match[3]
+
+    try:
+        year = int(year)
+        if month is None:
+            return date(year, 1, 1), date(year, 12, 31)
+        month = int(month)
+        first_of_month = date(year, month, 1)
+        if day is None:
+            last_of_month = (first_of_month.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+            return first_of_month, last_of_month
+        day = date(year, month, int(day))
+        return day, day
+    except ValueError:
+        return None
+
+
+def parse_genealogical_date(text):
+    """
+    Parse a free-text date into the range of days it may stand for.
+
+    Understands the German notation used in this database and the GEDCOM notation of
+    Ahnenblatt: exact days ('12.03.1855', '12 MAR 1855'), months ('03.1855', 'MAR 1855'),
+    years ('1855'), the qualifiers 'um'/ABT, 'errechnet'/CAL, 'ca.'/EST, 'vor'/BEF and
+    'nach'/AFT, and ranges ('zwischen 1850 und 1855', 'BET 1850 AND 1855', 'FROM ... TO ...').
+    A month or year stands for all its days; 'vor' has no earliest and 'nach' no latest day.
+
+    Parameters:
+    - text: The free-text date.
+
+    Returns:
+    - DateRange: The earliest and latest day as ordinals (`date.toordinal()`) and the
+      DateQualifier, or a range of Nones if the text is empty or not understood
+    """
+    text = ' '.join((text or '').split())
+    if not text:
+        return UNKNOWN_DATE_RANGE
+
+    match = RANGE_PATTERN.match(text)
+    if match:
+        start, end = _date_part_range(match[1]), _date_part_range(match[2])
+        if start is None or end is None or start[0] > end[1]:
+            return UNKNOWN_DATE_RANGE
+        return DateRange(start[0].toordinal(), end[1].toordinal(), DateQualifier.BETWEEN)
+
+    qualifier = DateQualifier.EXACT
+    word, _, rest = text.partition(' ')
+    if word.lower().rstrip('.') in QUALIFIER_WORDS and rest:
+        qualifier, text = QUALIFIER_WORDS[word.lower().rstrip('.')], rest
+
+    days = _date_part_range(text)
+    if days is None:
+        return UNKNOWN_DATE_RANGE
+    earliest, latest = days[0].toordinal(), days[1].toordinal()
+    if qualifier == DateQualifier.BEFORE:
+        return DateRange(None, earliest - 1, qualifier)
+    if qualifier == DateQualifier.AFTER:
+        return DateRange(latest + 1, None, qualifier)
+    return DateRange(earliest, latest, qualifier)
+
+
+def year_range(year):
+    """
+    Return the ordinals of the first and last day of a year.
+    """
+    return date(year, 1, 1).toordinal(), date(year, 12, 31).toordinal()
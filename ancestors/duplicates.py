@@ -0,0 +1,214 @@
+from collections import defaultdict, namedtuple
+from datetime import date
+
+from django.db import transaction
+
+from .models import DuplicateCandidate, Person, Relation
+
+
+MIN_SCORE = 0.6
+BUCKET_YEARS = 5
+# Births known less precisely than this are treated as unknown for the blocking
+MAX_BUCKET_RANGE_DAYS = 3 * 366
+
+WEIGHTS = {
+    'given_name': 0.3,
+    'surname': 0.1,
+    'birth': 0.25,
+    'death': 0.15,
+    'birth_place': 0.05,
+    'death_place': 0.05,
+    'parents': 0.2,
+}
+PENALTIES = {
+    'birth': -0.4,
+    'death': -0.3,
+    'parents': -0.3,
+}
+
+PERSON_FIELDS = (
+    'id', 'sex', 'surn', 'givn', 'surn_phonetic', 'givn_phonetic',
+    'birt_earliest', 'birt_latest', 'deat_earliest', 'deat_latest', 'birt_plac', 'deat_plac',
+)
+PersonRow = namedtuple('PersonRow', PERSON_FIELDS + ('parents',))
+
+
+def _normalized(text):
+    return ' '.join((text or '').lower().split())
+
+
+def _birth_bucket(person):
+    if person.birt_earliest is None or person.birt_latest is None:
+        return None
+    if person.birt_latest - person.birt_earliest > MAX_BUCKET_RANGE_DAYS:
+        return None
+    return date.fromordinal((person.birt_earliest + person.birt_latest) // 2).year // BUCKET_YEARS
+
+
+def _ranges_overlap(earliest_a, latest_a, earliest_b, latest_b):
+    """
+    Return True/False whether two day ranges overlap, or None if one of them is unknown.
+    """
+    if (earliest_a is None and latest_a is None) or (earliest_b is None and latest_b is None):
+        return None
+    if earliest_a is not None and latest_b is not None and earliest_a > latest_b:
+        return False
+    if earliest_b is not None and latest_a is not None and earliest_b > latest_a:
+        return False
+    return True
+
+
+def score_pair(a, b):
+    """
+    Compare two persons and return how likely they are the same person.
+
+    Matching given names, surnames, overlapping birth and death ranges, equal places and
+    shared parents add to the score; birth or death ranges that cannot overlap and different
+    known parents subtract from it. Persons of different sex never match.
+
+    Parameters:
+    - a, b: The PersonRow tuples to compare.
+
+    Returns:
+    - tuple: The score between 0 and 1 and a dictionary of the contributions per property
+    """
+    if a.sex in ('M', 'F') and b.sex in ('M', 'F') and a.sex != b.sex:
+        return 0.0, {}
+
+    reasons = {}
+    given_a, given_b = _normalized(a.givn), _normalized(b.givn)
+    if given_a and given_a == given_b:
+        reasons['given_name'] = WEIGHTS['given_name']
+    elif a.givn_phonetic and a.givn_phonetic == b.givn_phonetic:
+        reasons['given_name'] = WEIGHTS['given_name'] * 0.8
+    elif given_a and given_b and (given_a.split()[0] == given_b.split()[0]):
+        reasons['given_name'] = WEIGHTS['given_name'] * 0.6
+
+    if _normalized(a.surn) == _normalized(b.surn):
+        reasons['surname'] = WEIGHTS['surname']
+    elif a.surn_phonetic == b.surn_phonetic:
+        reasons['surname'] = WEIGHTS['surname'] * 0.5
+
+    for key, prefix in (('birth', 'birt'), ('death', 'deat')):
+        overlap = _ranges_overlap(getattr(a, f'{prefix}_earliest'), getattr(a, f'{prefix}_latest'),
+                                  getattr(b, f'{prefix}_earliest'), getattr(b, f'{prefix}_latest'))
+        if overlap is not None:
+            reasons[key] = WEIGHTS[key] if overlap else PENALTIES[key]
+
+    for key, field_name in (('birth_place', 'birt_plac'), ('death_place', 'deat_plac')):
+        place_a, place_b = _normalized(getattr(a, field_name)), _normalized(getattr(b, field_name))
+        if place_a and place_a == place_b:
+            reasons[key] = WEIGHTS[key]
+
+    parents_a, parents_b = set(a.parents) - {None}, set(b.parents) - {None}
+    if parents_a & parents_b:
+        reasons['parents'] = WEIGHTS['parents']
+    elif parents_a and parents_b:
+        reasons['parents'] = PENALTIES['parents']
+
+    score = min(max(sum(reasons.values()), 0.0), 1.0)
+    return round(score, 3), {key: round(value, 3) for key, value in reasons.items()}
+
+
+def load_person_rows(queryset=None):
+    """
+    Load the compared properties of the persons as PersonRow tuples, with two queries.
+    """
+    queryset = Person.objects.all() if queryset is None else queryset
+    parents = {
+        person_id: (father_id, mother_id)
+        for person_id, father_id, mother_id in Relation.objects.values_list('person_id', 'fath_refn_id', 'moth_refn_id')
+    }
+    return [PersonRow(*row, parents.get(row[0], (None, None))) for row in queryset.values_list(*PERSON_FIELDS).iterator(chunk_size=2000)]
+
+
+def candidate_pairs(rows):
+    """
+    Yield the pairs of persons that are compared at all (the blocking).
+
+    Persons are grouped by the phonetic code of their surname and a five-year bucket of their
+    birth; a person is compared with the persons of its own and the following bucket.
+    Persons without a usable birth date are compared with all persons of the same phonetic
+    surname and given name. So each person is only compared with a few others and the number
+    of comparisons grows about linearly with the number of persons.
+
+    Parameters:
+    - rows: The PersonRow tuples.
+
+    Yields:
+    - tuple: Two PersonRow tuples, the one with the lower id first
+    """
+    by_bucket = defaultdict(list)
+    by_name = defaultdict(list)
+    undated = []
+    for row in rows:
+        if not row.surn_phonetic:
+            continue
+        bucket = _birth_bucket(row)
+        by_name[(row.surn_phonetic, row.givn_phonetic)].append(row)
+        if bucket is None:
+            undated.append(row)
+        else:
+            by_bucket[(row.surn_phonetic, bucket)].append(row)
+
+    for (surname, bucket), block in by_bucket.items():
+        following = by_bucket.get((surname, bucket + 1), [])
+        for index, a in enumerate(block):
+            for b in block[index + 1:] + following:
+                yield (a, b) if a.id < b.id else (b, a)
+
+    for a in undated:
+        for b in by_name[(a.surn_phonetic, a.givn_phonetic)]:
+            # Pairs of two undated persons are only yielded once
+            if b.id != a.id and (_birth_bucket(b) is not None or a.id < b.id):
+                yield (a, b) if a.id < b.id else (b, a)
+
+
+def find_duplicates(queryset=None, min_score=MIN_SCORE):
+    """
+    Find the pairs of persons that are probably the same person.
+
+    Parameters:
+    - queryset: The persons to check (optional, default: all persons).
+    - min_score: The minimum score of a reported pair.
+
+    Returns:
+    - list: (person_a_id, person_b_id, score, reasons) tuples, best matches first
+    """
+    found = []
+    for a, b in candidate_pairs(load_person_rows(queryset)):
+        score, reasons = score_pair(a, b)
+        if score >= min_score:
+            found.append((a.id, b.id, score, reasons))
+    found.sort(key=lambda pair: (-pair[2], pair[0], pair[1]))
+    return found
+
+
+def detect_duplicates(min_score=MIN_SCORE):
+    """
+    Find the probable duplicates among all persons and store them as DuplicateCandidate rows
+    for the review.
+
+    Open candidates are updated or removed if they are no longer found; reviewed candidates
+    (confirmed or rejected) are kept unchanged.
+
+    Returns:
+    - dict: The numbers of found, new and removed candidates
+    """
+    found = find_duplicates(min_score=min_score)
+    with transaction.atomic():
+        existing = {(candidate.person_a_id, candidate.person_b_id): candidate for candidate in DuplicateCandidate.objects.all()}
+        new, changed = [], []
+        for person_a_id, person_b_id, score, reasons in found:
+            candidate = existing.pop((person_a_id, person_b_id), None)
+            if candidate is None:
+                new.append(DuplicateCandidate(person_a_id=person_a_id, person_b_id=person_b_id, score=score, reasons=reasons))
+            elif candidate.status == DuplicateCandidate.OPEN:
+                candidate.score, candidate.reasons = score, reasons
+                changed.append(candidate)
+        DuplicateCandidate.objects.bulk_create(new, batch_size=500)
+        DuplicateCandidate.objects.bulk_update(changed, ['score', 'reasons'], batch_size=500)
+
+        stale = [candidate.pk for candidate in existing.values() if candidate.status == DuplicateCandidate.OPEN]
+        DuplicateCandidate.objects.filter(pk__in=stale).delete()
+    return {'found': len(found), 'new': len(new), 'removed': len(stale)}
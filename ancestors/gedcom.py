@@ -0,0 +1,688 @@
+import re
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .closure import rebuild_closure, rebuild_generation_stats
+from .dates import MARRIAGE_DATE_FIELDS, PERSON_DATE_FIELDS, parse_genealogical_date
+from .graph import CHILDREN_FIELDS
+from .models import REFN_PATTERN, SORT_KEY_FIELDS, Person, PersonDetail, RefnSequence, Relation
+from .search import index_persons
+from .unions import rebuild_unions
+from .versioning import bump_tree_version
+
+
+LINE_PATTERN = re.compile(r'^(\d+)\s+(?:(@[^@\s]+@)\s+)?(\S+)(?:\s(.*))?$')
+MONTHS = ('JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC')
+DATE_QUALIFIERS = {'ABT': 'um', 'CAL': 'errechnet', 'EST': 'ca.', 'BEF': 'vor', 'AFT': 'nach'}
+
+SLOTS = (1, 2, 3, 4)
+QUERY_CHUNK_SIZE = 500
+
+# Person and PersonDetail columns written from the INDI records
+PERSON_IMPORT_FIELDS = (
+    'uid', 'surn', 'givn', 'name_npfx', 'name_nick', 'name_rufname', 'name_marnm', 'sex', 'occu', 'reli',
+    'birt_date', 'birt_plac', 'deat_date', 'deat_plac', 'chr_date', 'chr_plac', 'chr_addr',
+    'buri_date', 'buri_plac',
+)
+DETAIL_IMPORT_FIELDS = ('note', 'sour', 'chan_date', 'chan_date_time')
+PERSON_DERIVED_FIELDS = (
+    'name', 'birth_date_formatted', 'death_date_formatted', 'surn_phonetic', 'givn_phonetic', 'name_marnm_phonetic',
+) + tuple(field_name for fields in PERSON_DATE_FIELDS.values() for field_name in fields) + SORT_KEY_FIELDS
+# PersonDetail columns that mirror the families as refn strings and names
+DETAIL_LINK_FIELDS = ('fath_refn', 'moth_refn', 'fath_name', 'moth_name') + tuple(
+    f'{name}_{slot}' for slot in SLOTS for name in ('marr_spou_refn', 'marr_spou_name', 'marr_date', 'marr_plac', 'fam_chil')
+) + tuple(field_name for fields in MARRIAGE_DATE_FIELDS.values() for field_name in fields)
+RELATION_FIELDS = ('fath_refn', 'moth_refn') + tuple(
+    f'{name}_{slot}' for slot in SLOTS for name in ('marr_spou_refn', 'marr_date', 'marr_plac', 'fam_stat')
+)
+EVENTS = (('BIRT', 'birt'), ('DEAT', 'deat'), ('CHR', 'chr'), ('BURI', 'buri'))
+
+
+class GedcomError(ValueError):
+    """
+    Raised for lines that are not valid GEDCOM.
+    """
+
+
+class GedcomNode:
+    """
+    A GEDCOM line with its subordinate lines.
+
+    Attributes:
+    - tag: The tag, e.g. 'INDI' or 'BIRT'.
+    - value: The line value; CONT/CONC lines are already joined into it.
+    - xref: The cross-reference id of a record, e.g. '@I12@' (level 0 only).
+    - children: The subordinate nodes.
+    """
+    __slots__ = ('tag', 'value', 'xref', 'children')
+
+    def __init__(self, tag, value='', xref=None):
+        self.tag = tag
+        self.value = value
+        self.xref = xref
+        self.children = []
+
+    def first(self, tag):
+        """Return the first subordinate node with the given tag, or None."""
+        return next((child for child in self.children if child.tag == tag), None)
+
+    def all(self, tag):
+        """Return all subordinate nodes with the given tag."""
+        return [child for child in self.children if child.tag == tag]
+
+    def value_of(self, *path):
+        """Return the value at the given tag path (e.g. 'BIRT', 'DATE'), or None."""
+        node = self
+        for tag in path:
+            node = node.first(tag)
+            if node is None:
+                return None
+        return node.value or None
+
+
+def parse_gedcom(lines):
+    """
+    Parse GEDCOM lines into records, one level-0 record at a time.
+
+    Only the current record is kept in memory, so files of any size can be read as a stream.
+
+    Parameters:
+    - lines: An iterable of text lines, e.g. an open file.
+
+    Returns:
+    - generator: The GedcomNode of every level-0 record (HEAD, INDI, FAM, ..., TRLR)
+    """
+    record = None
+    stack = []
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip('\ufeff\r\n')
+        if not line.strip():
+            continue
+        match = LINE_PATTERN.match(line.lstrip())
+        if not match:
+            raise GedcomError(f'Line {line_number}: invalid GEDCOM line')
+        level, xref, tag, value = int(match[1]), match[2], match[3], match[4] or ''
+
+        if tag in ('CONT', 'CONC'):
+            if not 0 < level <= len(stack):
+                raise GedcomError(f'Line {line_number}: {tag} without a parent line')
+            parent = stack[level - 1]
+            parent.value += ('\n' if tag == 'CONT' else '') + value
+            continue
+
+        node = GedcomNode(tag, value, xref)
+        if level == 0:
+            if record is not None:
+                yield record
+            record = node
+            stack = [node]
+            continue
+        if record is None or level > len(stack):
+            raise GedcomError(f'Line {line_number}: level {level} does not follow its parent')
+        del stack[level:]
+        stack[-1].children.append(node)
+        stack.append(node)
+
+    if record is not None:
+        yield record
+
+
+def _date_part_to_text(text):
+    tokens = text.split()
+    upper = [token.upper() for token in tokens]
+    if len(tokens) == 3 and tokens[0].isdigit() and upper[1] in MONTHS and tokens[2].isdigit():
+        return f'{int(tokens[0]):02d}.{MONTHS.index(upper[1]) + 1:02d}.{tokens[2]}'
+    if len(tokens) == 2 and upper[0] in MONTHS and tokens[1].isdigit():
+        return f'{MONTHS.index(upper[0]) + 1:02d}.{tokens[1]}'
+    return text
+
+
+def gedcom_date_to_text(value):
+    """
+    Convert a GEDCOM date into the German notation used by Ahnenblatt and this database.
+
+    Examples: '12 MAR 1855' -> '12.03.1855', 'ABT 1855' -> 'um 1855',
+    'BET 1850 AND 1855' -> 'zwischen 1850 und 1855'. Anything else is kept as it is.
+
+    Parameters:
+    - value: The GEDCOM date (may be None).
+
+    Returns:
+    - string or None: The date text
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.startswith('(') and value.endswith(')'):
+        return value[1:-1]
+
+    for pattern, words in ((r'BET (.+) AND (.+)', ('zwischen', 'und')), (r'FROM (.+) TO (.+)', ('von', 'bis'))):
+        match = re.fullmatch(pattern, value, re.IGNORECASE)
+        if match:
+            return f'{words[0]} {_date_part_to_text(match[1])} {words[1]} {_date_part_to_text(match[2])}'
+
+    qualifier, _, rest = value.partition(' ')
+    if qualifier.upper() in DATE_QUALIFIERS and rest:
+        return f'{DATE_QUALIFIERS[qualifier.upper()]} {_date_part_to_text(rest)}'
+    return _date_part_to_text(value)
+
+
+def _split_name(value):
+    """Split a GEDCOM name 'Johann Peter /Kempe/' into given name and surname."""
+    given, _, rest = value.partition('/')
+    surname = rest.split('/')[0]
+    return given.strip() or None, surname.strip() or None
+
+
+def person_values(record):
+    """
+    Return the Person column values of an INDI record.
+
+    Parameters:
+    - record: The GedcomNode of the INDI record.
+
+    Returns:
+    - dict: The values of all PERSON_IMPORT_FIELDS and DETAIL_IMPORT_FIELDS (None for missing data)
+    """
+    values = dict.fromkeys(PERSON_IMPORT_FIELDS + DETAIL_IMPORT_FIELDS)
+    name = record.first('NAME')
+    if name is not None:
+        given, surname = _split_name(name.value)
+        values['givn'] = name.value_of('GIVN') or given
+        values['surn'] = name.value_of('SURN') or surname
+        values['name_npfx'] = name.value_of('NPFX')
+        values['name_nick'] = name.value_of('NICK')
+        values['name_rufname'] = name.value_of('_RUFNAME')
+        values['name_marnm'] = name.value_of('_MARNM')
+
+    sex = (record.value_of('SEX') or '').upper()
+    values['sex'] = sex if sex in ('M', 'F') else 'D'
+    for tag, prefix in EVENTS:
+        values[f'{prefix}_date'] = gedcom_date_to_text(record.value_of(tag, 'DATE'))
+        values[f'{prefix}_plac'] = record.value_of(tag, 'PLAC')
+    values['chr_addr'] = record.value_of('CHR', 'ADDR')
+
+    values['uid'] = record.value_of('_UID')
+    values['occu'] = record.value_of('OCCU')
+    values['reli'] = record.value_of('RELI')
+    values['note'] = '\n'.join(node.value for node in record.all('NOTE') if node.value) or None
+    values['sour'] = '\n'.join(node.value for node in record.all('SOUR') if node.value) or None
+    values['chan_date'] = record.value_of('CHAN', 'DATE')
+    values['chan_date_time'] = record.value_of('CHAN', 'DATE', 'TIME')
+    return values
+
+
+def family_values(record):
+    """
+    Return the links and marriage data of a FAM record.
+
+    Returns:
+    - dict: husb, wife (xrefs or None), children (list of xrefs), date, place and status
+    """
+    status = None
+    if record.first('DIV') is not None:
+        status = 'divorced'
+    elif record.first('MARR') is not None:
+        status = 'married'
+    return {
+        'husb': record.value_of('HUSB'),
+        'wife': record.value_of('WIFE'),
+        'children': [node.value for node in record.all('CHIL') if node.value],
+        'date': gedcom_date_to_text(record.value_of('MARR', 'DATE')),
+        'place': record.value_of('MARR', 'PLAC'),
+        'status': status,
+    }
+
+
+def _chunks(values, size=QUERY_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def write_details(values, field_names, batch_size=500):
+    """
+    Write PersonDetail values of many persons with one bulk insert and one bulk update.
+
+    Detail rows are only created for persons with at least one value.
+
+    Parameters:
+    - values: Maps person ids to dictionaries of the `field_names` values.
+    - field_names: The written PersonDetail fields.
+    - batch_size: The number of rows per query.
+    """
+    existing = {}
+    for chunk in _chunks(values):
+        existing.update(PersonDetail.objects.in_bulk(chunk))
+    new_details, changed_details = [], []
+    for person_id, person_values in values.items():
+        detail = existing.get(person_id)
+        if detail is None:
+            if any(person_values.values()):
+                new_details.append(PersonDetail(person_id=person_id, **person_values))
+            continue
+        for field_name, value in person_values.items():
+            setattr(detail, field_name, value)
+        changed_details.append(detail)
+    PersonDetail.objects.bulk_create(new_details, batch_size=batch_size)
+    PersonDetail.objects.bulk_update(changed_details, field_names, batch_size=batch_size)
+
+
+class GedcomImporter:
+    """
+    Imports the persons and families of a GEDCOM file into Person and Relation.
+
+    Pass one streams the records: INDI records are written in batches with `bulk_create`
+    (new refns) and `bulk_update` (existing refns), keyed by their xref ('@I12@'), which is
+    the refn; the notes, sources and change dates go into `PersonDetail` with
+    `write_details()`. Of FAM records only the links are kept. Pass two resolves FAMC/FAMS/HUSB/WIFE/CHIL
+    through the in-memory refn -> id map into the Relation foreign keys and children lists and
+    the refn columns of the person details. Finally the ancestor closure, the generation
+    statistics, the unions and the search index are rebuilt. No save signals are sent; the
+    import runs in one transaction.
+
+    The xref of a person's first FAMC record gives the parents, the first four FAMS records
+    give the marriages 1 to 4. Images (OBJE) and shared NOTE/SOUR records are not imported.
+    """
+
+    def __init__(self, family, batch_size=500):
+        """
+        Parameters:
+        - family: The family tree (family_1) for new persons.
+        - batch_size: The number of persons written per batch.
+        """
+        self.family = family
+        self.batch_size = batch_size
+        self.ids = {}
+        self.names = {}
+        self.links = {}
+        self.families = {}
+        self.stats = {'persons_created': 0, 'persons_updated': 0, 'relations': 0, 'families': 0, 'ignored_marriages': 0}
+
+    def run(self, records):
+        """
+        Import the records.
+
+        Parameters:
+        - records: An iterable of GedcomNode records, e.g. from `parse_gedcom()`.
+
+        Returns:
+        - dict: The numbers of created and updated persons, written relations, families and
+          marriages beyond the fourth that were ignored
+        """
+        with transaction.atomic():
+            batch = []
+            for record in records:
+                if record.tag == 'INDI' and record.xref:
+                    batch.append(record)
+                    if len(batch) >= self.batch_size:
+                        self._write_persons(batch)
+                        batch = []
+                elif record.tag == 'FAM' and record.xref:
+                    self.families[record.xref] = family_values(record)
+            self._write_persons(batch)
+            self.stats['families'] = len(self.families)
+
+            self._write_relations()
+
+            numbers = [int(match[1]) for match in map(REFN_PATTERN.match, self.ids) if match]
+            if numbers:
+                RefnSequence.advance_past(f'@I{max(numbers)}@')
+            rebuild_closure()
+            rebuild_generation_stats()
+            rebuild_unions()
+            index_persons(self.ids.values())
+            bump_tree_version()
+        return self.stats
+
+    def _write_persons(self, records):
+        if not records:
+            return
+        values = {record.xref: person_values(record) for record in records}
+        existing = Person.objects.in_bulk(list(values), field_name='refn')
+
+        new_persons, changed_persons = [], []
+        now = timezone.now()
+        for record in records:
+            person = existing.get(record.xref) or Person(refn=record.xref, family_1=self.family)
+            for field_name in PERSON_IMPORT_FIELDS:
+                setattr(person, field_name, values[record.xref][field_name])
+            person.update_derived_fields()
+            if person.pk:
+                person.last_modified_date = now
+                changed_persons.append(person)
+            else:
+                new_persons.append(person)
+            self.links[record.xref] = (
+                [node.value for node in record.all('FAMS') if node.value],
+                [node.value for node in record.all('FAMC') if node.value],
+            )
+
+        Person.objects.bulk_create(new_persons)
+        Person.objects.bulk_update(changed_persons, PERSON_IMPORT_FIELDS + PERSON_DERIVED_FIELDS + ('last_modified_date',))
+        for person in new_persons + changed_persons:
+            self.ids[person.refn] = person.pk
+            self.names[person.refn] = person.name
+        write_details(
+            {person.pk: {field_name: values[person.refn][field_name] for field_name in DETAIL_IMPORT_FIELDS} for person in new_persons + changed_persons},
+            DETAIL_IMPORT_FIELDS, self.batch_size
+        )
+        self.stats['persons_created'] += len(new_persons)
+        self.stats['persons_updated'] += len(changed_persons)
+
+    def _write_relations(self):
+        existing = {}
+        for chunk in _chunks(self.ids.values()):
+            # A person should only have one Relation; if there are more, the oldest one is used
+            for relation in Relation.objects.filter(person_id__in=chunk).order_by('-id'):
+                existing[relation.person_id] = relation
+
+        relations, details, children = [], {}, {}
+        for refn, (spouse_families, parent_families) in self.links.items():
+            person_id = self.ids[refn]
+            relation = existing.get(person_id) or Relation(person_id=person_id)
+            detail = details[person_id] = {}
+
+            parents = self.families.get(parent_families[0]) if parent_families else None
+            for field_name, parent_refn in (('fath', parents and parents['husb']), ('moth', parents and parents['wife'])):
+                parent_id = self.ids.get(parent_refn)
+                setattr(relation, f'{field_name}_refn_id', parent_id)
+                detail[f'{field_name}_refn'] = parent_refn if parent_id else None
+                detail[f'{field_name}_name'] = self.names.get(parent_refn) if parent_id else None
+
+            self.stats['ignored_marriages'] += max(len(spouse_families) - len(SLOTS), 0)
+            for slot in SLOTS:
+                marriage = self.families.get(spouse_families[slot - 1]) if slot <= len(spouse_families) else None
+                marriage = marriage or {'husb': None, 'wife': None, 'children': [], 'date': None, 'place': None, 'status': None}
+                spouse_refn = marriage['wife'] if marriage['husb'] == refn else marriage['husb']
+                spouse_id = self.ids.get(spouse_refn)
+                child_refns = [child for child in marriage['children'] if child in self.ids]
+
+                setattr(relation, f'marr_spou_refn_{slot}_id', spouse_id)
+                setattr(relation, f'marr_date_{slot}', marriage['date'])
+                setattr(relation, f'marr_plac_{slot}', marriage['place'])
+                setattr(relation, f'fam_stat_{slot}', marriage['status'])
+                children[(person_id, slot)] = [self.ids[child] for child in child_refns]
+
+                detail[f'marr_spou_refn_{slot}'] = spouse_refn if spouse_id else None
+                detail[f'marr_spou_name_{slot}'] = self.names.get(spouse_refn) if spouse_id else None
+                detail[f'marr_date_{slot}'] = marriage['date']
+                detail.update(zip(MARRIAGE_DATE_FIELDS[f'marr_date_{slot}'], parse_genealogical_date(marriage['date'])))
+                detail[f'marr_plac_{slot}'] = marriage['place']
+                detail[f'fam_chil_{slot}'] = ','.join(child_refns) or None
+
+            relations.append(relation)
+
+        Relation.objects.bulk_update([relation for relation in relations if relation.pk], RELATION_FIELDS, batch_size=self.batch_size)
+        Relation.objects.bulk_create([relation for relation in relations if not relation.pk], batch_size=self.batch_size)
+        write_details(details, DETAIL_LINK_FIELDS, self.batch_size)
+
+        relation_of_person = {relation.person_id: relation.pk for relation in relations}
+        for slot, field_name in zip(SLOTS, CHILDREN_FIELDS):
+            through = getattr(Relation, field_name).through
+            for chunk in _chunks(relation_of_person.values()):
+                through.objects.filter(relation_id__in=chunk).delete()
+            rows = defaultdict(list)
+            for (person_id, child_slot), child_ids in children.items():
+                if child_slot == slot:
+                    rows[relation_of_person[person_id]].extend(child_ids)
+            through.objects.bulk_create(
+                [through(relation_id=relation_id, person_id=child_id) for relation_id, child_ids in rows.items() for child_id in dict.fromkeys(child_ids)],
+                batch_size=self.batch_size
+            )
+        self.stats['relations'] = len(relations)
+
+
+XREF_PATTERN = re.compile(r'^@[^@\s]+@$')
+MAX_LINE_VALUE = 200
+TEXT_QUALIFIERS = {word: qualifier for qualifier, word in DATE_QUALIFIERS.items()}
+EXPORT_CHUNK_SIZE = 500
+
+
+def _date_part_to_gedcom(text):
+    parts = text.split('.')
+    if len(parts) == 3 and all(part.isdigit() for part in parts) and 1 <= int(parts[1]) <= 12:
+        return f'{int(parts[0])} {MONTHS[int(parts[1]) - 1]} {parts[2]}'
+    if len(parts) == 2 and all(part.isdigit() for part in parts) and 1 <= int(parts[0]) <= 12:
+        return f'{MONTHS[int(parts[0]) - 1]} {parts[1]}'
+    if text.isdigit():
+        return text
+    return None
+
+
+def text_to_gedcom_date(text):
+    """
+    Convert a date in the German notation of this database into a GEDCOM date.
+
+    The reverse of `gedcom_date_to_text()`: '12.03.1855' -> '12 MAR 1855', 'um 1855' -> 'ABT 1855',
+    'zwischen 1850 und 1855' -> 'BET 1850 AND 1855'. Other texts become a date phrase '(...)'.
+
+    Parameters:
+    - text: The date text (may be None).
+
+    Returns:
+    - string or None: The GEDCOM date
+    """
+    if not text or not text.strip():
+        return None
+    text = text.strip()
+
+    for pattern, words in ((r'zwischen (.+) und (.+)', ('BET', 'AND')), (r'von (.+) bis (.+)', ('FROM', 'TO'))):
+        match = re.fullmatch(pattern, text, re.IGNORECASE)
+        if match:
+            first, second = _date_part_to_gedcom(match[1]), _date_part_to_gedcom(match[2])
+            if first and second:
+                return f'{words[0]} {first} {words[1]} {second}'
+
+    word, _, rest = text.partition(' ')
+    if word.lower() in TEXT_QUALIFIERS and rest and _date_part_to_gedcom(rest):
+        return f'{TEXT_QUALIFIERS[word.lower()]} {_date_part_to_gedcom(rest)}'
+    return _date_part_to_gedcom(text) or f'({text})'
+
+
+def gedcom_lines(level, tag, value=None, xref=None):
+    """
+    Return the GEDCOM lines of a value, split into CONT lines at line breaks and CONC lines for long lines.
+
+    Returns:
+    - list: The lines including the line break
+    """
+    head = f'{level} {xref} {tag}' if xref else f'{level} {tag}'
+    if value is None or value == '':
+        return [head + '\n']
+
+    lines = []
+    for index, text in enumerate(str(value).replace('\r\n', '\n').split('\n')):
+        pieces = []
+        while len(text) > MAX_LINE_VALUE:
+            # Never split next to a space, as some programs strip trailing spaces
+            cut = MAX_LINE_VALUE
+            while cut > 1 and (text[cut - 1] == ' ' or text[cut] == ' '):
+                cut -= 1
+            pieces.append(text[:cut])
+            text = text[cut:]
+        pieces.append(text)
+        for position, piece in enumerate(pieces):
+            if index == 0 and position == 0:
+                line = f'{head} {piece}'
+            else:
+                line = f"{level + 1} {'CONT' if position == 0 else 'CONC'} {piece}"
+            lines.append(line.rstrip(' ') + '\n' if not piece else line + '\n')
+    return lines
+
+
+def _family_xref(key):
+    return '@F' + '_'.join(str(person_id) for person_id in key) + '@'
+
+
+class GedcomExporter:
+    """
+    Writes the persons of a family tree with their families as GEDCOM 5.5.1.
+
+    First the Relations of the family tree are read as plain id tuples and grouped into
+    families (one per couple, or per single parent with children). Then the persons are
+    streamed in chunks with `.iterator()` and written as INDI records, followed by the FAM
+    records. Apart from the id/refn/sex of the persons and the family index no row data is
+    kept in memory, so the memory use stays flat for large trees.
+
+    The refn of a person is used as its xref, so the file can be imported again (into this
+    database with `import_gedcom` or into Ahnenblatt). Links to persons outside of the family
+    tree are left out.
+    """
+
+    PERSON_FIELDS = ('id', 'refn', 'sex', 'uid', 'occu', 'reli', 'chr_addr') + tuple(
+        f'{prefix}_{suffix}' for _, prefix in EVENTS for suffix in ('date', 'plac')
+    ) + ('surn', 'givn', 'name_npfx', 'name_nick', 'name_rufname', 'name_marnm')
+    DETAIL_FIELDS = ('note', 'sour', 'chan_date', 'chan_date_time')
+
+    def __init__(self, family):
+        """
+        Parameters:
+        - family: The family tree to export (family_1 or family_2 of the persons).
+        """
+        self.family = family
+        self.persons = Person.objects.filter(Q(family_1=family) | Q(family_2=family))
+
+    def _load_families(self):
+        self.xrefs = {}
+        self.sexes = {}
+        for person_id, refn, sex in self.persons.values_list('id', 'refn', 'sex').iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            self.xrefs[person_id] = refn if refn and XREF_PATTERN.match(refn) else f'@P{person_id}@'
+            self.sexes[person_id] = sex
+
+        listed_children = defaultdict(list)
+        relations = Relation.objects.filter(person__in=self.persons)
+        for slot, field_name in zip(SLOTS, CHILDREN_FIELDS):
+            through = getattr(Relation, field_name).through
+            rows = through.objects.filter(relation__in=relations).order_by('id').values_list('relation_id', 'person_id')
+            for relation_id, child_id in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+                if child_id in self.xrefs:
+                    listed_children[(relation_id, slot)].append(child_id)
+
+        self.families = {}
+        self.spouse_families = defaultdict(dict)
+        own_parents, listed_parents = {}, {}
+        seen = set()
+        fields = ['id', 'person_id', 'fath_refn_id', 'moth_refn_id'] + [
+            field_name for slot in SLOTS
+            for field_name in (f'marr_spou_refn_{slot}_id', f'marr_date_{slot}', f'marr_plac_{slot}', f'fam_stat_{slot}')
+        ]
+        for row in relations.order_by('id').values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            relation_id, person_id, father_id, mother_id = row[:4]
+            if person_id in seen:
+                continue
+            seen.add(person_id)
+
+            key = self._family_key(father_id, mother_id)
+            if key:
+                own_parents[person_id] = key
+                self._family(key)
+            for slot in SLOTS:
+                spouse_id, date, place, status = row[4 + (slot - 1) * 4:8 + (slot - 1) * 4]
+                children = listed_children.get((relation_id, slot), [])
+                if not (spouse_id in self.xrefs or children):
+                    continue
+                key = self._family_key(person_id, spouse_id)
+                family = self._family(key)
+                self.spouse_families[person_id][key] = None
+                if not (family['date'] or family['place'] or family['status']):
+                    family.update(date=date, place=place, status=status)
+                for child_id in children:
+                    listed_parents.setdefault(child_id, key)
+                    family['listed'].append(child_id)
+
+        self.parent_family = {**listed_parents, **own_parents}
+        for key, family in self.families.items():
+            for partner_id in key:
+                self.spouse_families[partner_id][key] = None
+            listed = [child_id for child_id in dict.fromkeys(family['listed']) if self.parent_family.get(child_id) == key]
+            family['children'] = listed
+        for child_id, key in self.parent_family.items():
+            if child_id not in self.families[key]['children']:
+                self.families[key]['children'].append(child_id)
+
+    def _family_key(self, first_id, second_id):
+        return tuple(sorted(person_id for person_id in {first_id, second_id} if person_id in self.xrefs)) or None
+
+    def _family(self, key):
+        return self.families.setdefault(key, {'date': None, 'place': None, 'status': None, 'listed': [], 'children': []})
+
+    def _header(self):
+        return ''.join(
+            gedcom_lines(0, 'HEAD') + gedcom_lines(1, 'SOUR', 'KEMPEUNDCO') + gedcom_lines(1, 'GEDC')
+            + gedcom_lines(2, 'VERS', '5.5.1') + gedcom_lines(2, 'FORM', 'LINEAGE-LINKED') + gedcom_lines(1, 'CHAR', 'UTF-8')
+        )
+
+    def _person_record(self, person):
+        lines = gedcom_lines(0, 'INDI', xref=self.xrefs[person.id])
+        lines += gedcom_lines(1, 'NAME', f"{person.givn or ''} /{person.surn or ''}/".strip())
+        for tag, field_name in (('GIVN', 'givn'), ('SURN', 'surn'), ('NPFX', 'name_npfx'), ('NICK', 'name_nick'),
+                                ('_RUFNAME', 'name_rufname'), ('_MARNM', 'name_marnm')):
+            if getattr(person, field_name):
+                lines += gedcom_lines(2, tag, getattr(person, field_name))
+        lines += gedcom_lines(1, 'SEX', person.sex if person.sex in ('M', 'F') else 'U')
+        for tag, prefix in EVENTS:
+            date, place = getattr(person, f'{prefix}_date'), getattr(person, f'{prefix}_plac')
+            address = person.chr_addr if tag == 'CHR' else None
+            if date or place or address:
+                lines += gedcom_lines(1, tag)
+                if date:
+                    lines += gedcom_lines(2, 'DATE', text_to_gedcom_date(date))
+                if place:
+                    lines += gedcom_lines(2, 'PLAC', place)
+                if address:
+                    lines += gedcom_lines(2, 'ADDR', address)
+        # The detail row is joined in; persons without notes, sources and change date have none
+        detail = getattr(person, 'detail', None)
+        for tag, source, field_name in (('OCCU', person, 'occu'), ('RELI', person, 'reli'), ('NOTE', detail, 'note'),
+                                        ('SOUR', detail, 'sour'), ('_UID', person, 'uid')):
+            if getattr(source, field_name, None):
+                lines += gedcom_lines(1, tag, getattr(source, field_name))
+        if detail is not None and detail.chan_date:
+            lines += gedcom_lines(1, 'CHAN') + gedcom_lines(2, 'DATE', detail.chan_date)
+            if detail.chan_date_time:
+                lines += gedcom_lines(3, 'TIME', detail.chan_date_time)
+        if person.id in self.parent_family:
+            lines += gedcom_lines(1, 'FAMC', _family_xref(self.parent_family[person.id]))
+        for key in self.spouse_families.get(person.id, ()):
+            lines += gedcom_lines(1, 'FAMS', _family_xref(key))
+        return ''.join(lines)
+
+    def _family_record(self, key, family):
+        lines = gedcom_lines(0, 'FAM', xref=_family_xref(key))
+        partners = sorted(key, key=lambda person_id: self.sexes.get(person_id) == 'F')
+        if len(partners) == 1:
+            tags = ['WIFE' if self.sexes.get(partners[0]) == 'F' else 'HUSB']
+        else:
+            tags = ['HUSB', 'WIFE']
+        for tag, partner_id in zip(tags, partners):
+            lines += gedcom_lines(1, tag, self.xrefs[partner_id])
+        for child_id in family['children']:
+            lines += gedcom_lines(1, 'CHIL', self.xrefs[child_id])
+        if family['date'] or family['place'] or family['status'] in ('married', 'divorced'):
+            lines += gedcom_lines(1, 'MARR')
+            if family['date']:
+                lines += gedcom_lines(2, 'DATE', text_to_gedcom_date(family['date']))
+            if family['place']:
+                lines += gedcom_lines(2, 'PLAC', family['place'])
+        if family['status'] == 'divorced':
+            lines += gedcom_lines(1, 'DIV', 'Y')
+        return ''.join(lines)
+
+    def __iter__(self):
+        """
+        Yield the GEDCOM file record by record.
+        """
+        self._load_families()
+        yield self._header()
+        persons = self.persons.select_related('detail').only(
+            *self.PERSON_FIELDS, *(f'detail__{field_name}' for field_name in self.DETAIL_FIELDS)
+        ).order_by('id')
+        for person in persons.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield self._person_record(person)
+        for key, family in self.families.items():
+            yield self._family_record(key, family)
+        yield '0 TRLR\n'
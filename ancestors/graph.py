@@ -0,0 +1,242 @@
+import threading
+from array import array
+from collections import deque
+
+from .models import Relation, UnionChild
+from .versioning import get_tree_version
+
+
+SPOUSE_FIELDS = ('marr_spou_refn_1_id', 'marr_spou_refn_2_id', 'marr_spou_refn_3_id', 'marr_spou_refn_4_id')
+CHILDREN_FIELDS = ('children_1', 'children_2', 'children_3', 'children_4')
+
+
+def _build_adjacency(size, index, pairs):
+    """
+    Build a compressed adjacency list (offsets plus targets) from (source_id, target_id) pairs.
+
+    Parameters:
+    - size: The number of nodes in the graph.
+    - index: A dictionary mapping Person ids to their dense node index.
+    - pairs: An iterable of (source_id, target_id) tuples.
+
+    Returns:
+    - tuple: An `array` of offsets (length size + 1) and an `array` of target Person ids.
+    """
+    buckets = [[] for _ in range(size)]
+    for source_id, target_id in pairs:
+        buckets[index[source_id]].append(target_id)
+
+    offsets = array('l', [0])
+    targets = array('q')
+    for bucket in buckets:
+        targets.extend(sorted(bucket))
+        offsets.append(len(targets))
+    return offsets, targets
+
+
+def _walk(neighbours, person_id, generations):
+    """
+    Walk breadth-first from a person up to the given number of generations.
+
+    Parameters:
+    - neighbours: A function returning the linked person ids of a person.
+    - person_id: The id of the starting person.
+    - generations: The maximum number of links to follow.
+
+    Returns:
+    - dict: Maps each reached person id (and the person itself) to its distance
+    """
+    depths = {person_id: 0}
+    queue = deque([person_id])
+    while queue:
+        current = queue.popleft()
+        depth = depths[current]
+        if depth >= generations:
+            continue
+        for neighbour in neighbours(current):
+            if neighbour not in depths:
+                depths[neighbour] = depth + 1
+                queue.append(neighbour)
+    return depths
+
+
+class GenealogyGraph:
+    """
+    An in-memory index of the parent, child and spouse links between persons.
+
+    The graph is built from the `Relation` model (the `fath_refn`/`moth_refn` and
+    `marr_spou_refn_1..4` foreign keys) plus the children of the `Union` rows
+    and stored as compact integer adjacency arrays keyed by `Person.id`. Parent links
+    from both directions (a child's parent fields and a parent's children lists) are
+    merged, so the graph is consistent even if only one side was maintained.
+    """
+
+    def __init__(self, parent_pairs, spouse_pairs):
+        """
+        Parameters:
+        - parent_pairs: A set of (child_id, parent_id) tuples.
+        - spouse_pairs: A set of (person_id, spouse_id) tuples; both directions are indexed.
+        """
+        node_ids = set()
+        for pairs in (parent_pairs, spouse_pairs):
+            for first, second in pairs:
+                node_ids.add(first)
+                node_ids.add(second)
+
+        self._ids = array('q', sorted(node_ids))
+        self._index = {person_id: position for position, person_id in enumerate(self._ids)}
+        size = len(self._ids)
+
+        symmetric_spouses = set(spouse_pairs) | {(second, first) for first, second in spouse_pairs}
+        self._parents = _build_adjacency(size, self._index, parent_pairs)
+        self._children = _build_adjacency(size, self._index, ((parent, child) for child, parent in parent_pairs))
+        self._spouses = _build_adjacency(size, self._index, symmetric_spouses)
+
+    @classmethod
+    def from_database(cls):
+        """
+        Build the graph from the current `Relation` data.
+
+        Uses one query for the foreign keys and one query for the children of the unions.
+
+        Returns:
+        - GenealogyGraph: The freshly built graph
+        """
+        parent_pairs = set()
+        spouse_pairs = set()
+
+        rows = Relation.objects.values_list('person_id', 'fath_refn_id', 'moth_refn_id', *SPOUSE_FIELDS)
+        for person_id, father_id, mother_id, *spouse_ids in rows:
+            for parent_id in (father_id, mother_id):
+                if parent_id and parent_id != person_id:
+                    parent_pairs.add((person_id, parent_id))
+            for spouse_id in spouse_ids:
+                if spouse_id and spouse_id != person_id:
+                    spouse_pairs.add((min(person_id, spouse_id), max(person_id, spouse_id)))
+
+        # The children lists of all four slots, combined per couple in one table
+        for child_id, *partner_ids in UnionChild.objects.values_list('child_id', 'union__partner_a_id', 'union__partner_b_id'):
+            for parent_id in partner_ids:
+                if parent_id and parent_id != child_id:
+                    parent_pairs.add((child_id, parent_id))
+
+        return cls(parent_pairs, spouse_pairs)
+
+    def __contains__(self, person_id):
+        return person_id in self._index
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _neighbours(self, adjacency, person_id):
+        position = self._index.get(person_id)
+        if position is None:
+            return []
+        offsets, targets = adjacency
+        return list(targets[offsets[position]:offsets[position + 1]])
+
+    def parents(self, person_id):
+        """Return the ids of the known parents of a person."""
+        return self._neighbours(self._parents, person_id)
+
+    def children(self, person_id):
+        """Return the ids of the known children of a person."""
+        return self._neighbours(self._children, person_id)
+
+    def spouses(self, person_id):
+        """Return the ids of the known spouses of a person."""
+        return self._neighbours(self._spouses, person_id)
+
+    def ancestors(self, person_id, generations):
+        """
+        Return the ancestors of a person up to the given number of generations.
+
+        Parameters:
+        - person_id: The id of the starting person.
+        - generations: The maximum number of generations to walk up.
+
+        Returns:
+        - dict: Maps each ancestor id (and the person itself) to its generation distance
+        """
+        return _walk(self.parents, person_id, generations)
+
+    def descendants(self, person_id, generations):
+        """
+        Return the descendants of a person up to the given number of generations.
+
+        Parameters:
+        - person_id: The id of the starting person.
+        - generations: The maximum number of generations to walk down.
+
+        Returns:
+        - dict: Maps each descendant id (and the person itself) to its generation distance
+        """
+        return _walk(self.children, person_id, generations)
+
+
+class VisibleGenealogyGraph:
+    """
+    A view of a GenealogyGraph that only contains the given persons.
+
+    Links to other persons are left out, so a search on the view never passes through a
+    family tree the user is not allowed to see. The view offers the same lookups as the
+    graph and shares its adjacency arrays.
+    """
+
+    def __init__(self, graph, person_ids):
+        """
+        Parameters:
+        - graph: The GenealogyGraph to restrict.
+        - person_ids: A set of the ids of the persons to keep.
+        """
+        self._graph = graph
+        self._person_ids = person_ids
+
+    def __contains__(self, person_id):
+        return person_id in self._person_ids and person_id in self._graph
+
+    def _visible(self, person_ids):
+        return [person_id for person_id in person_ids if person_id in self._person_ids]
+
+    def parents(self, person_id):
+        """Return the ids of the known, visible parents of a person."""
+        return self._visible(self._graph.parents(person_id))
+
+    def children(self, person_id):
+        """Return the ids of the known, visible children of a person."""
+        return self._visible(self._graph.children(person_id))
+
+    def spouses(self, person_id):
+        """Return the ids of the known, visible spouses of a person."""
+        return self._visible(self._graph.spouses(person_id))
+
+    def ancestors(self, person_id, generations):
+        """Return the visible ancestors of a person, see `GenealogyGraph.ancestors`."""
+        return _walk(self.parents, person_id, generations)
+
+    def descendants(self, person_id, generations):
+        """Return the visible descendants of a person, see `GenealogyGraph.descendants`."""
+        return _walk(self.children, person_id, generations)
+
+
+_graph = None
+_graph_version = None
+_graph_lock = threading.Lock()
+
+
+def get_genealogy_graph():
+    """
+    Return the process-wide genealogy graph, rebuilding it if the tree data changed.
+
+    Returns:
+    - GenealogyGraph: A graph matching the current tree version
+    """
+    global _graph, _graph_version
+
+    version = get_tree_version()
+    if _graph is None or _graph_version != version:
+        with _graph_lock:
+            if _graph is None or _graph_version != version:
+                _graph = GenealogyGraph.from_database()
+                _graph_version = version
+    return _graph
@@ -0,0 +1,120 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+
+from .closure import refresh_closure
+from .models import Relation
+from .search import index_persons
+from .sync import sync_relations
+from .unions import refresh_unions
+from .versioning import bump_tree_version
+
+
+SYNC_BATCH_SIZE = 500
+
+_state = threading.local()
+
+
+class MaintenanceLog:
+    """
+    The ids recorded by the suspended receivers during a bulk maintenance block.
+
+    Attributes:
+    - relations: The ids of the saved Relations (or Relations with changed children).
+    - closure_persons: The ids of the persons whose parents may have changed.
+    - indexed_persons: The ids of the saved persons for the full-text index.
+    - union_persons: The ids of the persons whose unions may have changed (deleted Relations).
+    - tree_changed: Whether any Person or Relation was written.
+    """
+
+    def __init__(self):
+        self.relations = set()
+        self.closure_persons = set()
+        self.indexed_persons = set()
+        self.union_persons = set()
+        self.tree_changed = False
+
+
+def bulk_maintenance_active():
+    """
+    Return whether the current thread is inside a `bulk_maintenance()` block.
+    """
+    return getattr(_state, 'log', None) is not None
+
+
+def defer_during_bulk_maintenance(kind, *ids):
+    """
+    Record ids for the replay at the end of a bulk maintenance block.
+
+    Receivers call this first and return early if it returns True.
+
+    Parameters:
+    - kind: The attribute of the `MaintenanceLog` to add the ids to ('relations',
+      'closure_persons', 'indexed_persons', 'union_persons'), or None to only mark the tree as changed.
+    - ids: The ids to record.
+
+    Returns:
+    - bool: Whether a bulk maintenance block is active (the receiver has to skip its work)
+    """
+    log = getattr(_state, 'log', None)
+    if log is None:
+        return False
+    if kind:
+        getattr(log, kind).update(i for i in ids if i)
+    log.tree_changed = True
+    return True
+
+
+@contextmanager
+def bulk_maintenance():
+    """
+    Suspend the per-row signal work for bulk changes and replay it once at the end.
+
+    Inside the block, saving a Person no longer renames its files, re-reads the previous
+    files or updates the search index, and saving a Relation no longer propagates it to the
+    related Relations, the refn columns and the ancestor closure. The affected ids are
+    recorded instead, and at the end of the block the Relations are synced in batches,
+    the closure and the search index are refreshed for all recorded ids at once and the
+    tree version is bumped once. Everything runs in one transaction.
+
+    File fields must not be changed inside the block, as the files are not renamed, and a
+    Relation moved to another person only refreshes the closure of the new person.
+    Nested blocks join the outermost one.
+
+    Usage:
+        with bulk_maintenance():
+            for person in Person.objects.all():
+                ...
+                person.save()
+
+    Yields:
+    - MaintenanceLog: The recorded ids
+    """
+    if bulk_maintenance_active():
+        yield _state.log
+        return
+
+    log = MaintenanceLog()
+    _state.log = log
+    try:
+        with transaction.atomic():
+            yield log
+            _state.log = None
+            _replay(log)
+    finally:
+        _state.log = None
+
+
+def _replay(log):
+    relation_ids = sorted(log.relations)
+    for start in range(0, len(relation_ids), SYNC_BATCH_SIZE):
+        sync_relations(Relation.objects.filter(pk__in=relation_ids[start:start + SYNC_BATCH_SIZE]))
+    if log.union_persons:
+        refresh_unions(log.union_persons)
+    if log.closure_persons:
+        refresh_closure(log.closure_persons)
+    if log.indexed_persons:
+        index_persons(log.indexed_persons)
+    if log.tree_changed:
+        bump_tree_version()
@@ -0,0 +1,117 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Avg, BinaryField, Value
+from django.db.models.functions import Cast, Coalesce, Length
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from ancestors.models import Person, PersonDetail
+from ancestors.serializers import PersonListSerializer, masked_person_values
+from ancestors.views import PersonListCreateView
+
+
+LIST_QUERIES = (
+    ('ordered by name', {'page_size': 50}),
+    ('ordered by birth', {'page_size': 50, 'ordering': 'birth'}),
+    ('born 1850-1900', {'page_size': 50, 'born_from': 1850, 'born_to': 1900}),
+)
+
+
+# The legacy family, marriage and picture columns that were moved from Person to PersonDetail
+LEGACY_FIELDS = ('fath_refn', 'moth_refn') + tuple(
+    f'{name}_{slot}' for slot in (1, 2, 3, 4)
+    for name in ('marr_spou_refn', 'marr_date', 'marr_plac', 'fam_chil', 'fam_stat', 'marr_earliest', 'marr_latest', 'marr_qualifier')
+) + tuple(f'obje_{name}_{slot}' for slot in (1, 2, 3, 4, 5, 6) for name in ('file', 'titl'))
+
+
+def average_row_width(queryset, field_names=None):
+    """
+    Return the average number of stored bytes of the rows of a queryset (text as UTF-8,
+    numbers and dates as their text form), optionally of the given fields only.
+    """
+    widths = queryset.aggregate(**{
+        field.attname: Avg(Coalesce(Length(Cast(field.attname, BinaryField())), Value(0)))
+        for field in queryset.model._meta.concrete_fields if field_names is None or field.name in field_names
+    })
+    return sum(width or 0 for width in widths.values())
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the person list endpoint and the row width of the person tables (changes are rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=20000, help='Number of persons to create')
+        parser.add_argument('--repeat', type=int, default=5, help='Number of runs, the best run is reported')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        repeat = options['repeat']
+
+        with transaction.atomic():
+            confidentialities = ['no', 'no', 'restricted', 'yes']
+            persons = [
+                Person(
+                    refn=f'@BENCH{number}@', name=f'Vorname{number} Nachname{number % 300}',
+                    givn=f'Vorname{number}', surn=f'Nachname{number % 300}', family_1='benchmark',
+                    confidential=confidentialities[number % len(confidentialities)],
+                    birt_date=f'01.01.{1750 + number % 200}', birt_earliest=639000 + number % 73000,
+                    birt_latest=639000 + number % 73000, birt_plac='Köln', deat_plac='Bonn'
+                )
+                for number in range(count)
+            ]
+            for person in persons:
+                person.update_sort_keys()
+            Person.objects.bulk_create(persons, batch_size=500)
+            PersonDetail.objects.bulk_create([
+                PersonDetail(
+                    person=person, note='Notiz ' * 400, sour='Quelle ' * 200, chan_date='1 JAN 2020',
+                    fath_refn='@I1@', fath_name='Vater', moth_refn='@I2@', moth_name='Mutter',
+                    marr_spou_refn_1='@I3@', marr_spou_name_1='Ehepartner', marr_date_1='um 1880', marr_plac_1='Köln',
+                    fam_chil_1='@I4@,@I5@,@I6@', fam_husb_1=person.refn, marr_earliest_1=686263, marr_latest_1=686628,
+                    marr_qualifier_1=1, obje_file_1=f'images/{person.pk}_image1.jpg', obje_titl_1='Hochzeit'
+                )
+                for person in persons
+            ], batch_size=500)
+            benchmark_persons = Person.objects.filter(family_1='benchmark')
+
+            person_width = average_row_width(benchmark_persons)
+            benchmark_details = PersonDetail.objects.filter(person__family_1='benchmark')
+            detail_width = average_row_width(benchmark_details)
+            legacy_width = average_row_width(benchmark_details, LEGACY_FIELDS)
+            self.stdout.write(
+                f'Row width, {count} persons: person {person_width:.0f} bytes, person detail {detail_width:.0f} bytes '
+                f'(one row of {person_width + detail_width:.0f} bytes before the split; the person row had '
+                f'{person_width + legacy_width:.0f} bytes with the legacy family, marriage and picture columns)'
+            )
+
+            # The fields of the list, read from the narrow rows or together with the detail rows,
+            # which is about what every list query read when the notes were part of the person rows
+            list_fields = PersonListSerializer.Meta.fields
+            narrow = self.best_of(repeat, lambda: list(masked_person_values(benchmark_persons, list_fields)))
+            joined = self.best_of(repeat, lambda: list(masked_person_values(benchmark_persons, list_fields + ['note', 'sour'])))
+            self.stdout.write(
+                f'Scan of the list fields: person rows {narrow * 1000:.0f} ms, '
+                f'with the detail rows {joined * 1000:.0f} ms ({joined / narrow:.1f}x)'
+            )
+
+            user = get_user_model()(username='benchmark', email='benchmark@example.com', family_1='benchmark')
+            view = PersonListCreateView.as_view()
+            factory = APIRequestFactory(SERVER_NAME='localhost')
+            for label, params in LIST_QUERIES:
+                def list_page():
+                    request = factory.get('/api/ancestors/persons/', params)
+                    force_authenticate(request, user=user)
+                    return view(request).render()
+                self.stdout.write(f'List endpoint, {label}: {self.best_of(repeat, list_page) * 1000:.1f} ms')
+
+            transaction.set_rollback(True)
+
+    def best_of(self, repeat, function):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
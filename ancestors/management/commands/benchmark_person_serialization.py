@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ancestors.models import Person, PersonDetail
+from ancestors.serializers import PersonListSerializer, PersonSerializer, masked_person_values
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the serialization of the person list with and without SQL masking (changes are rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=5000, help='Number of persons to create')
+        parser.add_argument('--repeat', type=int, default=3, help='Number of runs, the best run is reported')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        repeat = options['repeat']
+
+        with transaction.atomic():
+            confidentialities = ['no', 'no', 'restricted', 'yes']
+            created = Person.objects.bulk_create([
+                Person(
+                    refn=f'@BENCH{number}@', name=f'Vorname{number} Nachname{number % 300}',
+                    givn=f'Vorname{number}', surn=f'Nachname{number % 300}', family_1='benchmark',
+                    confidential=confidentialities[number % len(confidentialities)],
+                    birt_date='01.01.1900', birt_plac='Köln', deat_plac='Bonn'
+                )
+                for number in range(count)
+            ], batch_size=500)
+            PersonDetail.objects.bulk_create(
+                [PersonDetail(person=person, note='Notiz ' * 400, sour='Quelle ' * 200) for person in created], batch_size=500
+            )
+            persons = Person.objects.filter(family_1='benchmark').select_related('detail').order_by('id')
+
+            for serializer_class in (PersonListSerializer, PersonSerializer):
+                before = self.best_of(repeat, lambda: serializer_class(list(persons.all()), many=True).data)
+                after = self.best_of(repeat, lambda: serializer_class(
+                    list(masked_person_values(persons, serializer_class.Meta.fields)), many=True
+                ).data)
+                self.stdout.write(
+                    f'{serializer_class.__name__}, {count} persons: '
+                    f'model instances {before * 1000:.0f} ms, SQL masking {after * 1000:.0f} ms '
+                    f'({before / after:.1f}x)'
+                )
+
+            transaction.set_rollback(True)
+
+    def best_of(self, repeat, function):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from ancestors.gedcom import GedcomExporter
+from kempeUndCo_backend.constants import FAMILY_CHOICES
+
+
+class Command(BaseCommand):
+    help = 'Export a family tree as a GEDCOM 5.5.1 file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--family', required=True, choices=[choice for choice, _ in FAMILY_CHOICES], help='Family tree to export')
+        parser.add_argument('--output', help='Path of the GEDCOM file (default: standard output)')
+
+    def handle(self, *args, **options):
+        exporter = GedcomExporter(options['family'])
+        if not options['output']:
+            for chunk in exporter:
+                self.stdout.write(chunk, ending='')
+            return
+
+        with open(options['output'], 'w', encoding='utf-8', newline='\n') as gedcom_file:
+            gedcom_file.writelines(exporter)
+        self.stdout.write(self.style.SUCCESS(f"Family tree {options['family']} exported to {options['output']}."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from ancestors.duplicates import MIN_SCORE, detect_duplicates
+
+
+class Command(BaseCommand):
+    help = 'Find probable duplicate persons and store them for the review (admin or /api/ancestors/duplicates/)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-score', type=float, default=MIN_SCORE, help=f'Minimum similarity between 0 and 1 (default: {MIN_SCORE})')
+
+    def handle(self, *args, **options):
+        stats = detect_duplicates(options['min_score'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['found']} probable duplicates found, {stats['new']} new, {stats['removed']} open candidates removed."
+        ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ancestors.gedcom import GedcomError, GedcomImporter, parse_gedcom
+from kempeUndCo_backend.constants import FAMILY_CHOICES
+
+
+class Command(BaseCommand):
+    help = 'Import persons and families from a GEDCOM file (e.g. an Ahnenblatt export)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path of the GEDCOM file')
+        parser.add_argument('--family', required=True, choices=[choice for choice, _ in FAMILY_CHOICES], help='Family tree of new persons')
+        parser.add_argument('--encoding', default='utf-8-sig', help='Encoding of the file (default: utf-8-sig)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Number of persons written per batch')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], encoding=options['encoding']) as gedcom_file:
+                stats = GedcomImporter(options['family'], options['batch_size']).run(parse_gedcom(gedcom_file))
+        except (OSError, UnicodeError, GedcomError) as error:
+            raise CommandError(error)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['persons_created']} persons created, {stats['persons_updated']} updated, "
+            f"{stats['relations']} relations written from {stats['families']} families."
+        ))
+        if stats['ignored_marriages']:
+            self.stdout.write(self.style.WARNING(f"{stats['ignored_marriages']} marriages beyond the fourth were ignored."))
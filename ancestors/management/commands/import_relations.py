@@ -0,0 +1,29 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ancestors.relation_import import RelationImporter
+
+
+class Command(BaseCommand):
+    help = 'Import relations from a CSV file with the columns of the admin import (refns instead of ids)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path of the CSV file')
+        parser.add_argument('--encoding', default='utf-8-sig', help='Encoding of the file (default: utf-8-sig)')
+        parser.add_argument('--delimiter', default=',', help='Column delimiter (default: ,)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Number of rows written per query')
+
+    def handle(self, *args, **options):
+        importer = RelationImporter(options['batch_size'])
+        try:
+            with open(options['path'], encoding=options['encoding'], newline='') as csv_file:
+                stats = importer.run(csv.DictReader(csv_file, delimiter=options['delimiter']))
+        except (OSError, UnicodeError, csv.Error) as error:
+            raise CommandError(error)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['created']} relations created, {stats['updated']} updated, {stats['skipped']} rows skipped."
+        ))
+        for row_number, column, refn in importer.unresolved:
+            self.stdout.write(self.style.WARNING(f'Row {row_number}, {column}: unknown refn {refn}'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from ancestors.closure import rebuild_closure, rebuild_generation_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the ancestor/descendant closure table and the generation statistics of the persons from the Relation data'
+
+    def handle(self, *args, **options):
+        row_count = rebuild_closure()
+        self.stdout.write(self.style.SUCCESS(f'Ancestor closure rebuilt with {row_count} rows.'))
+        person_count = rebuild_generation_stats()
+        self.stdout.write(self.style.SUCCESS(f'Generation statistics updated for {person_count} persons.'))
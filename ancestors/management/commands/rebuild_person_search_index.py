@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from ancestors.search import fts_available, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of the persons (SQLite FTS5 only)'
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            self.stdout.write(self.style.WARNING('The full-text index is only used with SQLite; nothing to do.'))
+            return
+        person_count = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt with {person_count} persons.'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from ancestors.unions import rebuild_unions
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the unions (marriages with their children) from the spouse slots of the Relation data'
+
+    def handle(self, *args, **options):
+        union_count = rebuild_unions()
+        self.stdout.write(self.style.SUCCESS(f'Unions rebuilt: {union_count}.'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from ancestors.dates import MARRIAGE_DATE_FIELDS, PERSON_DATE_FIELDS
+from ancestors.models import SORT_KEY_FIELDS, Person, PersonDetail
+
+
+RANGE_FIELDS = tuple(field_name for fields in PERSON_DATE_FIELDS.values() for field_name in fields)
+MARRIAGE_RANGE_FIELDS = tuple(field_name for fields in MARRIAGE_DATE_FIELDS.values() for field_name in fields)
+
+
+class Command(BaseCommand):
+    help = 'Recompute the day ranges of the birth, death, baptism, burial and marriage dates and the sort keys of all persons'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Number of persons written per UPDATE batch')
+
+    def handle(self, *args, **options):
+        changed = []
+        persons = Person.objects.only('id', 'surn', 'givn', 'confidential', 'descendant_count', *PERSON_DATE_FIELDS, *RANGE_FIELDS, *SORT_KEY_FIELDS)
+        for person in persons.iterator(chunk_size=options['batch_size']):
+            # Both are called, the sort keys depend on the birth range
+            if person.update_date_ranges() | person.update_sort_keys():
+                changed.append(person)
+        Person.objects.bulk_update(changed, RANGE_FIELDS + SORT_KEY_FIELDS, batch_size=options['batch_size'])
+
+        changed_details = []
+        details = PersonDetail.objects.only('person_id', *MARRIAGE_DATE_FIELDS, *MARRIAGE_RANGE_FIELDS)
+        for detail in details.iterator(chunk_size=options['batch_size']):
+            if detail.update_date_ranges():
+                changed_details.append(detail)
+        PersonDetail.objects.bulk_update(changed_details, MARRIAGE_RANGE_FIELDS, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Date ranges updated for {len(changed)} persons and {len(changed_details)} marriage details.'))
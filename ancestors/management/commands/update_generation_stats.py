@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from ancestors.closure import rebuild_generation_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the number of descendants and the ancestor and descendant generations of all persons from the closure table'
+
+    def handle(self, *args, **options):
+        person_count = rebuild_generation_stats()
+        self.stdout.write(self.style.SUCCESS(f'Generation statistics updated for {person_count} persons.'))
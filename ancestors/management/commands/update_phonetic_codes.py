@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from ancestors.models import Person
+
+
+PHONETIC_FIELDS = ('surn_phonetic', 'givn_phonetic', 'name_marnm_phonetic')
+
+
+class Command(BaseCommand):
+    help = 'Recompute the Kölner Phonetik codes of all persons, e.g. after bulk imports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of persons written per UPDATE batch')
+
+    def handle(self, *args, **options):
+        changed = []
+        persons = Person.objects.only('id', 'surn', 'givn', 'name_marnm', *PHONETIC_FIELDS)
+        for person in persons.iterator(chunk_size=options['batch_size']):
+            if person.update_phonetic_codes():
+                changed.append(person)
+        Person.objects.bulk_update(changed, PHONETIC_FIELDS, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Phonetic codes updated for {len(changed)} persons.'))
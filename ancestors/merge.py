@@ -0,0 +1,289 @@
+import os
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Replace
+
+from discussions.models import Discussion, DiscussionEntry
+
+from .graph import CHILDREN_FIELDS
+from .maintenance import bulk_maintenance, defer_during_bulk_maintenance
+from .models import Person, PersonAlias, PersonDetail, Relation
+from .tasks import rename_image
+
+
+SLOTS = (1, 2, 3, 4)
+FILE_SLOTS = (1, 2, 3, 4, 5, 6)
+PARENT_FIELDS = ('fath_refn', 'moth_refn')
+SPOUSE_FIELDS = tuple(f'marr_spou_refn_{slot}' for slot in SLOTS)
+MARRIAGE_TEXT_FIELDS = ('marr_date', 'marr_plac', 'fam_stat')
+
+# The legacy refn columns of PersonDetail: single refns and comma-separated lists of refns
+DETAIL_REFN_COLUMNS = PARENT_FIELDS + SPOUSE_FIELDS + tuple(f'{name}_{slot}' for slot in SLOTS for name in ('fam_husb', 'fam_wife'))
+DETAIL_REFN_LIST_COLUMNS = tuple(f'fam_chil_{slot}' for slot in SLOTS)
+
+
+def merge_persons(target, source):
+    """
+    Merge the person `source` into `target`, e.g. after a `DuplicateCandidate` was confirmed.
+
+    All references to `source` are rewritten to `target` with a few set-based UPDATEs in one
+    transaction: the parent and spouse links and the children of all Relations, the
+    discussion, the legacy refn columns of all person details and the aliases. The Relation of
+    `source` is merged into the Relation of `target` (empty parents and marriages are filled,
+    children of the same marriage are combined), its pictures are moved to the free picture
+    slots of `target` and its refn is kept as a `PersonAlias` of `target`. Finally `source`
+    is deleted.
+
+    The work runs inside `bulk_maintenance()`, so no per-row signals propagate the changes;
+    the Relation of `target` is synced, the ancestor closure of `target` and the former
+    children of `source` is refreshed and `target` is re-indexed once at the end.
+
+    Parameters:
+    - target: The person that is kept.
+    - source: The person that is merged into `target` and deleted.
+
+    Returns:
+    - dict: The numbers of rewired links, rewritten detail rows and moved pictures
+
+    Raises:
+    - ValueError: If both are the same person, or `target` has not enough free picture or
+      marriage slots for the pictures and marriages of `source`. Nothing is changed then.
+    """
+    if target.pk == source.pk:
+        raise ValueError('A person cannot be merged into itself.')
+
+    with bulk_maintenance():
+        persons = Person.objects.select_for_update().in_bulk([target.pk, source.pk])
+        target, source = persons[target.pk], persons[source.pk]
+        child_ids = set(Relation.objects.filter(Q(fath_refn=source) | Q(moth_refn=source)).values_list('person_id', flat=True))
+
+        relation_ids = _merge_own_relations(target, source)
+        links = _rewire_links(target, source)
+        relation_ids |= _merge_repeated_spouse(target)
+        _move_discussion(target, source)
+        persons_rewritten = _rewrite_refn_columns(target.refn, source.refn)
+        files = _move_files(target, source)
+
+        PersonAlias.objects.filter(person=source).update(person=target)
+        PersonAlias.objects.update_or_create(refn=source.refn, defaults={'person': target})
+        # Nothing refers to source any more, so the delete only removes its closure rows and candidates
+        Person.objects.filter(pk=source.pk).delete()
+
+        defer_during_bulk_maintenance('relations', *relation_ids)
+        defer_during_bulk_maintenance('closure_persons', target.pk, *child_ids)
+        defer_during_bulk_maintenance('indexed_persons', target.pk)
+    return {'links': links, 'persons': persons_rewritten, 'files': files}
+
+
+def _load_children(relation_ids):
+    children = {}
+    for slot, field_name in zip(SLOTS, CHILDREN_FIELDS):
+        for relation_id in relation_ids:
+            children[(relation_id, slot)] = []
+        through = getattr(Relation, field_name).through
+        for relation_id, child_id in through.objects.filter(relation_id__in=relation_ids).values_list('relation_id', 'person_id'):
+            children[(relation_id, slot)].append(child_id)
+    return children
+
+
+def _marriage_slot(relation, children, spouse_id):
+    """
+    Return the slot of `relation` for a marriage with `spouse_id`: the slot of the same
+    spouse, a slot without spouse for a marriage without spouse, else an empty slot.
+    """
+    spouses = {slot: getattr(relation, f'marr_spou_refn_{slot}_id') for slot in SLOTS}
+    for slot in SLOTS:
+        if spouse_id and spouses[slot] == spouse_id:
+            return slot
+    for slot in SLOTS:
+        if not spouse_id and not spouses[slot]:
+            return slot
+    for slot in SLOTS:
+        if not spouses[slot] and not children[(relation.pk, slot)] and not any(
+            getattr(relation, f'{name}_{slot}') for name in MARRIAGE_TEXT_FIELDS
+        ):
+            return slot
+    return None
+
+
+def _merge_own_relations(target, source):
+    """
+    Merge the Relations of `source` into the Relation of `target`, or move them to `target`
+    if it has none. Returns the ids of the Relations of `target`.
+    """
+    relations = list(Relation.objects.filter(person_id__in=(target.pk, source.pk)).order_by('id'))
+    target_relation = next((relation for relation in relations if relation.person_id == target.pk), None)
+    source_relations = [relation for relation in relations if relation.person_id == source.pk]
+    if target_relation is None:
+        Relation.objects.filter(person=source).update(person=target)
+        return {relation.pk for relation in source_relations}
+    if not source_relations:
+        return {target_relation.pk}
+
+    merged = {target.pk, source.pk}
+    children = _load_children([relation.pk for relation in relations])
+    changes, new_children = {}, []
+
+    def fill(field_name, value):
+        if value and not getattr(target_relation, field_name):
+            setattr(target_relation, field_name, value)
+            changes[field_name] = value
+
+    for relation in source_relations:
+        for field_name in PARENT_FIELDS:
+            parent_id = getattr(relation, f'{field_name}_id')
+            if parent_id not in merged:
+                fill(f'{field_name}_id', parent_id)
+        for slot in SLOTS:
+            spouse_id = getattr(relation, f'marr_spou_refn_{slot}_id')
+            spouse_id = None if spouse_id in merged else spouse_id
+            texts = {name: getattr(relation, f'{name}_{slot}') for name in MARRIAGE_TEXT_FIELDS}
+            if not spouse_id and not children[(relation.pk, slot)] and not any(texts.values()):
+                continue
+            target_slot = _marriage_slot(target_relation, children, spouse_id)
+            if target_slot is None:
+                raise ValueError(f'{target} has no free marriage slot for the marriage {slot} of {source}.')
+            fill(f'marr_spou_refn_{target_slot}_id', spouse_id)
+            for name, value in texts.items():
+                fill(f'{name}_{target_slot}', value)
+            target_children = children[(target_relation.pk, target_slot)]
+            for child_id in children[(relation.pk, slot)]:
+                if child_id not in merged and child_id not in target_children:
+                    target_children.append(child_id)
+                    new_children.append((target_slot, child_id))
+
+    if changes:
+        Relation.objects.filter(pk=target_relation.pk).update(**changes)
+    for slot, field_name in zip(SLOTS, CHILDREN_FIELDS):
+        through = getattr(Relation, field_name).through
+        through.objects.bulk_create([
+            through(relation_id=target_relation.pk, person_id=child_id) for child_slot, child_id in new_children if child_slot == slot
+        ])
+    Relation.objects.filter(pk__in=[relation.pk for relation in source_relations]).delete()
+    return {target_relation.pk}
+
+
+def _rewire_links(target, source):
+    """
+    Point all parent, spouse and children links to `source` at `target` (links of `target`
+    to itself are removed). Returns the number of rewired rows.
+    """
+    condition, values = Q(), {}
+    for field_name in PARENT_FIELDS + SPOUSE_FIELDS:
+        condition |= Q(**{field_name: source})
+        values[field_name] = Case(
+            When(Q(person=target) & Q(**{field_name: source}), then=Value(None)),
+            When(**{field_name: source}, then=Value(target.pk)),
+            default=F(field_name),
+            output_field=Relation._meta.get_field(field_name).target_field,
+        )
+    count = Relation.objects.filter(condition).update(**values)
+
+    for field_name in CHILDREN_FIELDS:
+        through = getattr(Relation, field_name).through
+        # A Relation listing both persons as children keeps only `target`
+        through.objects.filter(person_id=source.pk).filter(
+            Q(relation__person=target) | Q(relation_id__in=through.objects.filter(person_id=target.pk).values('relation_id'))
+        ).delete()
+        count += through.objects.filter(person_id=source.pk).update(person_id=target.pk)
+    return count
+
+
+def _merge_repeated_spouse(target):
+    """
+    Combine the marriages of Relations that had both persons as spouses and now list
+    `target` twice. Returns the ids of the changed Relations.
+    """
+    condition = Q()
+    for field_name in SPOUSE_FIELDS:
+        condition |= Q(**{field_name: target})
+    changed = set()
+    for relation in Relation.objects.filter(condition):
+        first, *others = [slot for slot in SLOTS if getattr(relation, f'marr_spou_refn_{slot}_id') == target.pk]
+        if not others:
+            continue
+        changes = {}
+        first_through = getattr(Relation, CHILDREN_FIELDS[first - 1]).through
+        first_children = set(first_through.objects.filter(relation_id=relation.pk).values_list('person_id', flat=True))
+        for slot in others:
+            through = getattr(Relation, CHILDREN_FIELDS[slot - 1]).through
+            child_ids = set(through.objects.filter(relation_id=relation.pk).values_list('person_id', flat=True)) - first_children
+            first_through.objects.bulk_create([first_through(relation_id=relation.pk, person_id=child_id) for child_id in child_ids])
+            first_children |= child_ids
+            through.objects.filter(relation_id=relation.pk).delete()
+            changes[f'marr_spou_refn_{slot}'] = None
+            for name in MARRIAGE_TEXT_FIELDS:
+                if not getattr(relation, f'{name}_{first}'):
+                    setattr(relation, f'{name}_{first}', getattr(relation, f'{name}_{slot}'))
+                    changes[f'{name}_{first}'] = getattr(relation, f'{name}_{slot}')
+                changes[f'{name}_{slot}'] = None
+        Relation.objects.filter(pk=relation.pk).update(**changes)
+        changed.add(relation.pk)
+    return changed
+
+
+def _move_discussion(target, source):
+    """
+    Move the discussion of `source` to `target`, or its entries if `target` has a discussion.
+    """
+    target_discussion = Discussion.objects.filter(person=target).first()
+    if target_discussion:
+        DiscussionEntry.objects.filter(discussion__person=source).update(discussion=target_discussion)
+    else:
+        Discussion.objects.filter(person=source).update(person=target)
+
+
+def _rewrite_refn_columns(target_refn, source_refn):
+    """
+    Replace `source_refn` by `target_refn` in the legacy refn columns of all person details,
+    with one UPDATE of PersonDetail. Returns the number of changed rows.
+    """
+    condition, values = Q(), {}
+    for column in DETAIL_REFN_COLUMNS:
+        condition |= Q(**{column: source_refn})
+        values[column] = Case(When(**{column: source_refn}, then=Value(target_refn)), default=F(column))
+    for column in DETAIL_REFN_LIST_COLUMNS:
+        # The refns are delimited by '@', so '@I1@' never matches within '@I12@'
+        condition |= Q(**{f'{column}__contains': source_refn})
+        values[column] = Replace(column, Value(source_refn), Value(target_refn))
+    return PersonDetail.objects.filter(condition).update(**values)
+
+
+def _move_files(target, source):
+    """
+    Move the pictures of `source` to the free picture slots of `target`. The files are
+    renamed after the transaction was committed. Returns the number of moved pictures.
+    """
+    details = PersonDetail.objects.in_bulk([target.pk, source.pk])
+    target_detail = details.get(target.pk) or PersonDetail(person_id=target.pk)
+    source_detail = details.get(source.pk) or PersonDetail(person_id=source.pk)
+    free_slots = [slot for slot in FILE_SLOTS if not getattr(target_detail, f'obje_file_{slot}')]
+    source_slots = [slot for slot in FILE_SLOTS if getattr(source_detail, f'obje_file_{slot}')]
+    if len(source_slots) > len(free_slots):
+        raise ValueError(f'{target} has no free picture slots for the {len(source_slots)} pictures of {source}.')
+    if not source_slots:
+        return 0
+
+    changes, renames = {}, []
+    for slot, source_slot in zip(free_slots, source_slots):
+        file_field = getattr(source_detail, f'obje_file_{source_slot}')
+        new_name = rename_image(target_detail, file_field.name, slot)
+        renames.append((file_field.path, os.path.join(settings.MEDIA_ROOT, new_name)))
+        changes[f'obje_file_{slot}'] = new_name
+        changes[f'obje_titl_{slot}'] = getattr(source_detail, f'obje_titl_{source_slot}')
+    if target.pk in details:
+        PersonDetail.objects.filter(pk=target.pk).update(**changes)
+    else:
+        PersonDetail.objects.bulk_create([PersonDetail(person_id=target.pk, **changes)])
+    # Otherwise the files would be removed with source
+    PersonDetail.objects.filter(pk=source.pk).update(**{f'obje_file_{slot}': None for slot in FILE_SLOTS})
+    transaction.on_commit(lambda: _rename_files(renames))
+    return len(renames)
+
+
+def _rename_files(renames):
+    for old_path, new_path in renames:
+        if os.path.exists(old_path) and old_path != new_path:
+            os.rename(old_path, new_path)
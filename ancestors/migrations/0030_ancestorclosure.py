@@ -0,0 +1,53 @@
+# Generated by Django 4.2.28 on 2026-10-18 08:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_ancestor_closure(apps, schema_editor):
+    Relation = apps.get_model('ancestors', 'Relation')
+    AncestorClosure = apps.get_model('ancestors', 'AncestorClosure')
+
+    parents = {}
+    for person_id, father_id, mother_id in Relation.objects.values_list('person_id', 'fath_refn_id', 'moth_refn_id'):
+        parents.setdefault(person_id, set()).update(p for p in (father_id, mother_id) if p and p != person_id)
+
+    rows = []
+    for person_id in parents:
+        depths = {}
+        generation = {person_id}
+        depth = 0
+        while generation:
+            depth += 1
+            generation = {p for child in generation for p in parents.get(child, ())} - set(depths) - {person_id}
+            for ancestor_id in generation:
+                depths[ancestor_id] = depth
+        rows.extend(AncestorClosure(ancestor_id=a, descendant_id=person_id, depth=d) for a, d in depths.items())
+    AncestorClosure.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ancestors', '0029_alter_person_sex'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AncestorClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveSmallIntegerField(verbose_name='Generationen')),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='ancestors.person', verbose_name='Vorfahr')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='ancestors.person', verbose_name='Nachkomme')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='closure_descendant_depth_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ancestorclosure',
+            constraint=models.UniqueConstraint(fields=('ancestor', 'descendant'), name='unique_ancestor_descendant'),
+        ),
+        migrations.RunPython(fill_ancestor_closure, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations
+
+
+FTS_TABLE = 'ancestors_person_fts'
+SEARCH_FIELDS = ('name', 'surn', 'givn', 'name_marnm', 'birt_plac', 'deat_plac', 'occu', 'note', 'sour')
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Person = apps.get_model('ancestors', 'Person')
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+        f'{", ".join(SEARCH_FIELDS)}, tokenize="unicode61 remove_diacritics 2")'
+    )
+
+    rows = []
+    for person in Person.objects.exclude(confidential='yes').values('id', 'confidential', *SEARCH_FIELDS):
+        visible_fields = ('name',) if person['confidential'] == 'restricted' else SEARCH_FIELDS
+        rows.append([person['id'], *(person[field] or '' if field in visible_fields else '' for field in SEARCH_FIELDS)])
+    placeholders = ', '.join(['%s'] * (len(SEARCH_FIELDS) + 1))
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, {", ".join(SEARCH_FIELDS)}) VALUES ({placeholders})',
+            rows
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ancestors', '0030_ancestorclosure'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
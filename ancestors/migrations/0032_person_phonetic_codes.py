@@ -0,0 +1,44 @@
+# Generated by Django 4.2.28 on 2026-10-18 08:42
+
+from django.db import migrations, models
+
+from ancestors.phonetics import cologne_phonetics
+
+
+PHONETIC_FIELDS = ('surn', 'givn', 'name_marnm')
+
+
+def fill_phonetic_codes(apps, schema_editor):
+    Person = apps.get_model('ancestors', 'Person')
+    persons = []
+    for person in Person.objects.only('id', *PHONETIC_FIELDS).iterator(chunk_size=2000):
+        for field_name in PHONETIC_FIELDS:
+            setattr(person, f'{field_name}_phonetic', cologne_phonetics(getattr(person, field_name)))
+        persons.append(person)
+    Person.objects.bulk_update(persons, [f'{field_name}_phonetic' for field_name in PHONETIC_FIELDS], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ancestors', '0031_person_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='givn_phonetic',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255, verbose_name='Vorname (Kölner Phonetik)'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='name_marnm_phonetic',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255, verbose_name='Ehename (Kölner Phonetik)'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='surn_phonetic',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255, verbose_name='Nachname (Kölner Phonetik)'),
+        ),
+        migrations.RunPython(fill_phonetic_codes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.28 on 2026-10-18 08:43
+
+import re
+
+from django.db import migrations, models
+
+
+def seed_refn_sequence(apps, schema_editor):
+    Person = apps.get_model('ancestors', 'Person')
+    RefnSequence = apps.get_model('ancestors', 'RefnSequence')
+    pattern = re.compile(r'^@I(\d+)@$')
+    matches = (pattern.match(refn) for refn in Person.objects.values_list('refn', flat=True))
+    last_value = max((int(match.group(1)) for match in matches if match), default=0)
+    RefnSequence.objects.create(name='person', last_value=last_value)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ancestors', '0032_person_phonetic_codes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RefnSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Name')),
+                ('last_value', models.PositiveBigIntegerField(default=0, verbose_name='Letzte vergebene Nummer')),
+            ],
+        ),
+        migrations.RunPython(seed_refn_sequence, migrations.RunPython.noop),
+    ]
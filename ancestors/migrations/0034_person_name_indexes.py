@@ -0,0 +1,23 @@
+# Generated by Django 4.2.28 on 2026-10-18 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ancestors', '0033_refnsequence'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='person',
+            name='givn',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True, verbose_name='Vorname'),
+        ),
+        migrations.AlterField(
+            model_name='person',
+            name='surn',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True, verbose_name='Nachname'),
+        ),
+    ]
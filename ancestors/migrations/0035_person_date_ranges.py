@@ -0,0 +1,148 @@
+# Generated by Django 4.2.28 on 2026-10-18 09:05
+
+from django.db import migrations, models
+
+from ancestors.dates import DATE_RANGE_FIELDS, parse_genealogical_date
+
+
+def fill_date_ranges(apps, schema_editor):
+    Person = apps.get_model('ancestors', 'Person')
+    range_fields = [field_name for fields in DATE_RANGE_FIELDS.values() for field_name in fields]
+    persons = []
+    for person in Person.objects.only('id', *DATE_RANGE_FIELDS).iterator(chunk_size=2000):
+        for date_field, fields in DATE_RANGE_FIELDS.items():
+            for field_name, value in zip(fields, parse_genealogical_date(getattr(person, date_field))):
+                setattr(person, field_name, value)
+        persons.append(person)
+    Person.objects.bulk_update(persons, range_fields, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ancestors', '0034_person_name_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='birt_earliest',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='Geburt frühestens (Tag)'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='birt_latest',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='Geburt spätestens (Tag)'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='birt_qualifier',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(0, 'genau'), (1, 'um'), (2, 'errechnet'), (3, 'ca.'), (4, 'vor'), (5, 'nach'), (6, 'zwischen')], editable=False, null=True, verbose_name='Geburt Genauigkeit'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='buri_earliest',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='Beerdigung frühestens (Tag)'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='buri_latest',
+            field=models.IntegerField(blank=True, editable=False, null=True, verbose_name='Beerdigung spätestens (Tag)'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='buri_qualifier',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(0, 'genau'), (1, 'um'), (2, 'errechnet'), (3, 'ca.'), (4, 'vor'), (5, 'nach'), (6, 'zwischen')], editable=False, null=True, verbose_name='Beerdigung Genauigkeit'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='chr_earliest',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='Taufe frühestens (Tag)'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='chr_latest',
+            field=models.IntegerField(blank=True, editable=False, null=True, verbose_name='Taufe spätestens (Tag)'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='chr_qualifier',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(0, 'genau'), (1, 'um'), (2, 'errechnet'), (3, 'ca.'), (4, 'vor'), (5, 'nach'), (6, 'zwischen')], editable=False, null=True, verbose_name='Taufe Genauigkeit'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='deat_earliest',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='Tod frühestens (Tag)'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='deat_latest',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='Tod spätestens (Tag)'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='deat_qualifier',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(0, 'genau'), (1, 'um'), (2, 'errechnet'), (3, 'ca.'), (4, 'vor'), (5, 'nach'), (6, 'zwischen')], editable=False, null=True, verbose_name='Tod Genauigkeit'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='marr_earliest_1',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='Heirat 1 frühestens (Tag)'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='marr_earliest_2',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='Heirat 2 frühestens (Tag)'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='marr_earliest_3',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='Heirat 3 frühestens (Tag)'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='marr_earliest_4',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='Heirat 4 frühestens (Tag)'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='marr_latest_1',
+            field=models.IntegerField(blank=True, editable=False, null=True, verbose_name='Heirat 1 spätestens (Tag)'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='marr_latest_2',
+            field=models.IntegerField(blank=True, editable=False, null=True, verbose_name='Heirat 2 spätestens (Tag)'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='marr_latest_3',
+            field=models.IntegerField(blank=True, editable=False, null=True, verbose_name='Heirat 3 spätestens (Tag)'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='marr_latest_4',
+            field=models.IntegerField(blank=True, editable=False, null=True, verbose_name='Heirat 4 spätestens (Tag)'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='marr_qualifier_1',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(0, 'genau'), (1, 'um'), (2, 'errechnet'), (3, 'ca.'), (4, 'vor'), (5, 'nach'), (6, 'zwischen')], editable=False, null=True, verbose_name='Heirat 1 Genauigkeit'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='marr_qualifier_2',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(0, 'genau'), (1, 'um'), (2, 'errechnet'), (3, 'ca.'), (4, 'vor'), (5, 'nach'), (6, 'zwischen')], editable=False, null=True, verbose_name='Heirat 2 Genauigkeit'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='marr_qualifier_3',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(0, 'genau'), (1, 'um'), (2, 'errechnet'), (3, 'ca.'), (4, 'vor'), (5, 'nach'), (6, 'zwischen')], editable=False, null=True, verbose_name='Heirat 3 Genauigkeit'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='marr_qualifier_4',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(0, 'genau'), (1, 'um'), (2, 'errechnet'), (3, 'ca.'), (4, 'vor'), (5, 'nach'), (6, 'zwischen')], editable=False, null=True, verbose_name='Heirat 4 Genauigkeit'),
+        ),
+        migrations.RunPython(fill_date_ranges, migrations.RunPython.noop),
+    ]
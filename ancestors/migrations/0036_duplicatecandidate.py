@@ -0,0 +1,34 @@
+# Generated by Django 4.2.28 on 2026-10-18 09:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('ancestors', '0035_person_date_ranges'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DuplicateCandidate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Ähnlichkeit')),
+                ('reasons', models.JSONField(blank=True, default=dict, verbose_name='Begründung')),
+                ('status', models.CharField(choices=[('open', 'Offen'), ('confirmed', 'Dublette'), ('rejected', 'Keine Dublette')], db_index=True, default='open', max_length=10, verbose_name='Status')),
+                ('created_date', models.DateTimeField(auto_now_add=True, verbose_name='Gefunden am')),
+                ('reviewed_date', models.DateTimeField(blank=True, null=True, verbose_name='Geprüft am')),
+                ('person_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ancestors.person', verbose_name='Person A')),
+                ('person_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ancestors.person', verbose_name='Person B')),
+                ('reviewed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Geprüft von')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='duplicatecandidate',
+            constraint=models.UniqueConstraint(fields=('person_a', 'person_b'), name='unique_duplicate_candidate'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.28 on 2026-10-18 09:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ancestors', '0036_duplicatecandidate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('refn', models.CharField(max_length=255, unique=True, verbose_name='#REFN')),
+                ('created_date', models.DateTimeField(auto_now_add=True, verbose_name='Zusammengeführt am')),
+                ('person', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='ancestors.person', verbose_name='Person')),
+            ],
+        ),
+    ]
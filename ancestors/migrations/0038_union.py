@@ -0,0 +1,125 @@
+# Generated by Django 4.2.28 on 2026-10-18 09:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+SLOTS = (1, 2, 3, 4)
+MARRIAGE_FIELDS = ('marr_date', 'marr_plac', 'fam_stat')
+
+
+def fill_unions(apps, schema_editor):
+    # A frozen copy of ancestors.unions.collect_unions / create_unions at the time of this
+    # migration, so later changes of that module do not change what the migration does
+    Relation = apps.get_model('ancestors', 'Relation')
+    Union = apps.get_model('ancestors', 'Union')
+    UnionChild = apps.get_model('ancestors', 'UnionChild')
+
+    children = {}
+    for slot in SLOTS:
+        through = getattr(Relation, f'children_{slot}').through
+        for relation_id, child_id in through.objects.order_by('id').values_list('relation_id', 'person_id'):
+            children.setdefault((relation_id, slot), []).append(child_id)
+
+    # Only the first Relation (lowest id) of a person is used
+    first_relations = {}
+    fields = ['id', 'person'] + [f'{name}_{slot}' for slot in SLOTS for name in ('marr_spou_refn',) + MARRIAGE_FIELDS]
+    for relation in Relation.objects.only(*fields).order_by('id'):
+        first_relations.setdefault(relation.person_id, relation)
+
+    # One union per couple: the values of the partner with the lower id win, the children of
+    # both slots are combined, a slot without spouse becomes a union of the person alone
+    unions = {}
+    for person_id in sorted(first_relations):
+        relation = first_relations[person_id]
+        for slot in SLOTS:
+            spouse_id = getattr(relation, f'marr_spou_refn_{slot}_id')
+            spouse_id = None if spouse_id == person_id else spouse_id
+            child_ids = children.get((relation.pk, slot), [])
+            values = {name: getattr(relation, f'{name}_{slot}') for name in MARRIAGE_FIELDS}
+            if not spouse_id and not child_ids and not any(values.values()):
+                continue
+            partners = (min(person_id, spouse_id), max(person_id, spouse_id)) if spouse_id else (person_id, None)
+
+            union = unions.setdefault(partners, {'slot_a': None, 'slot_b': None, **dict.fromkeys(MARRIAGE_FIELDS), 'children': []})
+            own_slot = 'slot_a' if person_id == partners[0] else 'slot_b'
+            union[own_slot] = union[own_slot] or slot
+            for name, value in values.items():
+                union[name] = union[name] or value
+            for child_id in child_ids:
+                if child_id not in union['children'] and child_id not in partners:
+                    union['children'].append(child_id)
+
+    rows = {
+        partners: Union(
+            partner_a_id=partners[0], partner_b_id=partners[1],
+            **{name: value for name, value in values.items() if name != 'children'}
+        )
+        for partners, values in unions.items()
+    }
+    Union.objects.bulk_create(rows.values(), batch_size=500)
+    UnionChild.objects.bulk_create(
+        [UnionChild(union_id=rows[partners].pk, child_id=child_id) for partners, values in unions.items() for child_id in values['children']],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ancestors', '0037_personalias'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Union',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot_a', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Ehe-Nr. bei Partner A')),
+                ('slot_b', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Ehe-Nr. bei Partner B')),
+                ('marr_date', models.CharField(blank=True, max_length=255, null=True, verbose_name='Heiratsdatum')),
+                ('marr_plac', models.CharField(blank=True, max_length=255, null=True, verbose_name='Heiratsort')),
+                ('fam_stat', models.CharField(blank=True, choices=[('married', 'verheiratet'), ('not_married', 'nicht verheiratet'), ('widowed', 'verwitwet'), ('divorced', 'geschieden')], max_length=255, null=True, verbose_name='Familienstand')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UnionChild',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('child', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='union_links', to='ancestors.person', verbose_name='Kind')),
+                ('union', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='child_links', to='ancestors.union', verbose_name='Ehe')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='union',
+            name='children',
+            field=models.ManyToManyField(blank=True, related_name='parent_unions', through='ancestors.UnionChild', to='ancestors.person', verbose_name='Kinder'),
+        ),
+        migrations.AddField(
+            model_name='union',
+            name='partner_a',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unions_as_a', to='ancestors.person', verbose_name='Partner A'),
+        ),
+        migrations.AddField(
+            model_name='union',
+            name='partner_b',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='unions_as_b', to='ancestors.person', verbose_name='Partner B'),
+        ),
+        migrations.AddIndex(
+            model_name='unionchild',
+            index=models.Index(fields=['child', 'union'], name='union_child_child_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='unionchild',
+            constraint=models.UniqueConstraint(fields=('union', 'child'), name='unique_union_child'),
+        ),
+        migrations.AddIndex(
+            model_name='union',
+            index=models.Index(fields=['partner_b', 'partner_a'], name='union_partner_b_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='union',
+            constraint=models.UniqueConstraint(fields=('partner_a', 'partner_b'), name='unique_union_partners'),
+        ),
+        migrations.RunPython(fill_unions, migrations.RunPython.noop),
+    ]
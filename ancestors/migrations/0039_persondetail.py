@@ -0,0 +1,156 @@
+# Generated by Django 4.2.28 on 2026-10-18 09:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+DETAIL_FIELDS = ('note', 'sour', 'chan_date', 'chan_date_time', 'fath_name', 'moth_name') + tuple(
+    f'{name}_{slot}' for slot in (1, 2, 3, 4) for name in ('marr_spou_name', 'fam_husb', 'fam_wife', 'fam_marr')
+)
+
+
+def move_details(apps, schema_editor):
+    """
+    Copy the detail columns of all persons with at least one value into PersonDetail.
+    """
+    Person = apps.get_model('ancestors', 'Person')
+    PersonDetail = apps.get_model('ancestors', 'PersonDetail')
+    details = []
+    for person_id, *values in Person.objects.values_list('id', *DETAIL_FIELDS).iterator(chunk_size=2000):
+        if any(values):
+            details.append(PersonDetail(person_id=person_id, **dict(zip(DETAIL_FIELDS, values))))
+    PersonDetail.objects.bulk_create(details, batch_size=500)
+
+
+def restore_details(apps, schema_editor):
+    Person = apps.get_model('ancestors', 'Person')
+    PersonDetail = apps.get_model('ancestors', 'PersonDetail')
+    persons = [Person(id=row[0], **dict(zip(DETAIL_FIELDS, row[1:]))) for row in PersonDetail.objects.values_list('person_id', *DETAIL_FIELDS)]
+    Person.objects.bulk_update(persons, DETAIL_FIELDS, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ancestors', '0038_union'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonDetail',
+            fields=[
+                ('person', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='detail', serialize=False, to='ancestors.person', verbose_name='Person')),
+                ('note', models.TextField(blank=True, null=True, verbose_name='Notizen')),
+                ('sour', models.TextField(blank=True, null=True, verbose_name='Quellen')),
+                ('chan_date', models.CharField(blank=True, max_length=255, null=True, verbose_name='Änderungsdatum')),
+                ('chan_date_time', models.CharField(blank=True, max_length=255, null=True, verbose_name='Änderungsdatum und -uhrzeit')),
+                ('fath_name', models.CharField(blank=True, max_length=255, null=True, verbose_name='Name des Vaters')),
+                ('moth_name', models.CharField(blank=True, max_length=255, null=True, verbose_name='Name der Mutter')),
+                ('marr_spou_name_1', models.CharField(blank=True, max_length=255, null=True, verbose_name='Name des Ehepartners 1')),
+                ('fam_husb_1', models.CharField(blank=True, max_length=255, null=True, verbose_name='Ehemann der Familie 1')),
+                ('fam_wife_1', models.CharField(blank=True, max_length=255, null=True, verbose_name='Ehefrau der Familie 1')),
+                ('fam_marr_1', models.CharField(blank=True, max_length=255, null=True, verbose_name='Ehe der Familie 1')),
+                ('marr_spou_name_2', models.CharField(blank=True, max_length=255, null=True, verbose_name='Name des Ehepartners 2')),
+                ('fam_husb_2', models.CharField(blank=True, max_length=255, null=True, verbose_name='Ehemann der Familie 2')),
+                ('fam_wife_2', models.CharField(blank=True, max_length=255, null=True, verbose_name='Ehefrau der Familie 2')),
+                ('fam_marr_2', models.CharField(blank=True, max_length=255, null=True, verbose_name='Ehe der Familie 2')),
+                ('marr_spou_name_3', models.CharField(blank=True, max_length=255, null=True, verbose_name='Name des Ehepartners 3')),
+                ('fam_husb_3', models.CharField(blank=True, max_length=255, null=True, verbose_name='Ehemann der Familie 3')),
+                ('fam_wife_3', models.CharField(blank=True, max_length=255, null=True, verbose_name='Ehefrau der Familie 3')),
+                ('fam_marr_3', models.CharField(blank=True, max_length=255, null=True, verbose_name='Ehe der Familie 3')),
+                ('marr_spou_name_4', models.CharField(blank=True, max_length=255, null=True, verbose_name='Name des Ehepartners 4')),
+                ('fam_husb_4', models.CharField(blank=True, max_length=255, null=True, verbose_name='Ehemann der Familie 4')),
+                ('fam_wife_4', models.CharField(blank=True, max_length=255, null=True, verbose_name='Ehefrau der Familie 4')),
+                ('fam_marr_4', models.CharField(blank=True, max_length=255, null=True, verbose_name='Ehe der Familie 4')),
+            ],
+        ),
+        migrations.RunPython(move_details, restore_details),
+        migrations.RemoveField(
+            model_name='person',
+            name='chan_date',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='chan_date_time',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='fam_husb_1',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='fam_husb_2',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='fam_husb_3',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='fam_husb_4',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='fam_marr_1',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='fam_marr_2',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='fam_marr_3',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='fam_marr_4',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='fam_wife_1',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='fam_wife_2',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='fam_wife_3',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='fam_wife_4',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='fath_name',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='marr_spou_name_1',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='marr_spou_name_2',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='marr_spou_name_3',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='marr_spou_name_4',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='moth_name',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='note',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='sour',
+        ),
+    ]
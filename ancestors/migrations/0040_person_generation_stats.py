@@ -0,0 +1,53 @@
+# Generated by Django 4.2.28 on 2026-10-18 09:36
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def fill_generation_stats(apps, schema_editor):
+    Person = apps.get_model('ancestors', 'Person')
+    AncestorClosure = apps.get_model('ancestors', 'AncestorClosure')
+    stats = {}
+    for person_id, count, generations in AncestorClosure.objects.order_by().values('ancestor_id').annotate(
+        count=Count('*'), generations=Max('depth')
+    ).values_list('ancestor_id', 'count', 'generations'):
+        stats[person_id] = {'descendant_count': count, 'generation_index': generations}
+    for person_id, generations in AncestorClosure.objects.order_by().values('descendant_id').annotate(
+        generations=Max('depth')
+    ).values_list('descendant_id', 'generations'):
+        stats.setdefault(person_id, {})['ancestor_generations'] = generations
+
+    field_names = ['descendant_count', 'ancestor_generations', 'generation_index']
+    persons = []
+    for person in Person.objects.only('id', *field_names).iterator(chunk_size=2000):
+        if person.pk in stats:
+            for field_name, value in stats[person.pk].items():
+                setattr(person, field_name, value)
+            persons.append(person)
+    Person.objects.bulk_update(persons, field_names, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ancestors', '0039_persondetail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='ancestor_generations',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Vorfahrengenerationen'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='descendant_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='Anzahl Nachkommen'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='generation_index',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Nachkommengenerationen'),
+        ),
+        migrations.RunPython(fill_generation_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.28 on 2026-10-18 09:47
+
+from django.db import migrations, models
+
+
+def create_tree_version(apps, schema_editor):
+    TreeVersion = apps.get_model('ancestors', 'TreeVersion')
+    TreeVersion.objects.create(pk=1, version=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ancestors', '0040_person_generation_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TreeVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Version')),
+            ],
+        ),
+        migrations.RunPython(create_tree_version, migrations.RunPython.noop),
+    ]
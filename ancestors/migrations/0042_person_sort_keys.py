@@ -0,0 +1,57 @@
+# Generated by Django 4.2.28 on 2026-10-18 09:52
+
+from django.db import migrations, models
+
+
+UNKNOWN_DAY = 10 ** 7
+
+
+def fill_sort_keys(apps, schema_editor):
+    Person = apps.get_model('ancestors', 'Person')
+    persons = []
+    for person in Person.objects.only('id', 'surn', 'givn', 'confidential', 'birt_earliest', 'birt_latest').iterator(chunk_size=2000):
+        masked = person.confidential in ('yes', 'restricted')
+        birth = next((day for day in (person.birt_earliest, person.birt_latest) if day is not None), UNKNOWN_DAY)
+        person.sort_surn = '' if masked else person.surn or ''
+        person.sort_givn = '' if masked else person.givn or ''
+        person.sort_birth = UNKNOWN_DAY if masked else birth
+        persons.append(person)
+    Person.objects.bulk_update(persons, ['sort_surn', 'sort_givn', 'sort_birth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ancestors', '0041_treeversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='sort_birth',
+            field=models.IntegerField(default=10000000, editable=False, verbose_name='Sortierung Geburt'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='sort_givn',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255, verbose_name='Sortierung Vorname'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='sort_surn',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255, verbose_name='Sortierung Nachname'),
+        ),
+        migrations.AddIndex(
+            model_name='duplicatecandidate',
+            index=models.Index(fields=['-score', 'id'], name='duplicate_score_order_idx'),
+        ),
+        migrations.RunPython(fill_sort_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['sort_surn', 'sort_givn', 'id'], name='person_name_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['sort_birth', 'sort_surn', 'sort_givn', 'id'], name='person_birth_order_idx'),
+        ),
+    ]
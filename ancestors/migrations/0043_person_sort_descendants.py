@@ -0,0 +1,33 @@
+# Generated by Django 4.2.28 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+def fill_sort_descendants(apps, schema_editor):
+    Person = apps.get_model('ancestors', 'Person')
+    Person.objects.exclude(confidential__in=('yes', 'restricted')).update(sort_descendants=models.F('descendant_count'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ancestors', '0042_person_sort_keys'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='person',
+            name='descendant_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Anzahl Nachkommen'),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='sort_descendants',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Sortierung Nachkommen'),
+        ),
+        migrations.RunPython(fill_sort_descendants, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['-sort_descendants', 'sort_surn', 'sort_givn', 'id'], name='person_descendants_order_idx'),
+        ),
+    ]
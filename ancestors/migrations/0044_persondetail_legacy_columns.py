@@ -0,0 +1,460 @@
+# Generated by Django 4.2.28 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+SLOTS = (1, 2, 3, 4)
+MOVED_FIELDS = ('fath_refn', 'moth_refn') + tuple(
+    f'{name}_{slot}' for slot in SLOTS
+    for name in ('marr_spou_refn', 'marr_date', 'marr_plac', 'fam_chil', 'fam_stat', 'marr_earliest', 'marr_latest', 'marr_qualifier')
+) + tuple(f'obje_{name}_{slot}' for slot in (1, 2, 3, 4, 5, 6) for name in ('file', 'titl'))
+
+
+def move_legacy_columns(apps, schema_editor):
+    """
+    Copy the legacy family, marriage and picture columns of all persons with at least one
+    value into their PersonDetail, which is created if needed.
+    """
+    Person = apps.get_model('ancestors', 'Person')
+    PersonDetail = apps.get_model('ancestors', 'PersonDetail')
+    existing = set(PersonDetail.objects.values_list('person_id', flat=True))
+    new_details, changed_details = [], []
+    for person_id, *values in Person.objects.values_list('id', *MOVED_FIELDS).iterator(chunk_size=2000):
+        if not any(values):
+            continue
+        detail = PersonDetail(person_id=person_id, **dict(zip(MOVED_FIELDS, values)))
+        (changed_details if person_id in existing else new_details).append(detail)
+    PersonDetail.objects.bulk_create(new_details, batch_size=500)
+    PersonDetail.objects.bulk_update(changed_details, MOVED_FIELDS, batch_size=500)
+
+
+def restore_legacy_columns(apps, schema_editor):
+    Person = apps.get_model('ancestors', 'Person')
+    PersonDetail = apps.get_model('ancestors', 'PersonDetail')
+    persons = [Person(id=row[0], **dict(zip(MOVED_FIELDS, row[1:]))) for row in PersonDetail.objects.values_list('person_id', *MOVED_FIELDS)]
+    Person.objects.bulk_update(persons, MOVED_FIELDS, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ancestors', '0043_person_sort_descendants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='persondetail',
+            name='fam_chil_1',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Kinder der Familie 1'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='fam_chil_2',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Kinder der Familie 2'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='fam_chil_3',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Kinder der Familie 3'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='fam_chil_4',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Kinder der Familie 4'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='fam_stat_1',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Familienstand 1'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='fam_stat_2',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Familienstand 2'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='fam_stat_3',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Familienstand 3'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='fam_stat_4',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Familienstand 4'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='fath_refn',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='#REFN des Vaters'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='marr_date_1',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Heiratsdatum 1'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='marr_date_2',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Heiratsdatum 2'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='marr_date_3',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Heiratsdatum 3'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='marr_date_4',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Heiratsdatum 4'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='marr_earliest_1',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='Heirat 1 frühestens (Tag)'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='marr_earliest_2',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='Heirat 2 frühestens (Tag)'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='marr_earliest_3',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='Heirat 3 frühestens (Tag)'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='marr_earliest_4',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='Heirat 4 frühestens (Tag)'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='marr_latest_1',
+            field=models.IntegerField(blank=True, editable=False, null=True, verbose_name='Heirat 1 spätestens (Tag)'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='marr_latest_2',
+            field=models.IntegerField(blank=True, editable=False, null=True, verbose_name='Heirat 2 spätestens (Tag)'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='marr_latest_3',
+            field=models.IntegerField(blank=True, editable=False, null=True, verbose_name='Heirat 3 spätestens (Tag)'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='marr_latest_4',
+            field=models.IntegerField(blank=True, editable=False, null=True, verbose_name='Heirat 4 spätestens (Tag)'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='marr_plac_1',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Heiratsort 1'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='marr_plac_2',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Heiratsort 2'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='marr_plac_3',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Heiratsort 3'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='marr_plac_4',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Heiratsort 4'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='marr_qualifier_1',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(0, 'genau'), (1, 'um'), (2, 'errechnet'), (3, 'ca.'), (4, 'vor'), (5, 'nach'), (6, 'zwischen')], editable=False, null=True, verbose_name='Heirat 1 Genauigkeit'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='marr_qualifier_2',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(0, 'genau'), (1, 'um'), (2, 'errechnet'), (3, 'ca.'), (4, 'vor'), (5, 'nach'), (6, 'zwischen')], editable=False, null=True, verbose_name='Heirat 2 Genauigkeit'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='marr_qualifier_3',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(0, 'genau'), (1, 'um'), (2, 'errechnet'), (3, 'ca.'), (4, 'vor'), (5, 'nach'), (6, 'zwischen')], editable=False, null=True, verbose_name='Heirat 3 Genauigkeit'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='marr_qualifier_4',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(0, 'genau'), (1, 'um'), (2, 'errechnet'), (3, 'ca.'), (4, 'vor'), (5, 'nach'), (6, 'zwischen')], editable=False, null=True, verbose_name='Heirat 4 Genauigkeit'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='marr_spou_refn_1',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='#REFN des Ehepartners 1'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='marr_spou_refn_2',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='#REFN des Ehepartners 2'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='marr_spou_refn_3',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='#REFN des Ehepartners 3'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='marr_spou_refn_4',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='#REFN des Ehepartners 4'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='moth_refn',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='#REFN der Mutter'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='obje_file_1',
+            field=models.FileField(blank=True, null=True, upload_to='images/', verbose_name='Bilddatei 1'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='obje_file_2',
+            field=models.FileField(blank=True, null=True, upload_to='images/', verbose_name='Bilddatei 2'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='obje_file_3',
+            field=models.FileField(blank=True, null=True, upload_to='images/', verbose_name='Bilddatei 3'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='obje_file_4',
+            field=models.FileField(blank=True, null=True, upload_to='images/', verbose_name='Bilddatei 4'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='obje_file_5',
+            field=models.FileField(blank=True, null=True, upload_to='images/', verbose_name='Bilddatei 5'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='obje_file_6',
+            field=models.FileField(blank=True, null=True, upload_to='images/', verbose_name='Bilddatei 6'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='obje_titl_1',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Bildtitel 1'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='obje_titl_2',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Bildtitel 2'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='obje_titl_3',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Bildtitel 3'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='obje_titl_4',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Bildtitel 4'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='obje_titl_5',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Bildtitel 5'),
+        ),
+        migrations.AddField(
+            model_name='persondetail',
+            name='obje_titl_6',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Bildtitel 6'),
+        ),
+        migrations.RunPython(move_legacy_columns, restore_legacy_columns),
+        migrations.RemoveField(
+            model_name='person',
+            name='fam_chil_1',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='fam_chil_2',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='fam_chil_3',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='fam_chil_4',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='fam_stat_1',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='fam_stat_2',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='fam_stat_3',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='fam_stat_4',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='fath_refn',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='marr_date_1',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='marr_date_2',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='marr_date_3',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='marr_date_4',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='marr_earliest_1',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='marr_earliest_2',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='marr_earliest_3',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='marr_earliest_4',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='marr_latest_1',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='marr_latest_2',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='marr_latest_3',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='marr_latest_4',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='marr_plac_1',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='marr_plac_2',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='marr_plac_3',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='marr_plac_4',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='marr_qualifier_1',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='marr_qualifier_2',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='marr_qualifier_3',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='marr_qualifier_4',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='marr_spou_refn_1',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='marr_spou_refn_2',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='marr_spou_refn_3',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='marr_spou_refn_4',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='moth_refn',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='obje_file_1',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='obje_file_2',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='obje_file_3',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='obje_file_4',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='obje_file_5',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='obje_file_6',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='obje_titl_1',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='obje_titl_2',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='obje_titl_3',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='obje_titl_4',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='obje_titl_5',
+        ),
+        migrations.RemoveField(
+            model_name='person',
+            name='obje_titl_6',
+        ),
+    ]
@@ -8,6 +8,20 @@ import io
 from django.core.files.base import ContentFile
 import logging
 from django.db import transaction, IntegrityError
+from django.db.models import F
+import re
+from .dates import MARRIAGE_DATE_FIELDS, PERSON_DATE_FIELDS, DateQualifier, parse_genealogical_date
+from .phonetics import cologne_phonetics
+
+
+# The Person columns computed from the closure table (see ancestors/closure.py)
+GENERATION_STAT_FIELDS = ('descendant_count', 'ancestor_generations', 'generation_index')
+# The stored sort keys of the person list (see Person.update_sort_keys)
+SORT_KEY_FIELDS = ('sort_surn', 'sort_givn', 'sort_birth', 'sort_descendants')
+# Confidentiality values whose names and dates are masked
+CONFIDENTIAL_VALUES = ('yes', 'restricted')
+# Sorts after every real day (date.max.toordinal() is 3652059)
+UNKNOWN_DAY = 10 ** 7
 
 
 class Person(models.Model):
@@ -22,35 +36,40 @@ class Person(models.Model):
     - givn (CharField): Given name of the person.
     - sex (CharField): Sex of the person, with choices of 'weiblich', 'männlich', or 'divers'.
     - occu (CharField): Occupation of the person.
-    - chan_date (CharField): Date of last change.
-    - chan_date_time (CharField): Date and time of last change.
     - birt_date (CharField): Birth date of the person.
     - birth_date_formatted (DateField): Automatically formatted birth date.
     - birt_plac (CharField): Birth place of the person.
     - deat_date (CharField): Death date of the person.
     - death_date_formatted (DateField): Automatically formatted death date.
     - deat_plac (CharField): Death place of the person.
-    - note (TextField): Additional notes about the person.
     - chr_date (CharField): Christening date of the person.
     - chr_plac (CharField): Christening place of the person.
     - buri_date (CharField): Burial date of the person.
     - buri_plac (CharField): Burial place of the person.
     - name_rufname (CharField): Rufname (nickname or common name used).
     - name_npfx (CharField): Name prefix.
-    - sour (TextField): Sources of information about the person.
     - name_nick (CharField): Nickname.
     - name_marnm (CharField): Married name.
     - chr_addr (CharField): Christening address.
     - reli (CharField): Religion.
-    - 6 obje_file_X and obje_title_X fields that are for uploading up to 6 pictures
 
-    Attributes that are still included here but are handled via the model relation
-    (s. below, created via scripts, s README for process):
-    - all references to parents, children, spouses and marriages
+    The parents, children, spouses and marriages are handled via the model `Relation` (s. below).
+    The pictures, the notes, sources and change dates and the legacy Ahnenblatt columns of the
+    parents and marriages are kept in the one-to-one table `PersonDetail` (`person.detail`),
+    so that the list, search and tree queries only read the narrow person rows.
 
     Attributes that were newly created via scripts only for this database:
     - family_1 (CharField): The first family tree to which the person belongs, with choices from predefined options.
     - family_2 (CharField): The second family tree to which the person belongs, with choices from predefined options.
+    - surn_phonetic, givn_phonetic, name_marnm_phonetic (CharField): Kölner Phonetik codes of the
+      surname, given name and married name, generated in save() for the sounds-like search.
+    - sort_surn, sort_givn, sort_birth, sort_descendants: The sort keys of the person list, masked
+      for confidential persons and set in save().
+    - descendant_count, ancestor_generations, generation_index (IntegerField): The number of
+      descendants, of known ancestor generations and of descendant generations, read from the
+      closure table and kept up to date by `ancestors.closure.refresh_generation_stats`. They
+      cover the whole closure table, i.e. descendants in other family trees and confidential
+      descendants are counted as well.
     - creation_date (DateTimeField): The date and time when the person record was created.
     - last_modified_date (DateTimeField): The date and time when the person record was last modified.
     - created_by (ForeignKey): The user who created the person record.
@@ -65,91 +84,28 @@ class Person(models.Model):
 
     refn = models.CharField(max_length=255, unique=True, verbose_name='#REFN')
     name = models.CharField(max_length=255, verbose_name='Name', editable=False)
-    fath_name = models.CharField(max_length=255, null=True, blank=True, verbose_name='Name des Vaters')
-    fath_refn = models.CharField(max_length=255, null=True, blank=True, verbose_name='#REFN des Vaters')
-    moth_name = models.CharField(max_length=255, null=True, blank=True, verbose_name='Name der Mutter')
-    moth_refn = models.CharField(max_length=255, null=True, blank=True, verbose_name='#REFN der Mutter')
     uid = models.CharField(max_length=255, null=True, blank=True, verbose_name='UID')
-    surn = models.CharField(max_length=255, null=True, blank=True, verbose_name='Nachname')
-    givn = models.CharField(max_length=255, null=True, blank=True, verbose_name='Vorname')
+    surn = models.CharField(max_length=255, null=True, blank=True, db_index=True, verbose_name='Nachname')
+    givn = models.CharField(max_length=255, null=True, blank=True, db_index=True, verbose_name='Vorname')
     sex = models.CharField(max_length=10, choices=SEX_CHOICES, default='D', verbose_name='Geschlecht')
     occu = models.CharField(max_length=255, null=True, blank=True, verbose_name='Beruf')
-    chan_date = models.CharField(max_length=255, null=True, blank=True, verbose_name='Änderungsdatum')
-    chan_date_time = models.CharField(max_length=255, null=True, blank=True, verbose_name='Änderungsdatum und -uhrzeit')
     birt_date = models.CharField(max_length=255, null=True, blank=True, verbose_name='Geburtsdatum')
     birth_date_formatted = models.DateField(null=True, blank=True, verbose_name='Automatisch formatiertes Geburtsdatum')
     birt_plac = models.CharField(max_length=255, null=True, blank=True, verbose_name='Geburtsort')
     deat_date = models.CharField(max_length=255, null=True, blank=True, verbose_name='Sterbedatum')
     death_date_formatted = models.DateField(null=True, blank=True, verbose_name='Automatisch formatiertes Sterbedatum')
     deat_plac = models.CharField(max_length=255, null=True, blank=True, verbose_name='Sterbeort')
-    note = models.TextField(null=True, blank=True, verbose_name='Notizen')
     chr_date = models.CharField(max_length=255, null=True, blank=True, verbose_name='Taufe Datum')
     chr_plac = models.CharField(max_length=255, null=True, blank=True, verbose_name='Taufe Ort')
     buri_date = models.CharField(max_length=255, null=True, blank=True, verbose_name='Beerdigungsdatum')
     buri_plac = models.CharField(max_length=255, null=True, blank=True, verbose_name='Beerdigungsort')
     name_rufname = models.CharField(max_length=255, null=True, blank=True, verbose_name='Rufname')
     name_npfx = models.CharField(max_length=255, null=True, blank=True, verbose_name='Namenspräfix')
-    sour = models.TextField(null=True, blank=True, verbose_name='Quellen')
     name_nick = models.CharField(max_length=255, null=True, blank=True, verbose_name='Spitzname')
     name_marnm = models.CharField(max_length=255, null=True, blank=True, verbose_name='Ehename')
     chr_addr = models.CharField(max_length=255, null=True, blank=True, verbose_name='Taufe Adresse')
     reli = models.CharField(max_length=255, null=True, blank=True, verbose_name='Religion')
 
-    # Marriage and family information (repeated fields for each spouse and family)
-    marr_spou_name_1 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Name des Ehepartners 1')
-    marr_spou_refn_1 = models.CharField(max_length=255, null=True, blank=True, verbose_name='#REFN des Ehepartners 1')
-    fam_husb_1 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Ehemann der Familie 1')
-    fam_wife_1 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Ehefrau der Familie 1')
-    marr_date_1 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Heiratsdatum 1')
-    marr_plac_1 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Heiratsort 1')
-    fam_chil_1 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Kinder der Familie 1')
-    fam_marr_1 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Ehe der Familie 1')
-    fam_stat_1 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Familienstand 1')
-
-    marr_spou_name_2 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Name des Ehepartners 2')
-    marr_spou_refn_2 = models.CharField(max_length=255, null=True, blank=True, verbose_name='#REFN des Ehepartners 2')
-    fam_husb_2 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Ehemann der Familie 2')
-    fam_wife_2 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Ehefrau der Familie 2')
-    marr_date_2 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Heiratsdatum 2')
-    marr_plac_2 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Heiratsort 2')
-    fam_chil_2 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Kinder der Familie 2')
-    fam_marr_2 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Ehe der Familie 2')
-    fam_stat_2 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Familienstand 2')
-
-    marr_spou_name_3 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Name des Ehepartners 3')
-    marr_spou_refn_3 = models.CharField(max_length=255, null=True, blank=True, verbose_name='#REFN des Ehepartners 3')
-    fam_husb_3 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Ehemann der Familie 3')
-    fam_wife_3 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Ehefrau der Familie 3')
-    marr_date_3 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Heiratsdatum 3')
-    marr_plac_3 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Heiratsort 3')
-    fam_chil_3 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Kinder der Familie 3')
-    fam_marr_3 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Ehe der Familie 3')
-    fam_stat_3 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Familienstand 3')
-
-    marr_spou_name_4 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Name des Ehepartners 4')
-    marr_spou_refn_4 = models.CharField(max_length=255, null=True, blank=True, verbose_name='#REFN des Ehepartners 4')
-    fam_husb_4 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Ehemann der Familie 4')
-    fam_wife_4 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Ehefrau der Familie 4')
-    marr_date_4 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Heiratsdatum 4')
-    marr_plac_4 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Heiratsort 4')
-    fam_chil_4 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Kinder der Familie 4')
-    fam_marr_4 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Ehe der Familie 4')
-    fam_stat_4 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Familienstand 4')
-
-    # Object files and titles
-    obje_file_1 = models.FileField(upload_to='images/', null=True, blank=True, verbose_name='Bilddatei 1')
-    obje_titl_1 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Bildtitel 1')
-    obje_file_2 = models.FileField(upload_to='images/', null=True, blank=True, verbose_name='Bilddatei 2')
-    obje_titl_2 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Bildtitel 2')
-    obje_file_3 = models.FileField(upload_to='images/', null=True, blank=True, verbose_name='Bilddatei 3')
-    obje_titl_3 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Bildtitel 3')
-    obje_file_4 = models.FileField(upload_to='images/', null=True, blank=True, verbose_name='Bilddatei 4')
-    obje_titl_4 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Bildtitel 4')
-    obje_file_5 = models.FileField(upload_to='images/', null=True, blank=True, verbose_name='Bilddatei 5')
-    obje_titl_5 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Bildtitel 5')
-    obje_file_6 = models.FileField(upload_to='images/', null=True, blank=True, verbose_name='Bilddatei 6')
-    obje_titl_6 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Bildtitel 6')
-
     CONFIDENTIALITY_CHOICES = [
         ('no', 'Nein'),
         ('restricted', 'Eingeschränkt'),
@@ -165,33 +121,73 @@ class Person(models.Model):
     family_1 = models.CharField(choices=FAMILY_CHOICES, max_length=100, blank=False, verbose_name='Stammbaum 1')
     family_2 = models.CharField(max_length=255, choices=FAMILY_CHOICES, blank=True, null=True, verbose_name='Stammbaum 2')
 
+    surn_phonetic = models.CharField(max_length=255, blank=True, default='', editable=False, db_index=True, verbose_name='Nachname (Kölner Phonetik)')
+    givn_phonetic = models.CharField(max_length=255, blank=True, default='', editable=False, db_index=True, verbose_name='Vorname (Kölner Phonetik)')
+    name_marnm_phonetic = models.CharField(max_length=255, blank=True, default='', editable=False, db_index=True, verbose_name='Ehename (Kölner Phonetik)')
+
+    # Day ranges parsed from the free-text dates (see ancestors/dates.py), as date ordinals
+    birt_earliest = models.IntegerField(null=True, blank=True, editable=False, db_index=True, verbose_name='Geburt frühestens (Tag)')
+    birt_latest = models.IntegerField(null=True, blank=True, editable=False, db_index=True, verbose_name='Geburt spätestens (Tag)')
+    birt_qualifier = models.PositiveSmallIntegerField(null=True, blank=True, editable=False, choices=DateQualifier.choices, verbose_name='Geburt Genauigkeit')
+    deat_earliest = models.IntegerField(null=True, blank=True, editable=False, db_index=True, verbose_name='Tod frühestens (Tag)')
+    deat_latest = models.IntegerField(null=True, blank=True, editable=False, db_index=True, verbose_name='Tod spätestens (Tag)')
+    deat_qualifier = models.PositiveSmallIntegerField(null=True, blank=True, editable=False, choices=DateQualifier.choices, verbose_name='Tod Genauigkeit')
+    chr_earliest = models.IntegerField(null=True, blank=True, editable=False, db_index=True, verbose_name='Taufe frühestens (Tag)')
+    chr_latest = models.IntegerField(null=True, blank=True, editable=False, verbose_name='Taufe spätestens (Tag)')
+    chr_qualifier = models.PositiveSmallIntegerField(null=True, blank=True, editable=False, choices=DateQualifier.choices, verbose_name='Taufe Genauigkeit')
+    buri_earliest = models.IntegerField(null=True, blank=True, editable=False, db_index=True, verbose_name='Beerdigung frühestens (Tag)')
+    buri_latest = models.IntegerField(null=True, blank=True, editable=False, verbose_name='Beerdigung spätestens (Tag)')
+    buri_qualifier = models.PositiveSmallIntegerField(null=True, blank=True, editable=False, choices=DateQualifier.choices, verbose_name='Beerdigung Genauigkeit')
+
+    # Keys of the indexed orderings of the person list, masked like the serialized data
+    sort_surn = models.CharField(max_length=255, blank=True, default='', editable=False, verbose_name='Sortierung Nachname')
+    sort_givn = models.CharField(max_length=255, blank=True, default='', editable=False, verbose_name='Sortierung Vorname')
+    sort_birth = models.IntegerField(default=UNKNOWN_DAY, editable=False, verbose_name='Sortierung Geburt')
+    sort_descendants = models.PositiveIntegerField(default=0, editable=False, verbose_name='Sortierung Nachkommen')
+
+    # Derived from the ancestor closure table (see ancestors/closure.py)
+    descendant_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Anzahl Nachkommen')
+    ancestor_generations = models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Vorfahrengenerationen')
+    generation_index = models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Nachkommengenerationen')
+
     creation_date = models.DateTimeField(default=timezone.now, verbose_name='Erstellungsdatum')
     last_modified_date = models.DateTimeField(default=timezone.now, verbose_name='Letzte Änderung')
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='created_persons', verbose_name='Ersteller')
     last_modified_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='modified_persons', verbose_name='Letzte Änderung durch')
 
+    class Meta:
+        indexes = [
+            # The orderings of the person list, so a page is read from the index (keyset pagination)
+            models.Index(fields=['sort_surn', 'sort_givn', 'id'], name='person_name_order_idx'),
+            models.Index(fields=['sort_birth', 'sort_surn', 'sort_givn', 'id'], name='person_birth_order_idx'),
+            models.Index(fields=['-sort_descendants', 'sort_surn', 'sort_givn', 'id'], name='person_descendants_order_idx'),
+        ]
+
     def _generate_unique_refn(self):
         """
         Generate a unique refn value that does not conflict with existing ones.
 
-        Iterates through existing refn values to find the maximum numerical suffix,
-        increments it, and returns a new unique refn value.
+        The number is taken from the `RefnSequence` counter, so no existing refn has to be
+        read and concurrent creates never get the same value.
 
         Returns:
         - string: A new unique refn value in the format '@I<new_number>@'
         """
-        existing_refs = Person.objects.values_list('refn', flat=True)
-        max_num = 0
-        for ref in existing_refs:
-            try:
-                num = int(ref.strip('@I@'))
-                if num > max_num:
-                    max_num = num
-            except ValueError:
-                continue
+        return Person.reserve_refns(1)[0]
 
-        new_num = max_num + 1
-        return f'@I{new_num}@'
+    @staticmethod
+    def reserve_refns(count):
+        """
+        Reserve a block of new refn values with a single counter update, e.g. for imports.
+
+        Parameters:
+        - count: The number of refn values to reserve.
+
+        Returns:
+        - list: The reserved refn values in the format '@I<number>@'
+        """
+        last_number = RefnSequence.reserve(count)
+        return [f'@I{number}@' for number in range(last_number - count + 1, last_number + 1)]
 
     def compress_image(self, image_file):
         """
@@ -206,35 +202,68 @@ class Person(models.Model):
         output.seek(0)
         return ContentFile(output.read(), image_file.name)
 
-    def save(self, *args, **kwargs):
+    def update_phonetic_codes(self):
         """
-        Save the Person instance including metadata and automatic birth/death date generation.
+        Set the Kölner Phonetik codes of the surname, given name and married name.
 
-        Automatically generates a unique refn for new instances, sets creation and modification dates,
-        and formats the name and birth/death dates.
+        Returns:
+        - bool: Whether any of the codes changed
+        """
+        changed = False
+        for field_name in ('surn', 'givn', 'name_marnm'):
+            code = cologne_phonetics(getattr(self, field_name))
+            if getattr(self, f'{field_name}_phonetic') != code:
+                setattr(self, f'{field_name}_phonetic', code)
+                changed = True
+        return changed
+
+    def update_date_ranges(self):
+        """
+        Set the day ranges (earliest, latest, qualifier) of the birth, death, baptism and burial dates.
 
-        Parameters:
-        - user: The user who is creating or modifying the instance (optional)
+        Returns:
+        - bool: Whether any of the ranges changed
         """
-        user = kwargs.pop('user', None)
+        changed = False
+        for date_field, range_fields in PERSON_DATE_FIELDS.items():
+            for field_name, value in zip(range_fields, parse_genealogical_date(getattr(self, date_field))):
+                if getattr(self, field_name) != value:
+                    setattr(self, field_name, value)
+                    changed = True
+        return changed
+
+    def update_sort_keys(self):
+        """
+        Set the sort keys of the person list from the names, the birth range and the confidentiality.
 
-        # for i in range(1, 5):
-        #     image_field = getattr(self, f'image_{i}')
-        #     if image_field and hasattr(image_field, 'file'):
-        #         compressed_image = self.compress_image(image_field.file)
-        #         setattr(self, f'image_{i}', compressed_image)
+        For confidential persons the names are treated as empty, the birth as unknown and the
+        number of descendants as 0, so the position of a person in the list does not reveal them.
 
-        if not self.pk:
-            if not self.refn:
-                self.refn = self._generate_unique_refn()
-            self.creation_date = timezone.now()
-            if user:
-                self.created_by = user
-        else:
-            self.last_modified_date = timezone.now()
-            if user:
-                self.last_modified_by = user
+        Returns:
+        - bool: Whether any of the sort keys changed
+        """
+        masked = self.confidential in CONFIDENTIAL_VALUES
+        birth = next((day for day in (self.birt_earliest, self.birt_latest) if day is not None), UNKNOWN_DAY)
+        values = {
+            'sort_surn': '' if masked else self.surn or '',
+            'sort_givn': '' if masked else self.givn or '',
+            'sort_birth': UNKNOWN_DAY if masked else birth,
+            'sort_descendants': 0 if masked else self.descendant_count,
+        }
+        changed = False
+        for field_name, value in values.items():
+            if getattr(self, field_name) != value:
+                setattr(self, field_name, value)
+                changed = True
+        return changed
+
+    def update_derived_fields(self):
+        """
+        Set the fields that are derived from other fields: the full name, the formatted birth
+        and death dates, the day ranges of all dates, the phonetic codes and the sort keys.
 
+        Called by save() and by bulk imports that write persons without save().
+        """
         if self.name_npfx:
             name_parts = [self.name_npfx]
         else:
@@ -250,6 +279,9 @@ class Person(models.Model):
             name_parts.append(self.surn)
 
         self.name = " ".join(name_parts) if name_parts else "Unbekannt"
+        self.update_phonetic_codes()
+        self.update_date_ranges()
+        self.update_sort_keys()
 
         if self.birt_date:
             try:
@@ -264,6 +296,38 @@ class Person(models.Model):
             except ValueError:
                 self.death_date_formatted = None
 
+    def save(self, *args, **kwargs):
+        """
+        Save the Person instance including metadata and automatic birth/death date generation.
+
+        Automatically generates a unique refn for new instances, sets creation and modification dates,
+        and formats the name and birth/death dates.
+
+        Parameters:
+        - user: The user who is creating or modifying the instance (optional)
+        """
+        user = kwargs.pop('user', None)
+
+        # for i in range(1, 5):
+        #     image_field = getattr(self, f'image_{i}')
+        #     if image_field and hasattr(image_field, 'file'):
+        #         compressed_image = self.compress_image(image_field.file)
+        #         setattr(self, f'image_{i}', compressed_image)
+
+        if not self.pk:
+            if not self.refn:
+                self.refn = self._generate_unique_refn()
+            else:
+                RefnSequence.advance_past(self.refn)
+            self.creation_date = timezone.now()
+            if user:
+                self.created_by = user
+        else:
+            self.last_modified_date = timezone.now()
+            if user:
+                self.last_modified_by = user
+
+        self.update_derived_fields()
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -275,6 +339,156 @@ class Person(models.Model):
         """
         return self.name
 
+    def save_detail(self, **values):
+        """
+        Write values of the `PersonDetail` of the person; the detail row is created if needed.
+
+        Parameters:
+        - values: The PersonDetail fields to set, e.g. note='...'.
+
+        Returns:
+        - PersonDetail: The saved detail row
+        """
+        detail, _ = PersonDetail.objects.update_or_create(person=self, defaults=values)
+        self.detail = detail
+        return detail
+
+
+class PersonDetail(models.Model):
+    """
+    The rarely read columns of a `Person`, split off into a one-to-one table.
+
+    The person lists, the search and the tree endpoints only need the names, dates, places
+    and the confidentiality, so these columns are not part of the person rows they scan. The
+    detail row is loaded lazily (`person.detail`) or joined where it is shown: the person
+    detail view, the admin and the GEDCOM export. Persons without any of these values have
+    no detail row.
+
+    Attributes:
+    - person (OneToOneField): The person, also the primary key.
+    - note (TextField): Additional notes about the person.
+    - sour (TextField): Sources of information about the person.
+    - chan_date (CharField): Date of last change.
+    - chan_date_time (CharField): Date and time of last change.
+    - fath_refn, moth_refn, fath_name, moth_name (CharField): Refns and names of the parents
+      (legacy Ahnenblatt columns, the refns are mirrored from the Relation by `ancestors/sync.py`).
+    - marr_spou_refn_X, marr_spou_name_X, marr_date_X, marr_plac_X, fam_chil_X, fam_stat_X,
+      fam_husb_X, fam_wife_X, fam_marr_X (CharField): Legacy Ahnenblatt columns of the
+      marriages 1 to 4; the spouse refns, dates, places and children are mirrored from the Relation.
+    - marr_earliest_X, marr_latest_X, marr_qualifier_X: The day ranges of the marriage dates, set in save().
+    - obje_file_X, obje_titl_X: Up to 6 pictures of the person and their titles.
+    """
+    person = models.OneToOneField(Person, on_delete=models.CASCADE, primary_key=True, related_name='detail', verbose_name='Person')
+    note = models.TextField(null=True, blank=True, verbose_name='Notizen')
+    sour = models.TextField(null=True, blank=True, verbose_name='Quellen')
+    chan_date = models.CharField(max_length=255, null=True, blank=True, verbose_name='Änderungsdatum')
+    chan_date_time = models.CharField(max_length=255, null=True, blank=True, verbose_name='Änderungsdatum und -uhrzeit')
+    fath_refn = models.CharField(max_length=255, null=True, blank=True, verbose_name='#REFN des Vaters')
+    moth_refn = models.CharField(max_length=255, null=True, blank=True, verbose_name='#REFN der Mutter')
+    fath_name = models.CharField(max_length=255, null=True, blank=True, verbose_name='Name des Vaters')
+    moth_name = models.CharField(max_length=255, null=True, blank=True, verbose_name='Name der Mutter')
+
+    marr_spou_refn_1 = models.CharField(max_length=255, null=True, blank=True, verbose_name='#REFN des Ehepartners 1')
+    marr_spou_name_1 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Name des Ehepartners 1')
+    marr_date_1 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Heiratsdatum 1')
+    marr_plac_1 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Heiratsort 1')
+    fam_chil_1 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Kinder der Familie 1')
+    marr_earliest_1 = models.IntegerField(null=True, blank=True, editable=False, db_index=True, verbose_name='Heirat 1 frühestens (Tag)')
+    marr_latest_1 = models.IntegerField(null=True, blank=True, editable=False, verbose_name='Heirat 1 spätestens (Tag)')
+    marr_qualifier_1 = models.PositiveSmallIntegerField(null=True, blank=True, editable=False, choices=DateQualifier.choices, verbose_name='Heirat 1 Genauigkeit')
+    fam_stat_1 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Familienstand 1')
+    fam_husb_1 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Ehemann der Familie 1')
+    fam_wife_1 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Ehefrau der Familie 1')
+    fam_marr_1 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Ehe der Familie 1')
+
+    marr_spou_refn_2 = models.CharField(max_length=255, null=True, blank=True, verbose_name='#REFN des Ehepartners 2')
+    marr_spou_name_2 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Name des Ehepartners 2')
+    marr_date_2 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Heiratsdatum 2')
+    marr_plac_2 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Heiratsort 2')
+    fam_chil_2 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Kinder der Familie 2')
+    marr_earliest_2 = models.IntegerField(null=True, blank=True, editable=False, db_index=True, verbose_name='Heirat 2 frühestens (Tag)')
+    marr_latest_2 = models.IntegerField(null=True, blank=True, editable=False, verbose_name='Heirat 2 spätestens (Tag)')
+    marr_qualifier_2 = models.PositiveSmallIntegerField(null=True, blank=True, editable=False, choices=DateQualifier.choices, verbose_name='Heirat 2 Genauigkeit')
+    fam_stat_2 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Familienstand 2')
+    fam_husb_2 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Ehemann der Familie 2')
+    fam_wife_2 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Ehefrau der Familie 2')
+    fam_marr_2 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Ehe der Familie 2')
+
+    marr_spou_refn_3 = models.CharField(max_length=255, null=True, blank=True, verbose_name='#REFN des Ehepartners 3')
+    marr_spou_name_3 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Name des Ehepartners 3')
+    marr_date_3 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Heiratsdatum 3')
+    marr_plac_3 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Heiratsort 3')
+    fam_chil_3 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Kinder der Familie 3')
+    marr_earliest_3 = models.IntegerField(null=True, blank=True, editable=False, db_index=True, verbose_name='Heirat 3 frühestens (Tag)')
+    marr_latest_3 = models.IntegerField(null=True, blank=True, editable=False, verbose_name='Heirat 3 spätestens (Tag)')
+    marr_qualifier_3 = models.PositiveSmallIntegerField(null=True, blank=True, editable=False, choices=DateQualifier.choices, verbose_name='Heirat 3 Genauigkeit')
+    fam_stat_3 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Familienstand 3')
+    fam_husb_3 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Ehemann der Familie 3')
+    fam_wife_3 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Ehefrau der Familie 3')
+    fam_marr_3 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Ehe der Familie 3')
+
+    marr_spou_refn_4 = models.CharField(max_length=255, null=True, blank=True, verbose_name='#REFN des Ehepartners 4')
+    marr_spou_name_4 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Name des Ehepartners 4')
+    marr_date_4 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Heiratsdatum 4')
+    marr_plac_4 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Heiratsort 4')
+    fam_chil_4 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Kinder der Familie 4')
+    marr_earliest_4 = models.IntegerField(null=True, blank=True, editable=False, db_index=True, verbose_name='Heirat 4 frühestens (Tag)')
+    marr_latest_4 = models.IntegerField(null=True, blank=True, editable=False, verbose_name='Heirat 4 spätestens (Tag)')
+    marr_qualifier_4 = models.PositiveSmallIntegerField(null=True, blank=True, editable=False, choices=DateQualifier.choices, verbose_name='Heirat 4 Genauigkeit')
+    fam_stat_4 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Familienstand 4')
+    fam_husb_4 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Ehemann der Familie 4')
+    fam_wife_4 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Ehefrau der Familie 4')
+    fam_marr_4 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Ehe der Familie 4')
+
+    obje_file_1 = models.FileField(upload_to='images/', null=True, blank=True, verbose_name='Bilddatei 1')
+    obje_titl_1 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Bildtitel 1')
+    obje_file_2 = models.FileField(upload_to='images/', null=True, blank=True, verbose_name='Bilddatei 2')
+    obje_titl_2 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Bildtitel 2')
+    obje_file_3 = models.FileField(upload_to='images/', null=True, blank=True, verbose_name='Bilddatei 3')
+    obje_titl_3 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Bildtitel 3')
+    obje_file_4 = models.FileField(upload_to='images/', null=True, blank=True, verbose_name='Bilddatei 4')
+    obje_titl_4 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Bildtitel 4')
+    obje_file_5 = models.FileField(upload_to='images/', null=True, blank=True, verbose_name='Bilddatei 5')
+    obje_titl_5 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Bildtitel 5')
+    obje_file_6 = models.FileField(upload_to='images/', null=True, blank=True, verbose_name='Bilddatei 6')
+    obje_titl_6 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Bildtitel 6')
+
+    def update_date_ranges(self):
+        """
+        Set the day ranges (earliest, latest, qualifier) of the marriage dates.
+
+        Returns:
+        - bool: Whether any of the ranges changed
+        """
+        changed = False
+        for date_field, range_fields in MARRIAGE_DATE_FIELDS.items():
+            for field_name, value in zip(range_fields, parse_genealogical_date(getattr(self, date_field))):
+                if getattr(self, field_name) != value:
+                    setattr(self, field_name, value)
+                    changed = True
+        return changed
+
+    def save(self, *args, **kwargs):
+        """
+        Save the PersonDetail instance with the day ranges of its marriage dates.
+        """
+        self.update_date_ranges()
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return str(self.person)
+
+
+# The PersonDetail fields and how they are looked up from Person (e.g. in `values()`)
+PERSON_DETAIL_FIELDS = tuple(field.name for field in PersonDetail._meta.concrete_fields if field.name != 'person')
+
+
+def person_field_path(field_name):
+    """
+    Return the lookup of a Person or PersonDetail field from the Person model ('note' -> 'detail__note').
+    """
+    return f'detail__{field_name}' if field_name in PERSON_DETAIL_FIELDS else field_name
+
 
 class Relation(models.Model):
     """
@@ -336,3 +550,231 @@ class Relation(models.Model):
     marr_date_4 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Heiratsdatum 4')
     marr_plac_4 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Heiratsort 4')
     fam_stat_4 = models.CharField(max_length=255, choices=FAMILY_STATUS_CHOICES, null=True, blank=True, verbose_name='Familienstand 4')
+
+
+class AncestorClosure(models.Model):
+    """
+    A closure table of all ancestor/descendant pairs, derived from `Relation.fath_refn` and `Relation.moth_refn`.
+
+    Every person has one row per known ancestor, so "all ancestors of X" and "is X a descendant
+    of Y" are single indexed queries. The table is maintained incrementally by the Relation
+    signals (s. `ancestors/closure.py`) and can be rebuilt with `manage.py rebuild_ancestor_closure`.
+
+    Attributes:
+    - ancestor (ForeignKey): The ancestor.
+    - descendant (ForeignKey): The descendant.
+    - depth (PositiveSmallIntegerField): The number of generations between both persons
+      (1 for a parent); for multiple lines of descent the shortest one is stored.
+    """
+    ancestor = models.ForeignKey(Person, on_delete=models.CASCADE, related_name='descendant_links', verbose_name='Vorfahr')
+    descendant = models.ForeignKey(Person, on_delete=models.CASCADE, related_name='ancestor_links', verbose_name='Nachkomme')
+    depth = models.PositiveSmallIntegerField(verbose_name='Generationen')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='unique_ancestor_descendant'),
+        ]
+        indexes = [
+            models.Index(fields=['descendant', 'depth'], name='closure_descendant_depth_idx'),
+        ]
+
+
+class Union(models.Model):
+    """
+    A marriage or partnership with its children, normalized from the four spouse slots of the
+    `Relation` rows of both partners (s. `ancestors.unions`).
+
+    The table is derived from the Relations and refreshed by the Relation sync, so it is only
+    read: all children or all partners of a person are found with one indexed lookup instead
+    of one join per slot.
+
+    Attributes:
+    - partner_a (ForeignKey): The partner with the lower id, or the only known parent.
+    - partner_b (ForeignKey): The partner with the higher id (empty if unknown).
+    - slot_a, slot_b (PositiveSmallIntegerField): The slot of the marriage in the Relation of partner A / B.
+    - marr_date, marr_plac, fam_stat: The marriage date, place and family status.
+    - children (ManyToManyField): The children, through `UnionChild`.
+    """
+    partner_a = models.ForeignKey(Person, on_delete=models.CASCADE, related_name='unions_as_a', verbose_name='Partner A')
+    partner_b = models.ForeignKey(Person, on_delete=models.CASCADE, null=True, blank=True, related_name='unions_as_b', verbose_name='Partner B')
+    slot_a = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name='Ehe-Nr. bei Partner A')
+    slot_b = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name='Ehe-Nr. bei Partner B')
+    marr_date = models.CharField(max_length=255, null=True, blank=True, verbose_name='Heiratsdatum')
+    marr_plac = models.CharField(max_length=255, null=True, blank=True, verbose_name='Heiratsort')
+    fam_stat = models.CharField(max_length=255, choices=Relation.FAMILY_STATUS_CHOICES, null=True, blank=True, verbose_name='Familienstand')
+    children = models.ManyToManyField(Person, through='UnionChild', related_name='parent_unions', blank=True, verbose_name='Kinder')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['partner_a', 'partner_b'], name='unique_union_partners'),
+        ]
+        indexes = [
+            models.Index(fields=['partner_b', 'partner_a'], name='union_partner_b_idx'),
+        ]
+
+
+class UnionChild(models.Model):
+    """
+    A child of a `Union`.
+
+    Attributes:
+    - union (ForeignKey): The union of the parents.
+    - child (ForeignKey): The child.
+    """
+    union = models.ForeignKey(Union, on_delete=models.CASCADE, related_name='child_links', verbose_name='Ehe')
+    child = models.ForeignKey(Person, on_delete=models.CASCADE, related_name='union_links', verbose_name='Kind')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['union', 'child'], name='unique_union_child'),
+        ]
+        indexes = [
+            models.Index(fields=['child', 'union'], name='union_child_child_idx'),
+        ]
+
+
+REFN_PATTERN = re.compile(r'^@I(\d+)@$')
+
+
+class RefnSequence(models.Model):
+    """
+    A counter for the numbers of new `Person.refn` values ('@I<number>@').
+
+    Numbers are allocated with an atomic `UPDATE ... SET last_value = last_value + n`, which
+    is locked by the database until the transaction ends, so concurrent creates never get the
+    same number and a whole block can be reserved in one round trip.
+
+    Attributes:
+    - name (CharField): The name of the sequence.
+    - last_value (PositiveBigIntegerField): The last allocated number.
+    """
+    PERSON = 'person'
+
+    name = models.CharField(max_length=50, unique=True, verbose_name='Name')
+    last_value = models.PositiveBigIntegerField(default=0, verbose_name='Letzte vergebene Nummer')
+
+    @staticmethod
+    def highest_refn_number():
+        """
+        Return the highest number of all existing refn values; only used to seed the sequence.
+        """
+        numbers = (REFN_PATTERN.match(refn) for refn in Person.objects.filter(refn__startswith='@I').values_list('refn', flat=True))
+        return max((int(match.group(1)) for match in numbers if match), default=0)
+
+    @classmethod
+    def reserve(cls, count, name=PERSON):
+        """
+        Allocate `count` consecutive numbers.
+
+        Parameters:
+        - count: The number of numbers to allocate (at least 1).
+        - name: The name of the sequence.
+
+        Returns:
+        - int: The last allocated number; the block is `last - count + 1` to `last`
+        """
+        if count < 1:
+            raise ValueError('count must be at least 1')
+        with transaction.atomic():
+            if not cls.objects.filter(name=name).update(last_value=F('last_value') + count):
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(name=name, last_value=cls.highest_refn_number() + count)
+                        return cls.objects.get(name=name).last_value
+                except IntegrityError:
+                    # Created concurrently
+                    cls.objects.filter(name=name).update(last_value=F('last_value') + count)
+            return cls.objects.filter(name=name).values_list('last_value', flat=True).get()
+
+    @classmethod
+    def advance_past(cls, refn, name=PERSON):
+        """
+        Make sure that a refn given explicitly (e.g. by an import) is never allocated again.
+
+        Parameters:
+        - refn: The refn value of a new person.
+        - name: The name of the sequence.
+        """
+        match = REFN_PATTERN.match(refn)
+        if match:
+            number = int(match.group(1))
+            cls.objects.filter(name=name, last_value__lt=number).update(last_value=number)
+
+
+class TreeVersion(models.Model):
+    """
+    The version of the family tree data, one row shared by all processes.
+
+    Everything derived from the whole tree (the in-memory genealogy graph, the snapshots, the
+    statistics) is cached per version. The version is incremented with an atomic
+    `UPDATE ... SET version = version + 1` after every transaction that wrote persons or
+    relations (s. `ancestors.versioning`), so every worker sees the change on its next read.
+
+    Attributes:
+    - version (PositiveBigIntegerField): The current version.
+    """
+    ID = 1
+
+    version = models.PositiveBigIntegerField(default=0, verbose_name='Version')
+
+
+class DuplicateCandidate(models.Model):
+    """
+    A pair of persons that are probably the same person, found by `ancestors.duplicates`.
+
+    The pair is stored with the lower person id first. The status is set during the review;
+    reviewed pairs are kept when the detection runs again.
+
+    Attributes:
+    - person_a (ForeignKey): The person with the lower id.
+    - person_b (ForeignKey): The person with the higher id.
+    - score (FloatField): The similarity between 0 and 1.
+    - reasons (JSONField): The compared properties and their contribution to the score.
+    - status (CharField): 'open', 'confirmed' (duplicate) or 'rejected' (different persons).
+    - created_date, reviewed_date, reviewed_by: Metadata of the detection and the review.
+    """
+    OPEN = 'open'
+    CONFIRMED = 'confirmed'
+    REJECTED = 'rejected'
+    STATUS_CHOICES = [
+        (OPEN, 'Offen'),
+        (CONFIRMED, 'Dublette'),
+        (REJECTED, 'Keine Dublette'),
+    ]
+
+    person_a = models.ForeignKey(Person, on_delete=models.CASCADE, related_name='+', verbose_name='Person A')
+    person_b = models.ForeignKey(Person, on_delete=models.CASCADE, related_name='+', verbose_name='Person B')
+    score = models.FloatField(verbose_name='Ähnlichkeit')
+    reasons = models.JSONField(default=dict, blank=True, verbose_name='Begründung')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=OPEN, db_index=True, verbose_name='Status')
+    created_date = models.DateTimeField(auto_now_add=True, verbose_name='Gefunden am')
+    reviewed_date = models.DateTimeField(null=True, blank=True, verbose_name='Geprüft am')
+    reviewed_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name='Geprüft von')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['person_a', 'person_b'], name='unique_duplicate_candidate'),
+        ]
+        indexes = [
+            # The ordering of the review list, best matches first (keyset pagination)
+            models.Index(fields=['-score', 'id'], name='duplicate_score_order_idx'),
+        ]
+
+
+class PersonAlias(models.Model):
+    """
+    A former refn of a person that was merged into another person (s. `ancestors.merge`).
+
+    Links and imports that still use the old refn are resolved to the remaining person.
+
+    Attributes:
+    - refn (CharField): The refn of the merged-away person.
+    - person (ForeignKey): The person it was merged into.
+    - created_date (DateTimeField): When the persons were merged.
+    """
+    refn = models.CharField(max_length=255, unique=True, verbose_name='#REFN')
+    person = models.ForeignKey(Person, on_delete=models.CASCADE, related_name='aliases', verbose_name='Person')
+    created_date = models.DateTimeField(auto_now_add=True, verbose_name='Zusammengeführt am')
+
+    def __str__(self):
+        return self.refn
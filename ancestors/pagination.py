@@ -0,0 +1,203 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import CharField, FloatField, Q, TextField
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a unique, multi-column ordering (keyset pagination).
+
+    Unlike DRF's `CursorPagination`, which positions the cursor on the first ordering field
+    plus an offset, the cursor holds the values of all ordering fields of the last row of a
+    page. The next page is selected with a `(a, b, c) > (x, y, z)` condition, so pages stay
+    stable when rows are inserted or deleted concurrently and the database never has to skip
+    rows. The last ordering field must be unique (usually `id`).
+
+    The ordering should consist of indexed columns (one composite index in the same order),
+    so that a page is read from the index instead of sorting all matching rows.
+
+    Subclasses define:
+    - ordering: The names of the ordering fields, '-' for a descending field (model fields or
+      keys of `annotations`).
+    - annotations: A method returning expressions that are annotated before ordering (optional).
+    """
+    page_size = 100
+    max_page_size = 1000
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering = ('id',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_annotations(self):
+        return {}
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    @property
+    def fields(self):
+        """
+        Return the names of the ordering fields without the direction.
+        """
+        return [field_name.lstrip('-') for field_name in self.ordering]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            position, reverse = cursor['p'], bool(cursor.get('r', False))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        cursor = json.dumps({'p': position, 'r': reverse}, separators=(',', ':'))
+        encoded = urlsafe_b64encode(cursor.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def check_position(self, position, model):
+        """
+        Check that every value of a decoded cursor has the type of its ordering field, so a
+        manipulated cursor never reaches the database.
+        """
+        for field_name, value in zip(self.fields, position):
+            try:
+                field = model._meta.get_field(field_name)
+            except FieldDoesNotExist:
+                # An annotation: any scalar value
+                expected = (str, int, float)
+            else:
+                if isinstance(field, (CharField, TextField)):
+                    expected = (str,)
+                elif isinstance(field, FloatField):
+                    expected = (int, float)
+                else:
+                    expected = (int,)
+            if isinstance(value, bool) or not isinstance(value, expected):
+                raise NotFound(self.invalid_cursor_message)
+
+    def get_position(self, row):
+        if isinstance(row, dict):
+            return [row[field_name] for field_name in self.fields]
+        return [getattr(row, field_name) for field_name in self.fields]
+
+    def keyset_filter(self, position, reverse):
+        """
+        Build the condition selecting all rows after (or, for `reverse`, before) the given position.
+        """
+        condition = Q()
+        for index, field_name in enumerate(self.fields):
+            after = self.ordering[index].startswith('-') == reverse
+            equal_prefix = {name: value for name, value in zip(self.fields[:index], position[:index])}
+            condition |= Q(**equal_prefix, **{f'{field_name}__{"gt" if after else "lt"}': position[index]})
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = remove_query_param(request.build_absolute_uri(), self.cursor_query_param)
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+
+        queryset = queryset.annotate(**self.get_annotations())
+        if position is not None:
+            self.check_position(position, queryset.model)
+            queryset = queryset.filter(self.keyset_filter(position, reverse))
+        order = [
+            (field_name.lstrip('-') if field_name.startswith('-') else f'-{field_name}') if reverse else field_name
+            for field_name in self.ordering
+        ]
+
+        rows = list(queryset.order_by(*order)[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        # Coming from a later page (reverse) there always is a next page, and vice versa
+        has_next = has_more or reverse
+        has_previous = has_more if reverse else position is not None
+
+        self.next_url = None
+        self.previous_url = None
+        if rows and has_next:
+            self.next_url = self.encode_cursor(self.get_position(rows[-1]), False)
+        if rows and has_previous:
+            self.previous_url = self.encode_cursor(self.get_position(rows[0]), True)
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.next_url),
+            ('previous', self.previous_url),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class PersonKeysetPagination(KeysetPagination):
+    """
+    Keyset pagination for persons, ordered by surname, given name and id.
+
+    The stored sort keys are masked the same way as the serialized data: for confidential
+    persons the surname and given name are empty, so the position of a person in the list
+    does not reveal its name (s. `Person.update_sort_keys`).
+    """
+    ordering = ('sort_surn', 'sort_givn', 'id')
+
+
+class PersonBirthKeysetPagination(PersonKeysetPagination):
+    """
+    Keyset pagination for persons, ordered by the earliest possible birth day, surname, given name and id.
+
+    Persons without a known birth day and confidential persons (whose dates are masked) come last.
+    """
+    ordering = ('sort_birth', 'sort_surn', 'sort_givn', 'id')
+
+
+class PersonDescendantsKeysetPagination(PersonKeysetPagination):
+    """
+    Keyset pagination for persons, ordered by the number of descendants (the largest branches
+    first), surname, given name and id.
+
+    The stored key `sort_descendants` is masked like the other sort keys: confidential persons
+    are sorted as if they had no descendants.
+    """
+    ordering = ('-sort_descendants', 'sort_surn', 'sort_givn', 'id')
+
+
+class RelationKeysetPagination(KeysetPagination):
+    """
+    Keyset pagination for relations, ordered by person and id.
+    """
+    ordering = ('person_id', 'id')
+
+
+class DuplicateCandidateKeysetPagination(KeysetPagination):
+    """
+    Keyset pagination for duplicate candidates, best matches first.
+    """
+    ordering = ('-score', 'id')
@@ -0,0 +1,77 @@
+import re
+
+
+UMLAUTS = str.maketrans({'Ä': 'A', 'Ö': 'O', 'Ü': 'U', 'ß': 'S'})
+NON_LETTERS = re.compile(r'[^A-Z]')
+
+VOWELS = set('AEIJOUY')
+
+
+def _letter_code(letter, previous, following, at_start):
+    """
+    Return the Kölner Phonetik digit(s) of a single letter, depending on its neighbours.
+    """
+    if letter in VOWELS:
+        return '0'
+    if letter == 'H':
+        return ''
+    if letter == 'B':
+        return '1'
+    if letter == 'P':
+        return '3' if following == 'H' else '1'
+    if letter in 'DT':
+        return '8' if following in ('C', 'S', 'Z') else '2'
+    if letter in 'FVW':
+        return '3'
+    if letter in 'GKQ':
+        return '4'
+    if letter == 'C':
+        if at_start:
+            return '4' if following in ('A', 'H', 'K', 'L', 'O', 'Q', 'R', 'U', 'X') else '8'
+        if previous in ('S', 'Z'):
+            return '8'
+        return '4' if following in ('A', 'H', 'K', 'O', 'Q', 'U', 'X') else '8'
+    if letter == 'X':
+        return '8' if previous in ('C', 'K', 'Q') else '48'
+    if letter == 'L':
+        return '5'
+    if letter in 'MN':
+        return '6'
+    if letter == 'R':
+        return '7'
+    if letter in 'SZ':
+        return '8'
+    return ''
+
+
+def _word_code(word):
+    letters = NON_LETTERS.sub('', word.upper().translate(UMLAUTS))
+    digits = []
+    for position, letter in enumerate(letters):
+        previous = letters[position - 1] if position else None
+        following = letters[position + 1] if position + 1 < len(letters) else None
+        digits.extend(_letter_code(letter, previous, following, position == 0))
+
+    collapsed = [digit for position, digit in enumerate(digits) if not position or digit != digits[position - 1]]
+    if not collapsed:
+        return ''
+    return collapsed[0] + ''.join(digit for digit in collapsed[1:] if digit != '0')
+
+
+def cologne_phonetics(text):
+    """
+    Return the Kölner Phonetik code of a name.
+
+    The Kölner Phonetik maps German names that sound alike to the same digit string,
+    e.g. 'Kempe', 'Kempa' and 'Kämpe' to '461' or 'Hünten' and 'Huenten' to '0626'.
+    Every word of the text is encoded separately; hyphenated names count as one word.
+
+    Parameters:
+    - text: The name to encode (may be None).
+
+    Returns:
+    - string: The codes of the words separated by spaces, or an empty string
+    """
+    if not text:
+        return ''
+    return ' '.join(code for code in (_word_code(word) for word in text.split()) if code)
@@ -0,0 +1,166 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+from .graph import CHILDREN_FIELDS
+from .maintenance import bulk_maintenance, defer_during_bulk_maintenance
+from .models import Person, PersonAlias, Relation
+
+
+SLOTS = (1, 2, 3, 4)
+QUERY_CHUNK_SIZE = 500
+
+LINK_COLUMNS = ('fath_refn', 'moth_refn') + tuple(f'marr_spou_refn_{slot}' for slot in SLOTS)
+TEXT_COLUMNS = tuple(f'{name}_{slot}' for slot in SLOTS for name in ('marr_date', 'marr_plac', 'fam_stat'))
+
+
+def _chunks(values, size=QUERY_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class RefnResolver:
+    """
+    Resolves refns to person ids with a refn -> id map that is loaded once.
+
+    Refns of merged persons (`PersonAlias`) resolve to the person they were merged into.
+    Refns that are given but do not belong to any person are collected in `unresolved`
+    as (row number, column, refn) instead of being silently dropped.
+    """
+
+    def __init__(self):
+        self.ids = dict(PersonAlias.objects.values_list('refn', 'person_id'))
+        self.ids.update(Person.objects.values_list('refn', 'id'))
+        self.unresolved = []
+
+    def resolve(self, row_number, column, refn):
+        """
+        Return the id of the person with the given refn, or None for an empty or unknown refn.
+        """
+        refn = str(refn).strip() if refn is not None else ''
+        if not refn:
+            return None
+        person_id = self.ids.get(refn)
+        if person_id is None:
+            self.unresolved.append((row_number, column, refn))
+        return person_id
+
+    def resolve_list(self, row_number, column, refns):
+        """
+        Return the ids of the persons in a comma-separated list of refns, without duplicates.
+        """
+        refns = str(refns).split(',') if refns is not None else []
+        ids = (self.resolve(row_number, column, refn) for refn in refns)
+        return list(dict.fromkeys(person_id for person_id in ids if person_id))
+
+
+class RelationImporter:
+    """
+    Imports Relation rows (the columns of `RelationResource`) in bulk.
+
+    All refns are resolved through one `RefnResolver`, the Relations are written with
+    `bulk_update` / `bulk_create` and the children with `bulk_create` on the through tables.
+    The propagation to the related Relations, the refn columns of the persons and the
+    ancestor closure is done once at the end by `bulk_maintenance()`. Columns missing
+    from the rows keep their current values; a row whose person is unknown is skipped.
+    """
+
+    def __init__(self, batch_size=500):
+        """
+        Parameters:
+        - batch_size: The number of rows written per query.
+        """
+        self.batch_size = batch_size
+        self.resolver = None
+        self.changed_relations = set()
+        self.parents_changed = set()
+        self.stats = {'created': 0, 'updated': 0, 'skipped': 0}
+
+    @property
+    def unresolved(self):
+        return self.resolver.unresolved if self.resolver else []
+
+    def run(self, rows):
+        """
+        Import the rows.
+
+        Parameters:
+        - rows: An iterable of dicts, e.g. from `csv.DictReader`; the rows are numbered from 1.
+
+        Returns:
+        - dict: The numbers of created, updated and skipped Relations
+        """
+        with bulk_maintenance(), transaction.atomic():
+            self.resolver = RefnResolver()
+            values, children = {}, {}
+            for row_number, row in enumerate(rows, start=1):
+                person_id = self.resolver.resolve(row_number, 'person', row.get('person'))
+                if person_id is None:
+                    self.stats['skipped'] += 1
+                    continue
+                values[person_id] = {
+                    column: self.resolver.resolve(row_number, column, row[column])
+                    for column in LINK_COLUMNS if column in row
+                }
+                values[person_id].update({column: row[column] or None for column in TEXT_COLUMNS if column in row})
+                children[person_id] = {
+                    column: self.resolver.resolve_list(row_number, column, row[column])
+                    for column in CHILDREN_FIELDS if column in row
+                }
+            relations = self._write_relations(values)
+            self._write_children(relations, children)
+            # Only new and changed Relations are replayed, so re-importing the same file is cheap
+            defer_during_bulk_maintenance('relations', *self.changed_relations)
+            defer_during_bulk_maintenance('closure_persons', *self.parents_changed)
+        return self.stats
+
+    def _write_relations(self, values):
+        existing = {}
+        for chunk in _chunks(values):
+            # A person should only have one Relation; if there are more, the oldest one is used
+            for relation in Relation.objects.filter(person_id__in=chunk).order_by('-id'):
+                existing[relation.person_id] = relation
+
+        relations, changed, changed_fields = {}, [], set()
+        for person_id, row_values in values.items():
+            relation = existing.get(person_id) or Relation(person_id=person_id)
+            fields = set()
+            for column, value in row_values.items():
+                attname = f'{column}_id' if column in LINK_COLUMNS else column
+                if getattr(relation, attname) != value:
+                    setattr(relation, attname, value)
+                    fields.add(column)
+            if relation.pk and fields:
+                changed.append(relation)
+                changed_fields |= fields
+            if not relation.pk or fields & {'fath_refn', 'moth_refn'}:
+                self.parents_changed.add(person_id)
+            relations[person_id] = relation
+
+        # bulk_update builds one CASE expression per column and row, so unchanged values are left out
+        if changed:
+            Relation.objects.bulk_update(changed, sorted(changed_fields), batch_size=self.batch_size)
+        new_relations = [relation for relation in relations.values() if not relation.pk]
+        Relation.objects.bulk_create(new_relations, batch_size=self.batch_size)
+        self.changed_relations.update(relation.pk for relation in changed + new_relations)
+        self.stats['created'] = len(new_relations)
+        self.stats['updated'] = len(relations) - len(new_relations)
+        return relations
+
+    def _write_children(self, relations, children):
+        for field_name in CHILDREN_FIELDS:
+            rows = {relations[person_id].pk: columns[field_name] for person_id, columns in children.items() if field_name in columns}
+            through = getattr(Relation, field_name).through
+            current = defaultdict(set)
+            for chunk in _chunks(rows):
+                for relation_id, child_id in through.objects.filter(relation_id__in=chunk).values_list('relation_id', 'person_id'):
+                    current[relation_id].add(child_id)
+            rows = {relation_id: child_ids for relation_id, child_ids in rows.items() if set(child_ids) != current[relation_id]}
+            self.changed_relations.update(rows)
+            for chunk in _chunks(rows):
+                through.objects.filter(relation_id__in=chunk).delete()
+            through.objects.bulk_create(
+                [through(relation_id=relation_id, person_id=child_id) for relation_id, child_ids in rows.items() for child_id in child_ids],
+                batch_size=self.batch_size
+            )
@@ -0,0 +1,264 @@
+MAX_PATH_LENGTH = 24
+MAX_ANCESTOR_GENERATIONS = 16
+
+SEX_WORDS = {
+    'parent': {'M': 'Vater', 'F': 'Mutter', 'D': 'Elternteil'},
+    'grandparent': {'M': 'großvater', 'F': 'großmutter', 'D': 'großelternteil'},
+    'child': {'M': 'Sohn', 'F': 'Tochter', 'D': 'Kind'},
+    'grandchild': {'M': 'enkel', 'F': 'enkelin', 'D': 'enkelkind'},
+    'sibling': {'M': 'Bruder', 'F': 'Schwester', 'D': 'Geschwister'},
+    'pibling': {'M': 'onkel', 'F': 'tante', 'D': 'onkel/-tante'},
+    'nibling': {'M': 'neffe', 'F': 'nichte', 'D': 'neffe/-nichte'},
+    'cousin': {'M': 'Cousin', 'F': 'Cousine', 'D': 'Cousin/Cousine'},
+    'spouse': {'M': 'Ehemann', 'F': 'Ehefrau', 'D': 'Ehepartner'},
+    'parent_in_law': {'M': 'Schwiegervater', 'F': 'Schwiegermutter', 'D': 'Schwiegerelternteil'},
+    'child_in_law': {'M': 'Schwiegersohn', 'F': 'Schwiegertochter', 'D': 'Schwiegerkind'},
+    'sibling_in_law': {'M': 'Schwager', 'F': 'Schwägerin', 'D': 'Schwager/Schwägerin'},
+}
+
+
+def _word(kind, sex):
+    words = SEX_WORDS[kind]
+    return words.get(sex, words['D'])
+
+
+def _with_prefix(prefix_count, word):
+    """Prefix a lowercase word with 'ur' prefix_count times and capitalize it, e.g. 'Ururgroßvater'."""
+    word = 'ur' * prefix_count + word
+    return word[0].upper() + word[1:]
+
+
+def blood_relationship_label(generations_a, generations_b, sex, half=False):
+    """
+    Return the German label of what person B is to person A.
+
+    Parameters:
+    - generations_a: The number of generations from A up to the most recent common ancestor.
+    - generations_b: The number of generations from B up to the most recent common ancestor.
+    - sex: The sex of person B ('M', 'F' or 'D').
+    - half: Whether both lines only share one of two parents (half siblings, half cousins, ...).
+
+    Returns:
+    - string: The label, e.g. 'Großvater', 'Nichte' or 'Cousine 2. Grades'
+    """
+    if generations_a == 0 and generations_b == 0:
+        return 'dieselbe Person'
+
+    if generations_b == 0:
+        if generations_a == 1:
+            return _word('parent', sex)
+        return _with_prefix(generations_a - 2, _word('grandparent', sex))
+
+    if generations_a == 0:
+        if generations_b == 1:
+            return _word('child', sex)
+        return _with_prefix(generations_b - 2, _word('grandchild', sex))
+
+    if generations_a == 1 and generations_b == 1:
+        label = _word('sibling', sex)
+    elif generations_b == 1:
+        label = _word('pibling', sex)
+        if generations_a > 2:
+            label = 'groß' + label
+        label = _with_prefix(max(generations_a - 3, 0), label)
+    elif generations_a == 1:
+        label = _word('nibling', sex)
+        if generations_b > 2:
+            label = 'groß' + label
+        label = _with_prefix(max(generations_b - 3, 0), label)
+    else:
+        degree = min(generations_a, generations_b) - 1
+        label = _word('cousin', sex)
+        if degree > 1:
+            label = f'{label} {degree}. Grades'
+        removed = abs(generations_a - generations_b)
+        if removed:
+            label = f"{label} ({removed} {'Generation' if removed == 1 else 'Generationen'} versetzt)"
+
+    if half:
+        label = 'Halb' + label[0].lower() + label[1:]
+    return label
+
+
+def find_path(graph, start_id, goal_id, max_length=MAX_PATH_LENGTH):
+    """
+    Find the shortest path between two persons over parent, child and spouse links.
+
+    Uses a bidirectional breadth-first search that always expands the smaller frontier,
+    so only a small part of the tree is visited even for distant relatives.
+
+    Parameters:
+    - graph: The GenealogyGraph to search.
+    - start_id: The id of the first person.
+    - goal_id: The id of the second person.
+    - max_length: The maximum number of links in the path.
+
+    Returns:
+    - list: The person ids along the path (including both ends), or None if no path was found
+    """
+    if start_id == goal_id:
+        return [start_id]
+
+    def neighbours(person_id):
+        return graph.parents(person_id) + graph.children(person_id) + graph.spouses(person_id)
+
+    previous = {start_id: None}
+    following = {goal_id: None}
+    forward, backward = [start_id], [goal_id]
+
+    for _ in range(max_length):
+        if not forward or not backward:
+            return None
+        expand_forward = len(forward) <= len(backward)
+        frontier, visited, other = (forward, previous, following) if expand_forward else (backward, following, previous)
+
+        next_frontier = []
+        meeting_point = None
+        for person_id in frontier:
+            for neighbour in neighbours(person_id):
+                if neighbour in visited:
+                    continue
+                visited[neighbour] = person_id
+                if neighbour in other:
+                    meeting_point = neighbour
+                    break
+                next_frontier.append(neighbour)
+            if meeting_point is not None:
+                break
+
+        if meeting_point is not None:
+            path = []
+            current = meeting_point
+            while current is not None:
+                path.append(current)
+                current = previous[current]
+            path.reverse()
+            current = following[meeting_point]
+            while current is not None:
+                path.append(current)
+                current = following[current]
+            return path
+
+        if expand_forward:
+            forward = next_frontier
+        else:
+            backward = next_frontier
+    return None
+
+
+def find_common_ancestors(graph, person_a_id, person_b_id, max_generations=MAX_ANCESTOR_GENERATIONS):
+    """
+    Find the most recent common ancestors of two persons.
+
+    A person counts as its own ancestor (generation 0), so a direct line is found as well.
+
+    Parameters:
+    - graph: The GenealogyGraph to search.
+    - person_a_id: The id of the first person.
+    - person_b_id: The id of the second person.
+    - max_generations: The maximum number of generations to walk up from each person.
+
+    Returns:
+    - tuple: The list of ancestor ids with the smallest total distance, and the generations
+      from A and from B up to them, or ([], None, None) if there is no common ancestor
+    """
+    ancestors_a = graph.ancestors(person_a_id, max_generations)
+    ancestors_b = graph.ancestors(person_b_id, max_generations)
+    common = set(ancestors_a) & set(ancestors_b)
+    if not common:
+        return [], None, None
+
+    closest = min(ancestors_a[ancestor] + ancestors_b[ancestor] for ancestor in common)
+    nearest = sorted(ancestor for ancestor in common if ancestors_a[ancestor] + ancestors_b[ancestor] == closest)
+    generations_a = min(ancestors_a[ancestor] for ancestor in nearest)
+    nearest = [ancestor for ancestor in nearest if ancestors_a[ancestor] == generations_a]
+    return nearest, generations_a, ancestors_b[nearest[0]]
+
+
+def _is_half_relation(graph, person_a_id, person_b_id, common_ancestors, generations_a, generations_b):
+    """
+    Check whether the two lines below the common ancestors only share one parent.
+
+    Only a single common ancestor with two different children, each with two known parents,
+    is treated as a half relation; missing data never turns a relation into a half relation.
+    """
+    if len(common_ancestors) != 1 or generations_a == 0 or generations_b == 0:
+        return False
+
+    ancestor_id = common_ancestors[0]
+    ancestors_a = graph.ancestors(person_a_id, generations_a - 1)
+    ancestors_b = graph.ancestors(person_b_id, generations_b - 1)
+    branch_a = [p for p, d in ancestors_a.items() if d == generations_a - 1 and ancestor_id in graph.parents(p)]
+    branch_b = [p for p, d in ancestors_b.items() if d == generations_b - 1 and ancestor_id in graph.parents(p)]
+    if not branch_a or not branch_b:
+        return False
+
+    parents_a = set(graph.parents(branch_a[0]))
+    parents_b = set(graph.parents(branch_b[0]))
+    return len(parents_a) == 2 and len(parents_b) == 2 and len(parents_a & parents_b) == 1
+
+
+def describe_relationship(graph, person_a_id, person_b_id, sex_b):
+    """
+    Describe what person B is to person A.
+
+    Blood relations are labelled via the most recent common ancestors. Without a common
+    ancestor, spouses and the closest in-law relations (Schwiegereltern, Schwiegerkinder,
+    Schwager/Schwägerin) are recognized.
+
+    Parameters:
+    - graph: The GenealogyGraph to search.
+    - person_a_id: The id of person A.
+    - person_b_id: The id of person B.
+    - sex_b: The sex of person B used for the label.
+
+    Returns:
+    - dict: The `label`, the `common_ancestors` ids and the `generations` from A and B up to them
+    """
+    common, generations_a, generations_b = find_common_ancestors(graph, person_a_id, person_b_id)
+    if common:
+        half = _is_half_relation(graph, person_a_id, person_b_id, common, generations_a, generations_b)
+        return {
+            'label': blood_relationship_label(generations_a, generations_b, sex_b, half),
+            'common_ancestors': common,
+            'generations': {'a': generations_a, 'b': generations_b},
+        }
+
+    result = {'label': None, 'common_ancestors': [], 'generations': None}
+    if person_b_id in graph.spouses(person_a_id):
+        result['label'] = _word('spouse', sex_b)
+        return result
+
+    for spouse_id in graph.spouses(person_a_id):
+        _, up_spouse, up_b = find_common_ancestors(graph, spouse_id, person_b_id, max_generations=1)
+        if (up_spouse, up_b) == (1, 0):
+            result['label'] = _word('parent_in_law', sex_b)
+            return result
+        if (up_spouse, up_b) == (1, 1):
+            result['label'] = _word('sibling_in_law', sex_b)
+            return result
+
+    for spouse_id in graph.spouses(person_b_id):
+        _, up_a, up_spouse = find_common_ancestors(graph, person_a_id, spouse_id, max_generations=1)
+        if (up_a, up_spouse) == (0, 1):
+            result['label'] = _word('child_in_law', sex_b)
+            return result
+        if (up_a, up_spouse) == (1, 1):
+            result['label'] = _word('sibling_in_law', sex_b)
+            return result
+
+    return result
+
+
+def describe_step(graph, from_id, to_id):
+    """
+    Return the kind of link between two neighbouring persons of a path, seen from the first one.
+
+    Returns:
+    - string: 'parent', 'child' or 'spouse'
+    """
+    if to_id in graph.parents(from_id):
+        return 'parent'
+    if to_id in graph.children(from_id):
+        return 'child'
+    return 'spouse'
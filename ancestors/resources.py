@@ -1,6 +1,16 @@
-from import_export import resources
+from django.db.models import Prefetch
+from import_export import fields, resources
+from .graph import CHILDREN_FIELDS
+from .maintenance import bulk_maintenance
 from .models import Person, Relation
-from django.core.exceptions import ObjectDoesNotExist
+from .relation_import import LINK_COLUMNS, TEXT_COLUMNS, RefnResolver
+
+
+def detail_field(field_name):
+    """
+    Return a resource field for a column of `PersonDetail`, under the same column name as before the split.
+    """
+    return fields.Field(attribute=f'detail__{field_name}', column_name=field_name)
 
 
 class PersonResource(resources.ModelResource):
@@ -21,7 +31,68 @@ class PersonResource(resources.ModelResource):
     - Defines the model (`Person`) that this resource operates on.
     - Specifies the fields to include in the import/export operations.
     - Defines which fields are used as unique identifiers during import operations.
+
+    The notes, sources, change dates, pictures and legacy name and family columns are stored in
+    `PersonDetail`; they keep their column names and are written to the detail row after the
+    person is saved.
     """
+    note = detail_field('note')
+    sour = detail_field('sour')
+    chan_date = detail_field('chan_date')
+    chan_date_time = detail_field('chan_date_time')
+    fath_name = detail_field('fath_name')
+    fath_refn = detail_field('fath_refn')
+    moth_name = detail_field('moth_name')
+    moth_refn = detail_field('moth_refn')
+    marr_spou_name_1 = detail_field('marr_spou_name_1')
+    marr_spou_refn_1 = detail_field('marr_spou_refn_1')
+    fam_husb_1 = detail_field('fam_husb_1')
+    fam_wife_1 = detail_field('fam_wife_1')
+    marr_date_1 = detail_field('marr_date_1')
+    marr_plac_1 = detail_field('marr_plac_1')
+    fam_chil_1 = detail_field('fam_chil_1')
+    fam_marr_1 = detail_field('fam_marr_1')
+    fam_stat_1 = detail_field('fam_stat_1')
+    marr_spou_name_2 = detail_field('marr_spou_name_2')
+    marr_spou_refn_2 = detail_field('marr_spou_refn_2')
+    fam_husb_2 = detail_field('fam_husb_2')
+    fam_wife_2 = detail_field('fam_wife_2')
+    marr_date_2 = detail_field('marr_date_2')
+    marr_plac_2 = detail_field('marr_plac_2')
+    fam_chil_2 = detail_field('fam_chil_2')
+    fam_marr_2 = detail_field('fam_marr_2')
+    fam_stat_2 = detail_field('fam_stat_2')
+    marr_spou_name_3 = detail_field('marr_spou_name_3')
+    marr_spou_refn_3 = detail_field('marr_spou_refn_3')
+    fam_husb_3 = detail_field('fam_husb_3')
+    fam_wife_3 = detail_field('fam_wife_3')
+    marr_date_3 = detail_field('marr_date_3')
+    marr_plac_3 = detail_field('marr_plac_3')
+    fam_chil_3 = detail_field('fam_chil_3')
+    fam_marr_3 = detail_field('fam_marr_3')
+    fam_stat_3 = detail_field('fam_stat_3')
+    marr_spou_name_4 = detail_field('marr_spou_name_4')
+    marr_spou_refn_4 = detail_field('marr_spou_refn_4')
+    fam_husb_4 = detail_field('fam_husb_4')
+    fam_wife_4 = detail_field('fam_wife_4')
+    marr_date_4 = detail_field('marr_date_4')
+    marr_plac_4 = detail_field('marr_plac_4')
+    fam_chil_4 = detail_field('fam_chil_4')
+    fam_marr_4 = detail_field('fam_marr_4')
+    fam_stat_4 = detail_field('fam_stat_4')
+    obje_file_1 = detail_field('obje_file_1')
+    obje_titl_1 = detail_field('obje_titl_1')
+    obje_file_2 = detail_field('obje_file_2')
+    obje_titl_2 = detail_field('obje_titl_2')
+    obje_file_3 = detail_field('obje_file_3')
+    obje_titl_3 = detail_field('obje_titl_3')
+    obje_file_4 = detail_field('obje_file_4')
+    obje_titl_4 = detail_field('obje_titl_4')
+    obje_file_5 = detail_field('obje_file_5')
+    obje_titl_5 = detail_field('obje_titl_5')
+    obje_file_6 = detail_field('obje_file_6')
+    obje_titl_6 = detail_field('obje_titl_6')
+
     class Meta:
         model = Person
         import_id_fields = ('refn', 'uid', 'name')
@@ -47,6 +118,29 @@ class PersonResource(resources.ModelResource):
                   'family_1', 'family_2', 'creation_date', 'last_modified_date',
                   'created_by', 'last_modified_by')
 
+    def filter_export(self, queryset, **kwargs):
+        """
+        Join in the detail rows, so the export needs no query per person.
+        """
+        return queryset.select_related('detail')
+
+    def import_field(self, field, instance, row, is_m2m=False, **kwargs):
+        """
+        Collect the values of the PersonDetail columns; they are saved in `after_save_instance`.
+        """
+        if field.attribute and field.attribute.startswith('detail__'):
+            if field.column_name in row:
+                if not hasattr(instance, '_detail_values'):
+                    instance._detail_values = {}
+                instance._detail_values[field.attribute.removeprefix('detail__')] = field.clean(row, **kwargs)
+            return
+        super().import_field(field, instance, row, is_m2m, **kwargs)
+
+    def after_save_instance(self, instance, row, **kwargs):
+        detail_values = getattr(instance, '_detail_values', None)
+        if instance.pk and detail_values and (any(detail_values.values()) or hasattr(instance, 'detail')):
+            instance.save_detail(**detail_values)
+
 
 class RelationResource(resources.ModelResource):
 
@@ -59,76 +153,60 @@ class RelationResource(resources.ModelResource):
                   'children_3', 'fam_stat_3', 'marr_spou_refn_4', 'marr_date_4',
                   'marr_plac_4', 'children_4', 'fam_stat_4')
         import_id_fields = ('person',)
-
-    def before_import_row(self, row, **kwargs):
-        try:
-            # Mapping person using refn
-            if 'person' in row:
-                refn_value = row['person']
-                person = Person.objects.get(refn=refn_value)
-                row['person'] = person.id  # Set the correct id for ForeignKey reference
-            # Mapping fath_refn using refn
-            if 'fath_refn' in row:
-                refn_value = row['fath_refn']
-                try:
-                    father = Person.objects.get(refn=refn_value)
-                    row['fath_refn'] = father.id  # Set the correct id for ForeignKey reference
-                except Person.DoesNotExist:
-                    row['fath_refn'] = None
-
-            # Mapping moth_refn using refn
-            if 'moth_refn' in row:
-                refn_value = row['moth_refn']
-                try:
-                    mother = Person.objects.get(refn=refn_value)
-                    row['moth_refn'] = mother.id  # Set the correct id for ForeignKey reference
-                except Person.DoesNotExist:
-                    row['moth_refn'] = None
-
-            # Mapping marr_spou_refn_1 using refn
-            if 'marr_spou_refn_1' in row:
-                refn_value = row['marr_spou_refn_1']
-                try:
-                    spouse_1 = Person.objects.get(refn=refn_value)
-                    row['marr_spou_refn_1'] = spouse_1.id  # Set the correct id for ForeignKey reference
-                except Person.DoesNotExist:
-                    row['marr_spou_refn_1'] = None
-
-            # Mapping marr_spou_refn_2 using refn
-            if 'marr_spou_refn_2' in row:
-                refn_value = row['marr_spou_refn_2']
-                try:
-                    spouse_2 = Person.objects.get(refn=refn_value)
-                    row['marr_spou_refn_2'] = spouse_2.id  # Set the correct id for ForeignKey reference
-                except Person.DoesNotExist:
-                    row['marr_spou_refn_2'] = None
-
-            # Mapping marr_spou_refn_3 using refn
-            if 'marr_spou_refn_3' in row:
-                refn_value = row['marr_spou_refn_3']
-                try:
-                    spouse_3 = Person.objects.get(refn=refn_value)
-                    row['marr_spou_refn_3'] = spouse_3.id  # Set the correct id for ForeignKey reference
-                except Person.DoesNotExist:
-                    row['marr_spou_refn_3'] = None
-
-            # Mapping marr_spou_refn_4 using refn
-            if 'marr_spou_refn_4' in row:
-                refn_value = row['marr_spou_refn_4']
-                try:
-                    spouse_4 = Person.objects.get(refn=refn_value)
-                    row['marr_spou_refn_4'] = spouse_4.id  # Set the correct id for ForeignKey reference
-                except Person.DoesNotExist:
-                    row['marr_spou_refn_4'] = None
-                    # Processing children fields
-            for field_name in ['children_1', 'children_2', 'children_3', 'children_4']:
-                if field_name in row:
-                    # Splitting the string of refn values and fetching corresponding Person objects
-                    children_refns = row[field_name].split(',')
-                    children = Person.objects.filter(refn__in=children_refns)
-                    row[field_name] = ','.join([str(child.id) for child in children])  # Store ids as comma-separated string
-        except ObjectDoesNotExist:
-            pass  # Handle cases where a person or child is not found
+        chunk_size = 500
+
+    def filter_export(self, queryset, **kwargs):
+        """
+        Load the linked persons and children with the relations.
+
+        The refns of the persons are joined in (`select_related`) and the children are prefetched
+        per chunk of relations, so the dehydrate methods below run from memory and the number
+        of queries does not depend on the number of relations.
+        """
+        links = ('person',) + LINK_COLUMNS
+        # The admin changelist queryset already prefetches the children (with other fields)
+        return queryset.prefetch_related(None).select_related(*links).only(
+            *(f'{link}__refn' for link in links), *TEXT_COLUMNS
+        ).prefetch_related(
+            *(Prefetch(field_name, queryset=Person.objects.only('refn')) for field_name in CHILDREN_FIELDS)
+        )
+
+    def before_import(self, dataset, **kwargs):
+        """
+        Load the refn -> id map once for the whole import.
+        """
+        self.resolver = RefnResolver()
+
+    def before_import_row(self, row, row_number=None, **kwargs):
+        """
+        Replace the refns of a row by the ids of the persons, using the preloaded map.
+
+        Unknown parent, spouse and child refns are dropped, an unknown person refn is kept
+        (so the row fails). All of them are collected in `self.resolver.unresolved`.
+        """
+        if 'person' in row:
+            row['person'] = self.resolver.resolve(row_number, 'person', row['person']) or row['person']
+        for field_name in LINK_COLUMNS:
+            if field_name in row:
+                row[field_name] = self.resolver.resolve(row_number, field_name, row[field_name])
+        for field_name in CHILDREN_FIELDS:
+            if field_name in row:
+                row[field_name] = ','.join(str(child_id) for child_id in self.resolver.resolve_list(row_number, field_name, row[field_name]))
+
+    def after_import(self, dataset, result, **kwargs):
+        result.unresolved_refns = self.resolver.unresolved
+
+    def import_data(self, dataset, dry_run=False, **kwargs):
+        """
+        Import the rows with the Relation signals suspended; they are replayed once at the end.
+
+        A dry run is imported without `bulk_maintenance()`: the rows are rolled back, so
+        nothing must be replayed and the tree version must not be bumped.
+        """
+        if dry_run:
+            return super().import_data(dataset, dry_run=dry_run, **kwargs)
+        with bulk_maintenance():
+            return super().import_data(dataset, dry_run=dry_run, **kwargs)
 
     def dehydrate_person(self, relation):
         return relation.person.refn
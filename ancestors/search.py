@@ -0,0 +1,233 @@
+import re
+from functools import reduce
+from operator import or_
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Person, person_field_path
+from .phonetics import cologne_phonetics
+
+
+FTS_TABLE = 'ancestors_person_fts'
+SEARCH_FIELDS = ('name', 'surn', 'givn', 'name_marnm', 'birt_plac', 'deat_plac', 'occu', 'note', 'sour')
+# The notes and sources are read from PersonDetail
+SEARCH_PATHS = tuple(person_field_path(field) for field in SEARCH_FIELDS)
+RESTRICTED_SEARCH_FIELDS = ('name',)
+TOKEN_PATTERN = re.compile(r'\w+')
+PHONETIC_FIELDS = ('surn_phonetic', 'givn_phonetic', 'name_marnm_phonetic')
+PREFIX_FIELDS = ('surn', 'givn')
+PREFIX_END = '\U0010ffff'
+REFN_QUERY_PATTERN = re.compile(r'^@?I?(\d+)@?$', re.IGNORECASE)
+
+
+def fts_available():
+    """
+    Return whether the SQLite FTS5 table is used for the person search.
+
+    On other databases the search falls back to `icontains` lookups.
+    """
+    return connection.vendor == 'sqlite'
+
+
+def searchable_values(confidential, values):
+    """
+    Return the values of a person that may be found by the search.
+
+    Persons with `confidential` 'yes' are not searchable at all, for 'restricted' persons
+    only the name (which is visible in the lists) is searchable.
+
+    Parameters:
+    - confidential: The confidentiality of the person.
+    - values: The values of the person in the order of SEARCH_FIELDS.
+
+    Returns:
+    - list or None: The values in the order of SEARCH_FIELDS, or None if the person is not searchable
+    """
+    if confidential == 'yes':
+        return None
+    visible_fields = RESTRICTED_SEARCH_FIELDS if confidential == 'restricted' else SEARCH_FIELDS
+    return [value or '' if field in visible_fields else '' for field, value in zip(SEARCH_FIELDS, values)]
+
+
+def index_person(person):
+    """
+    Write the searchable values of a person into the full-text index.
+
+    The values are read again with the notes and sources of the `PersonDetail`, so the
+    index is also right if only the person or only its detail row was saved.
+    """
+    index_persons([person.pk])
+
+
+def remove_person(person_id):
+    """
+    Remove a person from the full-text index.
+    """
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [person_id])
+
+
+def _searchable_rows(queryset):
+    return queryset.values_list('id', 'confidential', *SEARCH_PATHS).iterator()
+
+
+def _insert_rows(cursor, persons):
+    rows = []
+    for person_id, confidential, *values in persons:
+        values = searchable_values(confidential, values)
+        if values is not None:
+            rows.append([person_id, *values])
+    placeholders = ', '.join(['%s'] * (len(SEARCH_FIELDS) + 1))
+    cursor.executemany(
+        f'INSERT INTO {FTS_TABLE} (rowid, {", ".join(SEARCH_FIELDS)}) VALUES ({placeholders})',
+        rows
+    )
+    return len(rows)
+
+
+def index_persons(person_ids):
+    """
+    Write the searchable values of several persons into the full-text index in one batch.
+
+    Parameters:
+    - person_ids: The ids of the persons; ids of deleted persons are removed from the index.
+    """
+    if not fts_available():
+        return
+    person_ids = list(person_ids)
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [[person_id] for person_id in person_ids])
+        _insert_rows(cursor, _searchable_rows(Person.objects.filter(pk__in=person_ids)))
+
+
+def rebuild_search_index():
+    """
+    Rebuild the full-text index from all persons, e.g. after bulk imports that bypass the signals.
+
+    Returns:
+    - int: The number of indexed persons
+    """
+    if not fts_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        return _insert_rows(cursor, _searchable_rows(Person.objects.all()))
+
+
+def search_tokens(query):
+    """
+    Split a search query into word tokens; all other characters are ignored.
+    """
+    return TOKEN_PATTERN.findall(query)
+
+
+def search_person_ids(queryset, query, limit):
+    """
+    Return the ids of the persons matching a search query, best matches first.
+
+    With FTS5 every token is matched as a prefix in any of the indexed fields and the
+    results are ranked by BM25. The given queryset (e.g. the persons of the user's family
+    trees) is applied inside the same SQL statement, so the limit refers to visible persons.
+
+    Parameters:
+    - queryset: The Person queryset to search in.
+    - query: The search query.
+    - limit: The maximum number of results.
+
+    Returns:
+    - list: The matching person ids
+    """
+    tokens = search_tokens(query)
+    if not tokens:
+        return []
+
+    if not fts_available():
+        return list(_fallback_search(queryset, tokens).values_list('id', flat=True)[:limit])
+
+    match = ' '.join(f'"{token}"*' for token in tokens)
+    visible_sql, visible_params = queryset.values('id').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid IN ({visible_sql}) '
+            f'ORDER BY bm25({FTS_TABLE}) LIMIT %s',
+            [match, *visible_params, limit]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _fallback_search(queryset, tokens):
+    """
+    Search with `icontains` lookups if FTS5 is not available, with the same confidentiality rules.
+    """
+    queryset = queryset.exclude(confidential='yes')
+    for token in tokens:
+        full_match = reduce(or_, (Q(**{f'{field}__icontains': token}) for field in SEARCH_PATHS))
+        name_match = reduce(or_, (Q(**{f'{field}__icontains': token}) for field in RESTRICTED_SEARCH_FIELDS))
+        queryset = queryset.filter((~Q(confidential='restricted') & full_match) | (Q(confidential='restricted') & name_match))
+    return queryset.order_by('name', 'id')
+
+
+def phonetic_search_person_ids(queryset, query, limit):
+    """
+    Return the ids of the persons whose names sound like the words of a search query.
+
+    Every word is encoded with the Kölner Phonetik and has to be equal to the code of the
+    surname, given name or married name of a person, so 'Kämpe Johan' finds 'Johann Kempa'.
+    The codes are stored in indexed columns, so each word is an index lookup. Confidential
+    persons are not searchable.
+
+    Parameters:
+    - queryset: The Person queryset to search in.
+    - query: The search query.
+    - limit: The maximum number of results.
+
+    Returns:
+    - list: The matching person ids, ordered by surname, given name and id
+    """
+    codes = {cologne_phonetics(token) for token in search_tokens(query)} - {''}
+    if not codes:
+        return []
+
+    queryset = queryset.exclude(confidential='yes')
+    for code in codes:
+        queryset = queryset.filter(reduce(or_, (Q(**{field: code}) for field in PHONETIC_FIELDS)))
+    return list(queryset.order_by('surn', 'givn', 'id').values_list('id', flat=True)[:limit])
+
+
+def _prefix_match(field, prefix):
+    # A range instead of LIKE, so the index of the column is used (LIKE in SQLite ignores it)
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': prefix + PREFIX_END})
+
+
+def name_prefix_search(queryset, query):
+    """
+    Find persons for the admin autocomplete by the beginning of their names or by sound.
+
+    A query like '@I12@' or '12' finds the person with this refn. Otherwise every word has to
+    be the beginning of the surname or given name (as typed or capitalized, e.g. 'kem' finds
+    'Kempe') or sound like one of the names (Kölner Phonetik). All conditions are lookups on
+    indexed columns. Unlike the public search, confidential persons are found as well.
+
+    Parameters:
+    - queryset: The Person queryset to search in (e.g. the persons of the editor's family trees).
+    - query: The search query.
+
+    Returns:
+    - QuerySet: The matching persons, ordered by surname, given name and id
+    """
+    refn_match = REFN_QUERY_PATTERN.match(query.strip())
+    if refn_match:
+        return queryset.filter(refn=f'@I{refn_match[1]}@').order_by('surn', 'givn', 'id')
+
+    for token in search_tokens(query):
+        condition = Q()
+        for prefix in {token, token[:1].upper() + token[1:]}:
+            condition |= reduce(or_, (_prefix_match(field, prefix) for field in PREFIX_FIELDS))
+        code = cologne_phonetics(token)
+        if code:
+            condition |= reduce(or_, (Q(**{field: code}) for field in PHONETIC_FIELDS))
+        queryset = queryset.filter(condition)
+    return queryset.order_by('surn', 'givn', 'id')
@@ -1,11 +1,111 @@
+from functools import cached_property
+
+from django.core.files.storage import default_storage
+from django.db.models import Case, CharField, F, IntegerField, Value, When
 from rest_framework import serializers
-from .models import Person, Relation
+from .models import CONFIDENTIAL_VALUES, GENERATION_STAT_FIELDS, DuplicateCandidate, Person, Relation, Union, person_field_path
+
+
+MASKED_PREFIX = 'masked_'
+UNMASKED_FIELDS = ('id', 'confidential')
+
+
+def masked_field_expression(field_name):
+    """
+    Return the SQL expression for a Person field with the confidentiality masking applied.
+
+    The masking matches the serializers below: for `confidential` 'yes' only the id and the
+    confidentiality remain and the name is replaced by 'vertraulich', for 'restricted' the
+    name and refn remain as well. All other fields are replaced by an empty string, the
+    generation statistics by None.
+
+    Fields of `PersonDetail` (e.g. the notes) are joined in from the detail table.
 
+    Parameters:
+    - field_name: The name of the Person or PersonDetail field.
 
-class PersonSerializer(serializers.ModelSerializer):
+    Returns:
+    - Expression: The masked expression
+    """
+    if field_name in UNMASKED_FIELDS:
+        return F(field_name)
+    if field_name == 'name':
+        return Case(When(confidential='yes', then=Value('vertraulich')), default=F('name'), output_field=CharField())
+    if field_name == 'refn':
+        return Case(When(confidential='yes', then=Value('')), default=F('refn'), output_field=CharField())
+    if field_name in GENERATION_STAT_FIELDS:
+        return Case(When(confidential__in=CONFIDENTIAL_VALUES, then=Value(None)), default=F(field_name), output_field=IntegerField())
+    return Case(
+        When(confidential__in=CONFIDENTIAL_VALUES, then=Value('')),
+        default=F(person_field_path(field_name)),
+        output_field=CharField()
+    )
+
+
+def masked_person_values(queryset, field_names, extra_fields=()):
+    """
+    Project a Person queryset onto the given fields with the confidentiality masking done in SQL.
+
+    Only the requested columns are selected, and for confidential persons the masked columns
+    are replaced by constants in the database, so their notes, sources and places are never
+    fetched. The rows are dictionaries meant for the fast path of the Person serializers.
+
+    Parameters:
+    - queryset: The Person queryset.
+    - field_names: The serializer fields to select.
+    - extra_fields: Columns selected as they are, e.g. the stored (already masked) sort keys
+      for the keyset cursor (optional).
+
+    Returns:
+    - QuerySet: A values queryset with the keys `id`, `confidential` and one `masked_<field>` key per other field
+    """
+    extra_fields = [field_name for field_name in extra_fields if field_name not in UNMASKED_FIELDS]
+    return queryset.values(*UNMASKED_FIELDS, *extra_fields, **{
+        MASKED_PREFIX + field_name: masked_field_expression(field_name)
+        for field_name in field_names if field_name not in UNMASKED_FIELDS
+    })
+
+
+class MaskedValuesMixin:
+    """
+    Serializer fast path for rows produced by `masked_person_values`.
+
+    The masking has already been applied by the database, so the dictionary is built directly
+    from the row; only file names are turned into URLs. Model instances are still serialized
+    by the regular `to_representation` of the serializer.
+    """
+    omitted_when_confidential = ()
+
+    def masked_representation(self, instance):
+        data = {
+            field_name: instance[field_name if field_name in UNMASKED_FIELDS else MASKED_PREFIX + field_name]
+            for field_name in self.Meta.fields
+        }
+        for field_name in self.file_fields:
+            if data[field_name]:
+                data[field_name] = self.file_url(data[field_name])
+            elif data.get('confidential') not in CONFIDENTIAL_VALUES:
+                data[field_name] = None
+        if data.get('confidential') == 'yes':
+            for field_name in self.omitted_when_confidential:
+                data.pop(field_name, None)
+        return data
+
+    @cached_property
+    def file_fields(self):
+        return [field_name for field_name in self.Meta.fields if field_name.startswith('obje_file_')]
+
+    def file_url(self, file_name):
+        url = default_storage.url(file_name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+
+class PersonSerializer(MaskedValuesMixin, serializers.ModelSerializer):
     """
     Serializer for the Person model that includes all relevant fields for detailed
-    representation of a person.
+    representation of a person. Rows from `masked_person_values` are serialized by the
+    fast path of `MaskedValuesMixin`.
 
     Fields:
     - id: The unique identifier of the person.
@@ -42,7 +142,21 @@ class PersonSerializer(serializers.ModelSerializer):
     - obje_file_5: File field 5 associated with the person.
     - obje_file_6: File field 6 associated with the person.
     - confidential: Confidentiality status of the person's information.
+
+    The notes, sources, change dates and pictures are stored in `PersonDetail`; on create and
+    update they are written to the detail row of the person.
     """
+    chan_date = serializers.CharField(source='detail.chan_date', max_length=255, allow_null=True, allow_blank=True, required=False)
+    chan_date_time = serializers.CharField(source='detail.chan_date_time', max_length=255, allow_null=True, allow_blank=True, required=False)
+    note = serializers.CharField(source='detail.note', allow_null=True, allow_blank=True, required=False, trim_whitespace=False)
+    sour = serializers.CharField(source='detail.sour', allow_null=True, allow_blank=True, required=False, trim_whitespace=False)
+    obje_file_1 = serializers.FileField(source='detail.obje_file_1', allow_null=True, required=False)
+    obje_file_2 = serializers.FileField(source='detail.obje_file_2', allow_null=True, required=False)
+    obje_file_3 = serializers.FileField(source='detail.obje_file_3', allow_null=True, required=False)
+    obje_file_4 = serializers.FileField(source='detail.obje_file_4', allow_null=True, required=False)
+    obje_file_5 = serializers.FileField(source='detail.obje_file_5', allow_null=True, required=False)
+    obje_file_6 = serializers.FileField(source='detail.obje_file_6', allow_null=True, required=False)
+
     class Meta:
         model = Person
         fields = [
@@ -83,6 +197,8 @@ class PersonSerializer(serializers.ModelSerializer):
         ]
         ref_name = 'AncestorsPersonSerializer'
 
+    omitted_when_confidential = ('refn',)
+
     def to_representation(self, instance):
         """
         Customize the representation of the Person instance based on its confidentiality status.
@@ -95,8 +211,10 @@ class PersonSerializer(serializers.ModelSerializer):
             - If the `confidential` field is 'yes', most fields will be masked (set to empty strings), except for the `id` and `confidential` fields.
             - If the `confidential` field is 'restricted', only the `name` field will be included with its value; all other fields will be masked (set to empty strings).
            - If the `confidential` field is neither 'yes' nor 'restricted', the standard representation is returned.
+           - Rows from `masked_person_values` are already masked and use the fast path.
         """
-        representation = super().to_representation(instance)
+        if isinstance(instance, dict):
+            return self.masked_representation(instance)
         if instance.confidential == 'yes':
             return {
                 'id': instance.id,
@@ -170,13 +288,28 @@ class PersonSerializer(serializers.ModelSerializer):
                 'obje_file_6': '',
                 'confidential': instance.confidential
             }
-        return representation
+        return super().to_representation(instance)
 
+    def create(self, validated_data):
+        detail_values = validated_data.pop('detail', None)
+        instance = super().create(validated_data)
+        if detail_values:
+            instance.save_detail(**detail_values)
+        return instance
 
-class PersonListSerializer(serializers.ModelSerializer):
+    def update(self, instance, validated_data):
+        detail_values = validated_data.pop('detail', None)
+        instance = super().update(instance, validated_data)
+        if detail_values:
+            instance.save_detail(**detail_values)
+        return instance
+
+
+class PersonListSerializer(MaskedValuesMixin, serializers.ModelSerializer):
     """
     Serializer for the Person model that customizes the representation
     of the `Person` instances based on their confidentiality status.
+    Rows from `masked_person_values` are serialized by the fast path of `MaskedValuesMixin`.
 
     Fields:
     - id: The unique identifier of the person.
@@ -211,7 +344,8 @@ class PersonListSerializer(serializers.ModelSerializer):
         Returns:
         - A dictionary representing the serialized data of the Person instance.
         """
-        representation = super().to_representation(instance)
+        if isinstance(instance, dict):
+            return self.masked_representation(instance)
         if instance.confidential == 'yes':
             return {
                 'id': instance.id,
@@ -228,7 +362,7 @@ class PersonListSerializer(serializers.ModelSerializer):
                 'givn': '',
                 'refn': instance.refn
             }
-        return representation
+        return super().to_representation(instance)
 
 
 class RelationSerializer(serializers.ModelSerializer):
@@ -241,3 +375,180 @@ class RelationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Relation
         fields = '__all__'
+
+
+class UnionSerializer(serializers.ModelSerializer):
+    """
+    Serializer for a union (marriage or partnership) with the ids of its children.
+
+    Fields:
+    - id, partner_a, partner_b: The union and the ids of the partners (partner_b may be empty).
+    - marr_date, marr_plac, fam_stat: The marriage date, place and family status.
+    - children: The ids of the children.
+    """
+    children = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+
+    class Meta:
+        model = Union
+        fields = ['id', 'partner_a', 'partner_b', 'marr_date', 'marr_plac', 'fam_stat', 'children']
+
+
+class UnionRelationSerializer(serializers.BaseSerializer):
+    """
+    Read-only serializer rendering the unions of a person in the shape of `RelationSerializer`
+    (parents and four spouse slots with their children), for clients of the Relation endpoints.
+
+    Expects a Person with prefetched `unions_as_a` and `unions_as_b` (each with `children`)
+    and `union_links` (with the union and its partners).
+    """
+    SLOTS = (1, 2, 3, 4)
+
+    def to_representation(self, person):
+        data = {'person': person.id, 'fath_refn': None, 'moth_refn': None}
+        for slot in self.SLOTS:
+            data.update({
+                f'marr_spou_refn_{slot}': None, f'marr_date_{slot}': None, f'marr_plac_{slot}': None,
+                f'fam_stat_{slot}': None, f'children_{slot}': [],
+            })
+
+        for link in person.union_links.all():
+            partners = [partner for partner in (link.union.partner_a, link.union.partner_b) if partner]
+            mother = next((partner for partner in partners if partner.sex == 'F'), None)
+            father = next((partner for partner in partners if partner is not mother), None)
+            data['fath_refn'] = data['fath_refn'] or (father.id if father else None)
+            data['moth_refn'] = data['moth_refn'] or (mother.id if mother else None)
+
+        unions = [(union.slot_a, union.partner_b_id, union) for union in person.unions_as_a.all()]
+        unions += [(union.slot_b, union.partner_a_id, union) for union in person.unions_as_b.all()]
+        used = set()
+        # Unions only listed in the spouse's Relation have no slot of their own and get the free ones
+        for slot, spouse_id, union in sorted(unions, key=lambda entry: (entry[0] is None, entry[0] or 0, entry[2].pk)):
+            if slot is None or slot in used:
+                slot = next((free for free in self.SLOTS if free not in used and free not in {entry[0] for entry in unions}), None)
+                if slot is None:
+                    continue
+            used.add(slot)
+            data.update({
+                f'marr_spou_refn_{slot}': spouse_id, f'marr_date_{slot}': union.marr_date, f'marr_plac_{slot}': union.marr_plac,
+                f'fam_stat_{slot}': union.fam_stat, f'children_{slot}': [child.id for child in union.children.all()],
+            })
+        return data
+
+
+class PersonNodeSerializer(MaskedValuesMixin, serializers.ModelSerializer):
+    """
+    Serializer for the minimal display fields of a person in a chart (pedigree, descendants).
+    Rows from `masked_person_values` are serialized by the fast path of `MaskedValuesMixin`.
+
+    Fields:
+    - id: The unique identifier of the person.
+    - refn: Reference number for the person.
+    - name: The full name of the person.
+    - sex: Gender of the person.
+    - birt_date: Birth date of the person.
+    - deat_date: Date of death.
+    - confidential: Confidentiality status of the person's information.
+    - descendant_count: The number of descendants, e.g. for sizing a chart. All descendants in
+      the closure table are counted, including the ones the user cannot see (other family
+      trees, confidential persons); `has_children` of the tree expansion only looks at the
+      visible children.
+    - ancestor_generations: The number of known ancestor generations.
+    - generation_index: The number of descendant generations.
+    """
+    class Meta:
+        model = Person
+        fields = [
+            'id',
+            'refn',
+            'name',
+            'sex',
+            'birt_date',
+            'deat_date',
+            'confidential',
+            'descendant_count',
+            'ancestor_generations',
+            'generation_index'
+        ]
+
+    def to_representation(self, instance):
+        """
+        Customize the representation of the Person instance based on its confidentiality status.
+
+        If the `confidential` field is 'yes', the name is masked as 'vertraulich' and all
+        other fields except `id` and `confidential` are omitted (the generation statistics are None).
+
+        If the `confidential` field is 'restricted', `name` and `refn` are included as well.
+
+        Parameters:
+        - instance: The Person instance to be serialized.
+
+        Returns:
+        - A dictionary representing the serialized data of the Person instance.
+        """
+        if isinstance(instance, dict):
+            return self.masked_representation(instance)
+        representation = super().to_representation(instance)
+        if instance.confidential == 'yes':
+            return {
+                'id': instance.id,
+                'refn': '',
+                'name': 'vertraulich',
+                'sex': '',
+                'birt_date': '',
+                'deat_date': '',
+                'confidential': instance.confidential,
+                'descendant_count': None,
+                'ancestor_generations': None,
+                'generation_index': None
+            }
+        elif instance.confidential == 'restricted':
+            return {
+                'id': instance.id,
+                'refn': instance.refn,
+                'name': instance.name,
+                'sex': '',
+                'birt_date': '',
+                'deat_date': '',
+                'confidential': instance.confidential,
+                'descendant_count': None,
+                'ancestor_generations': None,
+                'generation_index': None
+            }
+        return representation
+
+
+class DuplicateCandidateSerializer(serializers.ModelSerializer):
+    """
+    Serializer for a probable duplicate pair of persons, used for the review by staff users.
+
+    Only the status can be changed; the persons are included with their display fields.
+
+    Fields:
+    - id, score, reasons, status, created_date, reviewed_date, reviewed_by
+    - person_a, person_b: The two persons (see `PersonNodeSerializer`).
+    """
+    person_a = PersonNodeSerializer(read_only=True)
+    person_b = PersonNodeSerializer(read_only=True)
+
+    class Meta:
+        model = DuplicateCandidate
+        fields = ['id', 'person_a', 'person_b', 'score', 'reasons', 'status', 'created_date', 'reviewed_date', 'reviewed_by']
+        read_only_fields = ['score', 'reasons', 'created_date', 'reviewed_date', 'reviewed_by']
+
+
+class PersonExpansionSerializer(PersonNodeSerializer):
+    """
+    Serializer for a node of a lazily expanded tree: the fields of `PersonNodeSerializer` plus
+    the flags for the expand arrows.
+
+    The instances have to be annotated with `ancestors.closure.expansion_annotations()`.
+
+    Additional fields:
+    - has_parents: Whether the person has visible parents.
+    - has_children: Whether the person has visible children.
+    """
+    def to_representation(self, instance):
+        representation = super().to_representation(instance)
+        representation['has_parents'] = instance.has_parents
+        representation['has_children'] = instance.has_children
+        return representation
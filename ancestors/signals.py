@@ -1,34 +1,45 @@
 import os
 from django.conf import settings
+from django.db.models import Q
 from django.dispatch import receiver
-from django.db.models.signals import post_save, post_delete, pre_save, m2m_changed
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete, m2m_changed
 
+from .closure import get_ancestor_ids, refresh_closure, refresh_generation_stats
+from .maintenance import bulk_maintenance_active, defer_during_bulk_maintenance
+from .search import index_person, index_persons, remove_person
+from .sync import sync_relations
+from .unions import refresh_unions
 from .tasks import rename_image
-from .models import Person, Relation
+from .models import Person, PersonDetail, Relation, Union
+from .versioning import bump_tree_version
 
 
-@receiver(post_save, sender=Person)
+@receiver(post_save, sender=PersonDetail)
 def rename_files_on_save(sender, instance, created, **kwargs):
     """
-    After saving a Person instance, this function renames associated file fields.
+    After saving a PersonDetail instance, this function renames associated file fields.
 
     This function checks if any file fields (obje_file_1 to obje_file_6) are present on the instance.
     If files are found, their names are altered based on the instance's attributes. The old file paths
-    are then renamed to the new paths within the MEDIA_ROOT directory. The database fields are updated
-    with the new file names. To avoid recursive calls to this post-save signal, a flag
-    (_performing_post_save) is used.
+    are then renamed to the new paths within the MEDIA_ROOT directory. If a file was renamed, the
+    database fields are updated with the new file names. To avoid recursive calls to this post-save
+    signal, a flag (_performing_post_save) is used.
 
     Parameters:
-    - sender: The model class (Person) that sent the signal.
-    - instance: The instance of the Person being saved.
+    - sender: The model class (PersonDetail) that sent the signal.
+    - instance: The instance of the PersonDetail being saved.
     - created: A boolean indicating if the instance was created (True) or updated (False).
     - kwargs: Additional keyword arguments.
     """
+    if bulk_maintenance_active():
+        return
+
     if not hasattr(instance, '_performing_post_save'):
         instance._performing_post_save = False
 
     if not instance._performing_post_save:
         instance._performing_post_save = True
+        renamed = False
 
         for i in range(1, 7):
             field_name = f'obje_file_{i}'
@@ -48,27 +59,29 @@ def rename_files_on_save(sender, instance, created, **kwargs):
 
                     # Update the path in the database field
                     file_field.name = new_path
+                    renamed = True
 
-        instance.save(update_fields=[f'obje_file_{i}' for i in range(1, 7)])
+        if renamed:
+            instance.save(update_fields=[f'obje_file_{i}' for i in range(1, 7)])
         instance._performing_post_save = False
 
 
-@receiver(pre_save, sender=Person)
+@receiver(pre_save, sender=PersonDetail)
 def delete_old_files_on_update(sender, instance, **kwargs):
     """
-    Before saving an updated Person instance, this function deletes old files.
+    Before saving an updated PersonDetail instance, this function deletes old files.
 
-    This function checks if the Person instance already exists in the database (by checking the primary key).
+    This function checks if the PersonDetail instance already exists in the database (by checking the primary key).
     If the instance exists and the file fields (obje_file_1 to obje_file_6) are being updated, the old files
     associated with these fields are deleted from the file system.
 
     Parameters:
-    - sender: The model class (Person) that sent the signal.
-    - instance: The instance of the Person being updated.
+    - sender: The model class (PersonDetail) that sent the signal.
+    - instance: The instance of the PersonDetail being updated.
     - kwargs: Additional keyword arguments.
     """
-    if not instance.pk:
-        return False  # No action needed for new instances
+    if not instance.pk or bulk_maintenance_active():
+        return False  # No action needed for new instances and during bulk maintenance
 
     try:
         old_instance = sender.objects.get(pk=instance.pk)
@@ -85,17 +98,17 @@ def delete_old_files_on_update(sender, instance, **kwargs):
                 os.remove(old_file.path)
 
 
-@receiver(post_delete, sender=Person)
+@receiver(post_delete, sender=PersonDetail)
 def delete_files_on_delete(sender, instance, **kwargs):
     """
-    After a Person instance is deleted, this function removes associated files from the file system.
+    After a PersonDetail instance is deleted (also with its person), this function removes associated files from the file system.
 
     This function iterates over the file fields (obje_file_1 to obje_file_6) and deletes the files from
     the file system if they exist.
 
     Parameters:
-    - sender: The model class (Person) that sent the signal.
-    - instance: The instance of the Person being deleted.
+    - sender: The model class (PersonDetail) that sent the signal.
+    - instance: The instance of the PersonDetail being deleted.
     - kwargs: Additional keyword arguments.
     """
     for i in range(1, 7):
@@ -108,231 +121,272 @@ def delete_files_on_delete(sender, instance, **kwargs):
 
 
 @receiver(post_save, sender=Relation)
-def update_own_person_fields(sender, instance, **kwargs):
-    if instance.fath_refn:
-        print(instance.fath_refn.refn)
-        instance.person.fath_refn = instance.fath_refn.refn
-    if instance.moth_refn:
-        instance.person.moth_refn = instance.moth_refn.refn
-    if instance.marr_spou_refn_1:
-        instance.person.marr_spou_refn_1 = instance.marr_spou_refn_1.refn
-        instance.person.marr_date_1 = instance.marr_date_1
-        instance.person.marr_plac_1 = instance.marr_plac_1
-    if instance.marr_spou_refn_2:
-        instance.person.marr_spou_refn_2 = instance.marr_spou_refn_2.refn
-        instance.person.marr_date_2 = instance.marr_date_2
-        instance.person.marr_plac_2 = instance.marr_plac_2
-    if instance.marr_spou_refn_3:
-        instance.person.marr_spou_refn_3 = instance.marr_spou_refn_3.refn
-        instance.person.marr_date_3 = instance.marr_date_3
-        instance.person.marr_plac_3 = instance.marr_plac_3
-    if instance.marr_spou_refn_4:
-        instance.person.marr_spou_refn_4 = instance.marr_spou_refn_4.refn
-        instance.person.marr_date_4 = instance.marr_date_4
-        instance.person.marr_plac_4 = instance.marr_plac_4
-    if instance.children_1.exists():
-        instance.person.fam_chil_1 = ','.join(child.refn for child in instance.children_1.all())
-    if instance.children_2.exists():
-        instance.person.fam_chil_2 = ','.join(child.refn for child in instance.children_1.all())
-    if instance.children_3.exists():
-        instance.person.fam_chil_3 = ','.join(child.refn for child in instance.children_1.all())
-    if instance.children_4.exists():
-        instance.person.fam_chil_4 = ','.join(child.refn for child in instance.children_1.all())
-
-    instance.person.save()
+def sync_related_data(sender, instance, **kwargs):
+    """
+    After saving a Relation instance, this function propagates it to the related Relations and persons.
 
+    Spouses, children and parents get the corresponding links in their own Relations, and the
+    refn columns of the affected person details are updated (s. `ancestors/sync.py`). All changes are
+    written in bulk and do not send further signals.
 
-@receiver(post_save, sender=Relation)
-def update_child_person_fields(sender, instance, **kwargs):
-    for child in instance.children_1.all():
-        if instance.person.sex == 'F':
-            child.moth_refn = instance.person.refn
-            if instance.marr_spou_refn_1:
-                child.fath_refn = instance.marr_spou_refn_1.refn
-        else:
-            child.fath_refn = instance.person.refn
-            if instance.marr_spou_refn_1:
-                child.moth_refn = instance.marr_spou_refn_1.refn
-        child.save()
-    for child in instance.children_2.all():
-        if instance.person.sex == 'F':
-            child.moth_refn = instance.person.refn
-            if instance.marr_spou_refn_2:
-                child.fath_refn = instance.marr_spou_refn_2.refn
-        else:
-            child.fath_refn = instance.person.refn
-            if instance.marr_spou_refn_2:
-                child.moth_refn = instance.marr_spou_refn_2.refn
-        child.save()
-    for child in instance.children_3.all():
-        if instance.person.sex == 'F':
-            child.moth_refn = instance.person.refn
-            if instance.marr_spou_refn_3:
-                child.fath_refn = instance.marr_spou_refn_3.refn
-        else:
-            child.fath_refn = instance.person.refn
-            if instance.marr_spou_refn_3:
-                child.moth_refn = instance.marr_spou_refn_3.refn
-        child.save()
-    for child in instance.children_4.all():
-        if instance.person.sex == 'F':
-            child.moth_refn = instance.person.refn
-            if instance.marr_spou_refn_4:
-                child.fath_refn = instance.marr_spou_refn_4.refn
-        else:
-            child.fath_refn = instance.person.refn
-            if instance.marr_spou_refn_4:
-                child.moth_refn = instance.marr_spou_refn_4.refn
-        child.save()
+    Parameters:
+    - sender: The model class (Relation) that sent the signal.
+    - instance: The instance of the Relation being saved.
+    - kwargs: Additional keyword arguments.
+    """
+    if defer_during_bulk_maintenance('relations', instance.pk):
+        return
+    sync_relations([instance])
 
 
-@receiver(post_save, sender=Relation)
-def update_spouse_person_fields(sender, instance, **kwargs):
-
-    def update_spouse(spouse_field, spouse_date, spouse_place, children_field, next_spouse_field):
-        spouse = getattr(instance, spouse_field)
-        if spouse:
-            if not getattr(spouse, spouse_field) or getattr(spouse, spouse_field) == instance.person.refn:
-                setattr(spouse, spouse_field, instance.person.refn)
-                setattr(spouse, spouse_date, getattr(instance, spouse_date))
-                setattr(spouse, spouse_place, getattr(instance, spouse_place))
-                setattr(spouse, children_field, getattr(instance.person, children_field))
-            elif getattr(spouse, next_spouse_field) in [None, '']:
-                setattr(spouse, next_spouse_field, instance.person.refn)
-            spouse.save()
-
-            if spouse:
-                for i in range(1, 5):
-                    if not getattr(spouse, f'marr_spou_refn_{i}') or getattr(spouse, f'marr_spou_refn_{i}') == instance.person.refn:
-                        setattr(spouse, f'marr_spou_refn_{i}', instance.person.refn)
-                        setattr(spouse, f'marr_date_{i}', getattr(instance, spouse_date))
-                        setattr(spouse, f'marr_plac_{i}', getattr(instance, spouse_place))
-                        setattr(spouse, f'fam_chil_{i}', getattr(instance.person, children_field))
-                        spouse.save()
-                        break
-
-    update_spouse('marr_spou_refn_1', 'marr_date_1', 'marr_plac_1', 'fam_chil_1', 'marr_spou_refn_2')
-    update_spouse('marr_spou_refn_2', 'marr_date_2', 'marr_plac_2', 'fam_chil_2', 'marr_spou_refn_3')
-    update_spouse('marr_spou_refn_3', 'marr_date_3', 'marr_plac_3', 'fam_chil_3', 'marr_spou_refn_4')
-    update_spouse('marr_spou_refn_4', 'marr_date_4', 'marr_plac_4', 'fam_chil_4', None)
+@receiver(m2m_changed, sender=Relation.children_1.through)
+@receiver(m2m_changed, sender=Relation.children_2.through)
+@receiver(m2m_changed, sender=Relation.children_3.through)
+@receiver(m2m_changed, sender=Relation.children_4.through)
+def sync_related_data_on_children_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    After the children of a Relation changed, this function propagates the Relation like `sync_related_data`.
 
+    Parameters:
+    - sender: The through model of the changed children field.
+    - instance: The Relation whose children changed, or the child Person if changed from the reverse side.
+    - action: The type of change ("post_add", "post_remove", ...).
+    - reverse: Whether the change was made from the Person side.
+    - pk_set: The ids of the added or removed objects.
+    - kwargs: Additional keyword arguments.
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if defer_during_bulk_maintenance('relations', *([instance.pk] if not reverse else pk_set or [])):
+        return
+    if not reverse:
+        sync_relations([instance])
+    elif pk_set:
+        sync_relations(Relation.objects.filter(pk__in=pk_set))
 
-@receiver(post_save, sender=Relation)
-def update_or_create_spouse_relation(sender, instance, created, **kwargs):
-    if getattr(instance, '_updating', False):
+
+@receiver([post_save, post_delete], sender=Person)
+@receiver([post_save, post_delete], sender=Relation)
+@receiver(m2m_changed, sender=Relation.children_1.through)
+@receiver(m2m_changed, sender=Relation.children_2.through)
+@receiver(m2m_changed, sender=Relation.children_3.through)
+@receiver(m2m_changed, sender=Relation.children_4.through)
+def invalidate_tree_caches(sender, **kwargs):
+    """
+    After any write to a Person, a Relation or a children list, this function bumps the tree version.
+
+    Everything derived from the whole tree (such as the in-memory genealogy graph) is keyed on
+    the tree version and is rebuilt lazily on its next use.
+
+    Parameters:
+    - sender: The model class or through model that sent the signal.
+    - kwargs: Additional keyword arguments.
+    """
+    if kwargs.get('action', 'post_').startswith('pre_'):
+        return
+    if defer_during_bulk_maintenance(None):
         return
+    bump_tree_version()
 
-    spouse_fields_instance = [
-        ('marr_spou_refn_1', 'marr_date_1', 'marr_plac_1'),
-        ('marr_spou_refn_2', 'marr_date_2', 'marr_plac_2'),
-        ('marr_spou_refn_3', 'marr_date_3', 'marr_plac_3'),
-        ('marr_spou_refn_4', 'marr_date_4', 'marr_plac_4')
-    ]
 
-    for spou_refn_field, date_field, plac_field in spouse_fields_instance:
-        spouse_refn = getattr(instance, spou_refn_field)
-        if spouse_refn:
-            spouse_relation, created = Relation.objects.get_or_create(person=spouse_refn)
-
-            # Verhindere eine Endlosschleife
-            spouse_relation._updating = True
-
-            spouse_fields_spouse = [
-                ('marr_spou_refn_1', 'marr_date_1', 'marr_plac_1'),
-                ('marr_spou_refn_2', 'marr_date_2', 'marr_plac_2'),
-                ('marr_spou_refn_3', 'marr_date_3', 'marr_plac_3'),
-                ('marr_spou_refn_4', 'marr_date_4', 'marr_plac_4')
-            ]
-
-            # Durchlaufe die Felder beim Ehepartner, um das entsprechende Datum und den Ort zu setzen
-            for spou_refn_field_spouse, date_field_spouse, plac_field_spouse in spouse_fields_spouse:
-                if getattr(spouse_relation, spou_refn_field_spouse) == instance.person:
-                    if getattr(instance, date_field):
-                        setattr(spouse_relation, date_field_spouse, getattr(instance, date_field))
-                    if getattr(instance, plac_field):
-                        setattr(spouse_relation, plac_field_spouse, getattr(instance, plac_field))
-                    break
-                elif not getattr(spouse_relation, spou_refn_field_spouse):
-                    setattr(spouse_relation, spou_refn_field_spouse, instance.person)
-                    setattr(spouse_relation, date_field_spouse, getattr(instance, date_field))
-                    setattr(spouse_relation, plac_field_spouse, getattr(instance, plac_field))
-                    break
-
-            spouse_relation.save()
-            spouse_relation._updating = False
+@receiver(pre_save, sender=Relation)
+def remember_parent_links(sender, instance, **kwargs):
+    """
+    Before saving a Relation instance, this function stores the currently saved person and parents.
 
+    The stored values are compared in `update_ancestor_closure` to decide whether the closure
+    table has to be refreshed.
 
-@receiver(m2m_changed, sender=Relation.children_1.through)
-def update_or_create_child_relation(sender, instance, action, reverse, model, pk_set, **kwargs):
-    if action in ["post_add", "post_remove", "post_clear"]:
-        for child_id in pk_set:
-            child = Person.objects.get(pk=child_id)
-            relation, created = Relation.objects.get_or_create(person=child)
-
-            # Verhindere Endlosschleifen
-            relation._updating = True
-
-            if instance.person.sex == 'F':
-                relation.moth_refn = instance.person
-            elif instance.person.sex == 'M':
-                relation.fath_refn = instance.person
-            else:
-                # Wenn das Geschlecht 'D' ist oder nicht angegeben, finde eine freie Stelle
-                if not relation.fath_refn:
-                    relation.fath_refn = instance.person
-                elif not relation.moth_refn:
-                    relation.moth_refn = instance.person
-
-            relation.save()
-            relation._updating = False
+    Parameters:
+    - sender: The model class (Relation) that sent the signal.
+    - instance: The instance of the Relation being saved.
+    - kwargs: Additional keyword arguments.
+    """
+    instance._saved_parent_links = None
+    if instance.pk and not bulk_maintenance_active():
+        instance._saved_parent_links = sender.objects.filter(pk=instance.pk).values_list(
+            'person_id', 'fath_refn_id', 'moth_refn_id'
+        ).first()
 
 
 @receiver(post_save, sender=Relation)
-def update_parent_relations(sender, instance, **kwargs):
-    # Verhindere Endlosschleifen
-    if getattr(instance, '_updating', False):
+def update_ancestor_closure(sender, instance, created, **kwargs):
+    """
+    After saving a Relation instance, this function refreshes the ancestor closure table if the parents changed.
+
+    Only the person of the relation (and, if the relation was moved to another person, the
+    previous person) and their descendants are recomputed.
+
+    Parameters:
+    - sender: The model class (Relation) that sent the signal.
+    - instance: The instance of the Relation being saved.
+    - created: A boolean indicating if the instance was created (True) or updated (False).
+    - kwargs: Additional keyword arguments.
+    """
+    if defer_during_bulk_maintenance('closure_persons', instance.person_id):
+        return
+
+    saved_links = getattr(instance, '_saved_parent_links', None)
+    current_links = (instance.person_id, instance.fath_refn_id, instance.moth_refn_id)
+    if saved_links == current_links:
+        return
+
+    affected = {instance.person_id}
+    if saved_links:
+        affected.add(saved_links[0])
+    refresh_closure(affected)
+    instance._saved_parent_links = current_links
+
+
+@receiver(post_delete, sender=Relation)
+def update_ancestor_closure_on_delete(sender, instance, **kwargs):
+    """
+    After a Relation instance is deleted, this function removes the parent links of its person from the closure table.
+
+    Parameters:
+    - sender: The model class (Relation) that sent the signal.
+    - instance: The instance of the Relation being deleted.
+    - kwargs: Additional keyword arguments.
+    """
+    # When the person itself is deleted, its children are handled by update_ancestor_closure_on_person_delete
+    origin = kwargs.get('origin')
+    if isinstance(origin, Person) or getattr(origin, 'model', None) is Person:
         return
+    if defer_during_bulk_maintenance('closure_persons', instance.person_id):
+        return
+    refresh_closure([instance.person_id])
+
+
+@receiver(pre_delete, sender=Person)
+def remember_children(sender, instance, **kwargs):
+    """
+    Before a Person instance is deleted, this function stores the ids of its children and ancestors.
 
-    # Logik für Mutter (moth_refn)
-    if instance.moth_refn:
-        mother_relation, created = Relation.objects.get_or_create(person=instance.moth_refn)
-        mother_relation._updating = True
-
-        # Finde den passenden Ehemann (fath_refn)
-        if mother_relation.marr_spou_refn_1 is None or mother_relation.marr_spou_refn_1 == instance.fath_refn:
-            mother_relation.marr_spou_refn_1 = instance.fath_refn
-            mother_relation.children_1.add(instance.person)
-        elif mother_relation.marr_spou_refn_2 is None or mother_relation.marr_spou_refn_2 == instance.fath_refn:
-            mother_relation.marr_spou_refn_2 = instance.fath_refn
-            mother_relation.children_2.add(instance.person)
-        elif mother_relation.marr_spou_refn_3 is None or mother_relation.marr_spou_refn_3 == instance.fath_refn:
-            mother_relation.marr_spou_refn_3 = instance.fath_refn
-            mother_relation.children_3.add(instance.person)
-        elif mother_relation.marr_spou_refn_4 is None or mother_relation.marr_spou_refn_4 == instance.fath_refn:
-            mother_relation.marr_spou_refn_4 = instance.fath_refn
-            mother_relation.children_4.add(instance.person)
-
-        mother_relation.save()
-        mother_relation._updating = False
-
-    # Logik für Vater (fath_refn)
-    if instance.fath_refn:
-        father_relation, created = Relation.objects.get_or_create(person=instance.fath_refn)
-        father_relation._updating = True
-
-        # Finde die passende Ehefrau (moth_refn)
-        if father_relation.marr_spou_refn_1 is None or father_relation.marr_spou_refn_1 == instance.moth_refn:
-            father_relation.marr_spou_refn_1 = instance.moth_refn
-            father_relation.children_1.add(instance.person)
-        elif father_relation.marr_spou_refn_2 is None or father_relation.marr_spou_refn_2 == instance.moth_refn:
-            father_relation.marr_spou_refn_2 = instance.moth_refn
-            father_relation.children_2.add(instance.person)
-        elif father_relation.marr_spou_refn_3 is None or father_relation.marr_spou_refn_3 == instance.moth_refn:
-            father_relation.marr_spou_refn_3 = instance.moth_refn
-            father_relation.children_3.add(instance.person)
-        elif father_relation.marr_spou_refn_4 is None or father_relation.marr_spou_refn_4 == instance.moth_refn:
-            father_relation.marr_spou_refn_4 = instance.moth_refn
-            father_relation.children_4.add(instance.person)
-
-        father_relation.save()
-        father_relation._updating = False
+    Parameters:
+    - sender: The model class (Person) that sent the signal.
+    - instance: The instance of the Person being deleted.
+    - kwargs: Additional keyword arguments.
+    """
+    instance._child_ids = list(
+        Relation.objects.filter(
+            Q(fath_refn=instance) | Q(moth_refn=instance)
+        ).values_list('person_id', flat=True)
+    )
+    instance._ancestor_ids = list(get_ancestor_ids(instance.pk))
+
+
+@receiver(post_delete, sender=Person)
+def update_ancestor_closure_on_person_delete(sender, instance, **kwargs):
+    """
+    After a Person instance is deleted, this function refreshes the closure rows of its former children.
+
+    The rows of the deleted person itself are removed by the database cascade, but the rows
+    linking its children to its own ancestors have to be recomputed, and its ancestors lose
+    descendants.
+
+    Parameters:
+    - sender: The model class (Person) that sent the signal.
+    - instance: The instance of the Person being deleted.
+    - kwargs: Additional keyword arguments.
+    """
+    refresh_closure(getattr(instance, '_child_ids', []))
+    refresh_generation_stats(getattr(instance, '_ancestor_ids', []))
+
+
+@receiver(post_save, sender=Person)
+def update_search_index(sender, instance, **kwargs):
+    """
+    After saving a Person instance, this function writes its searchable values into the full-text index.
+
+    Parameters:
+    - sender: The model class (Person) that sent the signal.
+    - instance: The instance of the Person being saved.
+    - kwargs: Additional keyword arguments.
+    """
+    if defer_during_bulk_maintenance('indexed_persons', instance.pk):
+        return
+    index_person(instance)
+
+
+@receiver(post_delete, sender=Person)
+def remove_from_search_index(sender, instance, **kwargs):
+    """
+    After a Person instance is deleted, this function removes it from the full-text index.
+
+    Parameters:
+    - sender: The model class (Person) that sent the signal.
+    - instance: The instance of the Person being deleted.
+    - kwargs: Additional keyword arguments.
+    """
+    remove_person(instance.pk)
+
+
+@receiver(post_save, sender=PersonDetail)
+@receiver(post_delete, sender=PersonDetail)
+def update_search_index_on_detail_change(sender, instance, **kwargs):
+    """
+    After a PersonDetail instance is saved or deleted, this function updates the full-text index of its person,
+    as the notes and sources are searchable.
+
+    Parameters:
+    - sender: The model class (PersonDetail) that sent the signal.
+    - instance: The instance of the PersonDetail being saved or deleted.
+    - kwargs: Additional keyword arguments.
+    """
+    if defer_during_bulk_maintenance('indexed_persons', instance.person_id):
+        return
+    index_persons([instance.person_id])
+
+
+@receiver(post_delete, sender=Relation)
+def update_unions_on_delete(sender, instance, **kwargs):
+    """
+    After a Relation instance is deleted, this function rebuilds the unions of its person, parents and spouses.
+
+    Parameters:
+    - sender: The model class (Relation) that sent the signal.
+    - instance: The instance of the Relation being deleted.
+    - kwargs: Additional keyword arguments.
+    """
+    person_ids = [instance.person_id, instance.fath_refn_id, instance.moth_refn_id] + [
+        getattr(instance, f'marr_spou_refn_{slot}_id') for slot in range(1, 5)
+    ]
+    if defer_during_bulk_maintenance('union_persons', *person_ids):
+        return
+    refresh_unions(person_ids)
+
+
+@receiver(pre_delete, sender=Person)
+def remember_partners(sender, instance, **kwargs):
+    """
+    Before a Person instance is deleted, this function stores the ids of its partners.
+
+    Parameters:
+    - sender: The model class (Person) that sent the signal.
+    - instance: The instance of the Person being deleted.
+    - kwargs: Additional keyword arguments.
+    """
+    instance._partner_ids = [
+        partner_id for partners in Union.objects.filter(
+            Q(partner_a=instance) | Q(partner_b=instance)
+        ).values_list('partner_a_id', 'partner_b_id') for partner_id in partners if partner_id != instance.pk
+    ]
+
+
+@receiver(post_delete, sender=Person)
+def update_unions_on_person_delete(sender, instance, **kwargs):
+    """
+    After a Person instance is deleted, this function rebuilds the unions of its former partners.
+
+    The unions of the deleted person itself are removed by the database cascade, but the
+    children of the partners' marriages with it now belong to a union of the partner alone.
+
+    Parameters:
+    - sender: The model class (Person) that sent the signal.
+    - instance: The instance of the Person being deleted.
+    - kwargs: Additional keyword arguments.
+    """
+    partner_ids = getattr(instance, '_partner_ids', [])
+    if defer_during_bulk_maintenance('union_persons', *partner_ids):
+        return
+    refresh_unions(partner_ids)
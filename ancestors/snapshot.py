@@ -0,0 +1,123 @@
+import re
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from .graph import get_genealogy_graph
+from .models import CONFIDENTIAL_VALUES, Person
+from .versioning import get_tree_version
+
+
+SNAPSHOT_CACHE_TIMEOUT = 60 * 60 * 24
+YEAR_PATTERN = re.compile(r'\b(\d{4})\b')
+
+
+def extract_year(date_text, formatted_date=None):
+    """
+    Return the year of a date, preferring the formatted date over the free-text date.
+
+    Parameters:
+    - date_text: The free-text date from Ahnenblatt (e.g. '12.03.1901', 'ABT 1850').
+    - formatted_date: The automatically formatted date, if any.
+
+    Returns:
+    - int or None: The year, or None if no four-digit year is found
+    """
+    if formatted_date:
+        return formatted_date.year
+    if date_text:
+        match = YEAR_PATTERN.search(date_text)
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def build_tree_snapshot(families):
+    """
+    Build a compact, columnar snapshot of all persons and links of the given family trees.
+
+    The nodes are returned as parallel arrays (id, name, sex, birth and death year) and the
+    links as typed edge arrays (parent links from child to parent, spouse links). Confidential
+    persons are masked like in `PersonSerializer`: for 'yes' only the id remains, for
+    'restricted' only the id and the name.
+
+    Parameters:
+    - families: The family trees to include.
+
+    Returns:
+    - dict: The snapshot with `families`, `nodes` and `edges`
+    """
+    rows = Person.objects.filter(
+        Q(family_1__in=families) | Q(family_2__in=families)
+    ).order_by('id').values_list(
+        'id', 'name', 'sex', 'birt_date', 'birth_date_formatted', 'deat_date', 'death_date_formatted', 'confidential'
+    )
+
+    nodes = {'id': [], 'name': [], 'sex': [], 'birth_year': [], 'death_year': []}
+    for person_id, name, sex, birt_date, birth_formatted, deat_date, death_formatted, confidential in rows:
+        masked = confidential in CONFIDENTIAL_VALUES
+        nodes['id'].append(person_id)
+        nodes['name'].append('vertraulich' if confidential == 'yes' else name)
+        nodes['sex'].append('' if masked else sex)
+        nodes['birth_year'].append(None if masked else extract_year(birt_date, birth_formatted))
+        nodes['death_year'].append(None if masked else extract_year(deat_date, death_formatted))
+
+    graph = get_genealogy_graph()
+    included = set(nodes['id'])
+    parent_edges = {'child': [], 'parent': []}
+    spouse_edges = {'a': [], 'b': []}
+    for person_id in nodes['id']:
+        for parent_id in graph.parents(person_id):
+            if parent_id in included:
+                parent_edges['child'].append(person_id)
+                parent_edges['parent'].append(parent_id)
+        for spouse_id in graph.spouses(person_id):
+            if person_id < spouse_id and spouse_id in included:
+                spouse_edges['a'].append(person_id)
+                spouse_edges['b'].append(spouse_id)
+
+    return {
+        'families': sorted(families),
+        'nodes': nodes,
+        'edges': {'parent': parent_edges, 'spouse': spouse_edges},
+    }
+
+
+def get_snapshot_etag(families, version=None):
+    """
+    Return the ETag of the snapshot of the given family trees, without building the snapshot.
+
+    Parameters:
+    - families: The family trees to include.
+    - version: The tree version (optional, default: the current version).
+
+    Returns:
+    - string: The quoted ETag
+    """
+    if version is None:
+        version = get_tree_version()
+    return f'"tree-{"-".join(sorted(families))}-{version}"'
+
+
+def get_tree_snapshot(families):
+    """
+    Return the cached snapshot of the given family trees together with its ETag.
+
+    Snapshots are cached per family combination and tree version, so the payload is only
+    built once after every Person or Relation change. The version is read from the database,
+    so a change committed by another worker process is seen as well.
+
+    Parameters:
+    - families: The family trees to include.
+
+    Returns:
+    - tuple: The ETag and the snapshot dictionary
+    """
+    version = get_tree_version()
+    cache_key = f'ancestors:tree_snapshot:{"-".join(sorted(families))}:{version}'
+
+    snapshot = cache.get(cache_key)
+    if snapshot is None:
+        snapshot = build_tree_snapshot(families)
+        cache.set(cache_key, snapshot, SNAPSHOT_CACHE_TIMEOUT)
+    return get_snapshot_etag(families, version), snapshot
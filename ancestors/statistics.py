@@ -0,0 +1,98 @@
+from collections import Counter
+from datetime import date
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import CONFIDENTIAL_VALUES, Person
+from .versioning import get_tree_version
+
+
+STATISTICS_CACHE_TIMEOUT = 60 * 60 * 24
+TOP_COUNT = 20
+LIFESPAN_BUCKET = 10
+DAYS_PER_YEAR = 365.2425
+
+
+def _middle_day(earliest, latest):
+    if earliest is None or latest is None:
+        return None
+    return (earliest + latest) // 2
+
+
+def _decade(earliest, latest):
+    # A range like 'zwischen 1850 und 1870' only counts if it stays within one decade
+    if earliest is None or latest is None:
+        return None
+    first, last = date.fromordinal(earliest).year // 10 * 10, date.fromordinal(latest).year // 10 * 10
+    return first if first == last else None
+
+
+def _top_values(persons, field_name):
+    rows = persons.exclude(**{f'{field_name}__isnull': True}).exclude(**{field_name: ''}).values(field_name).annotate(
+        count=Count('id')
+    ).order_by('-count', field_name)[:TOP_COUNT]
+    return [{'value': row[field_name], 'count': row['count']} for row in rows]
+
+
+def build_family_statistics(family):
+    """
+    Compute the statistics of one family tree.
+
+    Surnames and places are counted with SQL aggregates, the decades and lifespans in one
+    pass over the day range columns of the structured dates, the generations with one
+    aggregate over the stored `ancestor_generations`. Confidential persons only count in the total.
+
+    Parameters:
+    - family: The family tree.
+
+    Returns:
+    - dict: The number of persons, births and deaths per decade, the lifespan distribution
+      (in buckets of ten years), the most common surnames, birth and death places and the
+      number of persons per generation (the number of known ancestor generations)
+    """
+    members = Person.objects.filter(Q(family_1=family) | Q(family_2=family))
+    public = members.exclude(confidential__in=CONFIDENTIAL_VALUES)
+
+    births, deaths, lifespans = Counter(), Counter(), Counter()
+    rows = public.values_list('birt_earliest', 'birt_latest', 'deat_earliest', 'deat_latest')
+    for birt_earliest, birt_latest, deat_earliest, deat_latest in rows.iterator(chunk_size=2000):
+        birth_decade = _decade(birt_earliest, birt_latest)
+        death_decade = _decade(deat_earliest, deat_latest)
+        if birth_decade is not None:
+            births[birth_decade] += 1
+        if death_decade is not None:
+            deaths[death_decade] += 1
+        birth_day, death_day = _middle_day(birt_earliest, birt_latest), _middle_day(deat_earliest, deat_latest)
+        if birth_day is not None and death_day is not None and death_day >= birth_day:
+            years = int((death_day - birth_day) / DAYS_PER_YEAR)
+            lifespans[years // LIFESPAN_BUCKET * LIFESPAN_BUCKET] += 1
+
+    total = members.count()
+    generations = Counter(dict(public.values_list('ancestor_generations').annotate(count=Count('id')).order_by()))
+
+    return {
+        'persons': total,
+        'births_per_decade': [{'decade': decade, 'count': births[decade]} for decade in sorted(births)],
+        'deaths_per_decade': [{'decade': decade, 'count': deaths[decade]} for decade in sorted(deaths)],
+        'lifespans': [{'from': years, 'to': years + LIFESPAN_BUCKET - 1, 'count': lifespans[years]} for years in sorted(lifespans)],
+        'surnames': _top_values(public, 'surn'),
+        'birth_places': _top_values(public, 'birt_plac'),
+        'death_places': _top_values(public, 'deat_plac'),
+        'generations': [{'generation': generation, 'count': generations[generation]} for generation in sorted(generations) if generations[generation]],
+    }
+
+
+def get_family_statistics(family):
+    """
+    Return the statistics of one family tree, cached per family and tree version.
+
+    Any Person or Relation write bumps the tree version, which is kept in the database, so the
+    statistics are computed again on the next request after a change, in every worker process.
+    """
+    cache_key = f'ancestors:statistics:{family}:{get_tree_version()}'
+    statistics = cache.get(cache_key)
+    if statistics is None:
+        statistics = build_family_statistics(family)
+        cache.set(cache_key, statistics, STATISTICS_CACHE_TIMEOUT)
+    return statistics
@@ -0,0 +1,331 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from .closure import refresh_closure
+from .dates import MARRIAGE_DATE_FIELDS, parse_genealogical_date
+from .graph import CHILDREN_FIELDS
+from .models import Person, PersonDetail, Relation
+from .unions import refresh_unions
+from .versioning import bump_tree_version
+
+
+SLOTS = (1, 2, 3, 4)
+PARENT_FIELDS = ('fath_refn', 'moth_refn')
+
+# The columns of PersonDetail that mirror the Relation data as refn strings, with the marriage day ranges
+DETAIL_SYNC_FIELDS = PARENT_FIELDS + tuple(
+    f'{name}_{slot}' for slot in SLOTS for name in ('marr_spou_refn', 'marr_date', 'marr_plac', 'fam_chil')
+) + tuple(field_name for fields in MARRIAGE_DATE_FIELDS.values() for field_name in fields)
+PERSON_LOAD_FIELDS = ('id', 'refn', 'sex') + tuple(f'detail__{field_name}' for field_name in DETAIL_SYNC_FIELDS)
+
+
+class RelationSync:
+    """
+    Propagates saved Relations to the neighbouring Relations and the refn columns of the person details.
+
+    For every saved Relation (of person P):
+    - each spouse gets P as spouse in his or her own Relation, with the marriage date and place,
+    - each child gets P as father or mother (depending on P's sex) in his or her Relation,
+    - father and mother get each other as spouses and P as child of that marriage,
+    - the refn columns of the PersonDetails of P, the children and the spouses (`fath_refn`,
+      `marr_spou_refn_N`, `fam_chil_N`, ...) are updated from the Relations,
+    - the unions of P, the parents and the spouses are rebuilt (s. `ancestors/unions.py`).
+
+    Links are only added, never removed. All affected rows are loaded up front, the changes
+    are computed in memory and written with `bulk_create`/`bulk_update` in one transaction.
+    No save signals are sent for the written rows, so the ancestor closure and the tree
+    version are updated here directly.
+    """
+
+    def __init__(self, relations):
+        """
+        Parameters:
+        - relations: The saved Relation instances.
+        """
+        self.roots = list(relations)
+        self.relations = {}
+        self.children = defaultdict(list)
+        self.persons = {}
+        self.details = {}
+        self.new_relations = {}
+        self.changed_relation_fields = defaultdict(set)
+        self.added_children = []
+        self.changed_detail_fields = defaultdict(set)
+        self.parents_changed = set()
+
+    def run(self):
+        """
+        Compute and write all changes.
+        """
+        with transaction.atomic():
+            self._load()
+            for root in self.roots:
+                self._link_spouses(root)
+                self._link_children(root)
+                self._link_parents(root)
+
+            touched_ids = dict.fromkeys(
+                [root.person_id for root in self.roots] + list(self.changed_relation_fields) + list(self.new_relations)
+            )
+            touched = [self.relations[person_id] for person_id in touched_ids]
+            self._load_persons(person_id for relation in touched for person_id in self._linked_ids(relation))
+            for relation in touched:
+                self._update_own_person(relation)
+            for relation in touched:
+                self._update_children_persons(relation)
+            for relation in touched:
+                self._update_spouse_persons(relation)
+            self._save()
+            refresh_unions(self._union_person_ids(touched))
+
+    def _union_person_ids(self, relations):
+        # The marriages of these persons and the ones they are children of
+        for relation in relations:
+            yield relation.person_id
+            for field_name in PARENT_FIELDS:
+                yield getattr(relation, f'{field_name}_id')
+            for slot in SLOTS:
+                yield getattr(relation, f'marr_spou_refn_{slot}_id')
+
+    def _linked_ids(self, relation):
+        yield relation.person_id
+        for field_name in PARENT_FIELDS:
+            yield getattr(relation, f'{field_name}_id')
+        for slot in SLOTS:
+            yield getattr(relation, f'marr_spou_refn_{slot}_id')
+            yield from self.children[(relation.person_id, slot)]
+
+    def _load(self):
+        for root in self.roots:
+            self.relations[root.person_id] = root
+        self._load_children(self.roots)
+
+        neighbour_ids = {person_id for root in self.roots for person_id in self._linked_ids(root) if person_id}
+        neighbour_ids -= set(self.relations)
+        neighbours = {}
+        # A person should only have one Relation; if there are more, the oldest one is used
+        for relation in Relation.objects.filter(person_id__in=neighbour_ids).order_by('-id'):
+            neighbours[relation.person_id] = relation
+        self.relations.update(neighbours)
+        self._load_children(neighbours.values())
+        self._load_persons(root.person_id for root in self.roots)
+
+    def _load_children(self, relations):
+        person_of_relation = {relation.pk: relation.person_id for relation in relations}
+        if not person_of_relation:
+            return
+        for slot, field_name in zip(SLOTS, CHILDREN_FIELDS):
+            through = getattr(Relation, field_name).through
+            rows = through.objects.filter(relation_id__in=person_of_relation).order_by('id').values_list('relation_id', 'person_id')
+            for relation_id, child_id in rows:
+                self.children[(person_of_relation[relation_id], slot)].append(child_id)
+
+    def _load_persons(self, person_ids):
+        missing = {person_id for person_id in person_ids if person_id and person_id not in self.persons}
+        if not missing:
+            return
+        # The detail rows are joined, persons without one get a new PersonDetail when a mirror changes
+        for person in Person.objects.select_related('detail').only(*PERSON_LOAD_FIELDS).filter(pk__in=missing):
+            self.persons[person.pk] = person
+            self.details[person.pk] = getattr(person, 'detail', None) or PersonDetail(person_id=person.pk)
+
+    def _relation_for(self, person_id):
+        relation = self.relations.get(person_id)
+        if relation is None:
+            relation = Relation(person_id=person_id)
+            self.relations[person_id] = relation
+            self.new_relations[person_id] = relation
+        return relation
+
+    def _set_relation_field(self, relation, field_name, value):
+        attname = f'{field_name}_id' if field_name in PARENT_FIELDS or field_name.startswith('marr_spou_refn_') else field_name
+        if getattr(relation, attname) == value:
+            return
+        setattr(relation, attname, value)
+        if relation.person_id not in self.new_relations:
+            self.changed_relation_fields[relation.person_id].add(field_name)
+        if field_name in PARENT_FIELDS:
+            self.parents_changed.add(relation.person_id)
+
+    @staticmethod
+    def _find_slot(relation, spouse_id):
+        """
+        Return the marriage slot of a relation holding the given spouse (or no spouse for None), else the first free slot.
+        """
+        spouses = [getattr(relation, f'marr_spou_refn_{slot}_id') for slot in SLOTS]
+        if spouse_id in spouses:
+            return spouses.index(spouse_id) + 1
+        if None in spouses:
+            return spouses.index(None) + 1
+        return None
+
+    def _link_spouses(self, root):
+        for slot in SLOTS:
+            spouse_id = getattr(root, f'marr_spou_refn_{slot}_id')
+            if not spouse_id or spouse_id == root.person_id:
+                continue
+            date, place = getattr(root, f'marr_date_{slot}'), getattr(root, f'marr_plac_{slot}')
+            spouse_relation = self._relation_for(spouse_id)
+            spouse_slot = self._find_slot(spouse_relation, root.person_id)
+            if spouse_slot is None:
+                continue
+
+            if getattr(spouse_relation, f'marr_spou_refn_{spouse_slot}_id') == root.person_id:
+                if date:
+                    self._set_relation_field(spouse_relation, f'marr_date_{spouse_slot}', date)
+                if place:
+                    self._set_relation_field(spouse_relation, f'marr_plac_{spouse_slot}', place)
+            else:
+                self._set_relation_field(spouse_relation, f'marr_spou_refn_{spouse_slot}', root.person_id)
+                self._set_relation_field(spouse_relation, f'marr_date_{spouse_slot}', date)
+                self._set_relation_field(spouse_relation, f'marr_plac_{spouse_slot}', place)
+
+    def _link_children(self, root):
+        sex = self.persons[root.person_id].sex if root.person_id in self.persons else None
+        for slot in SLOTS:
+            for child_id in self.children[(root.person_id, slot)]:
+                if child_id == root.person_id:
+                    continue
+                child_relation = self._relation_for(child_id)
+                if sex == 'F':
+                    self._set_relation_field(child_relation, 'moth_refn', root.person_id)
+                elif sex == 'M':
+                    self._set_relation_field(child_relation, 'fath_refn', root.person_id)
+                elif root.person_id not in (child_relation.fath_refn_id, child_relation.moth_refn_id):
+                    # Wenn das Geschlecht 'D' ist, finde eine freie Stelle
+                    if not child_relation.fath_refn_id:
+                        self._set_relation_field(child_relation, 'fath_refn', root.person_id)
+                    elif not child_relation.moth_refn_id:
+                        self._set_relation_field(child_relation, 'moth_refn', root.person_id)
+
+    def _link_parents(self, root):
+        for parent_field, other_field in (('moth_refn_id', 'fath_refn_id'), ('fath_refn_id', 'moth_refn_id')):
+            parent_id, other_id = getattr(root, parent_field), getattr(root, other_field)
+            if not parent_id or parent_id == root.person_id:
+                continue
+            parent_relation = self._relation_for(parent_id)
+            if other_id is None and any(root.person_id in self.children[(parent_id, slot)] for slot in SLOTS):
+                continue
+            slot = self._find_slot(parent_relation, other_id)
+            if slot is None:
+                continue
+            if other_id:
+                self._set_relation_field(parent_relation, f'marr_spou_refn_{slot}', other_id)
+            if root.person_id not in self.children[(parent_id, slot)]:
+                self.children[(parent_id, slot)].append(root.person_id)
+                self.added_children.append((parent_id, slot, root.person_id))
+
+    def _set_person_field(self, person, field_name, value):
+        detail = self.details[person.pk]
+        if getattr(detail, field_name) != value:
+            setattr(detail, field_name, value)
+            self.changed_detail_fields[person.pk].add(field_name)
+
+    def _set_person_marriage_date(self, person, slot, value):
+        self._set_person_field(person, f'marr_date_{slot}', value)
+        for field_name, range_value in zip(MARRIAGE_DATE_FIELDS[f'marr_date_{slot}'], parse_genealogical_date(value)):
+            self._set_person_field(person, field_name, range_value)
+
+    def _update_own_person(self, relation):
+        person = self.persons.get(relation.person_id)
+        if person is None:
+            return
+        for field_name in PARENT_FIELDS:
+            parent = self.persons.get(getattr(relation, f'{field_name}_id'))
+            if parent:
+                self._set_person_field(person, field_name, parent.refn)
+        for slot in SLOTS:
+            spouse = self.persons.get(getattr(relation, f'marr_spou_refn_{slot}_id'))
+            if spouse:
+                self._set_person_field(person, f'marr_spou_refn_{slot}', spouse.refn)
+                self._set_person_marriage_date(person, slot, getattr(relation, f'marr_date_{slot}'))
+                self._set_person_field(person, f'marr_plac_{slot}', getattr(relation, f'marr_plac_{slot}'))
+            children = [self.persons[child_id].refn for child_id in self.children[(relation.person_id, slot)] if child_id in self.persons]
+            if children:
+                self._set_person_field(person, f'fam_chil_{slot}', ','.join(children))
+
+    def _update_children_persons(self, relation):
+        person = self.persons.get(relation.person_id)
+        if person is None:
+            return
+        own_field, spouse_field = ('moth_refn', 'fath_refn') if person.sex == 'F' else ('fath_refn', 'moth_refn')
+        for slot in SLOTS:
+            spouse = self.persons.get(getattr(relation, f'marr_spou_refn_{slot}_id'))
+            for child_id in self.children[(relation.person_id, slot)]:
+                child = self.persons.get(child_id)
+                if child is None or child_id == person.pk:
+                    continue
+                self._set_person_field(child, own_field, person.refn)
+                if spouse:
+                    self._set_person_field(child, spouse_field, spouse.refn)
+
+    def _update_spouse_persons(self, relation):
+        person = self.persons.get(relation.person_id)
+        if person is None:
+            return
+        for slot in SLOTS:
+            spouse = self.persons.get(getattr(relation, f'marr_spou_refn_{slot}_id'))
+            if spouse is None or spouse.pk == person.pk:
+                continue
+            spouse_refns = [getattr(self.details[spouse.pk], f'marr_spou_refn_{spouse_slot}') for spouse_slot in SLOTS]
+            if person.refn in spouse_refns:
+                spouse_slot = spouse_refns.index(person.refn) + 1
+            elif not spouse_refns[slot - 1]:
+                spouse_slot = slot
+            elif not all(spouse_refns):
+                spouse_slot = [bool(refn) for refn in spouse_refns].index(False) + 1
+            else:
+                continue
+            self._set_person_field(spouse, f'marr_spou_refn_{spouse_slot}', person.refn)
+            self._set_person_marriage_date(spouse, spouse_slot, getattr(relation, f'marr_date_{slot}'))
+            self._set_person_field(spouse, f'marr_plac_{spouse_slot}', getattr(relation, f'marr_plac_{slot}'))
+            self._set_person_field(spouse, f'fam_chil_{spouse_slot}', getattr(self.details[person.pk], f'fam_chil_{slot}'))
+
+    def _save(self):
+        if self.new_relations:
+            Relation.objects.bulk_create(self.new_relations.values())
+
+        changed_relations = [self.relations[person_id] for person_id in self.changed_relation_fields]
+        if changed_relations:
+            fields = set().union(*self.changed_relation_fields.values())
+            Relation.objects.bulk_update(changed_relations, sorted(fields))
+
+        added_by_slot = defaultdict(list)
+        for parent_id, slot, child_id in self.added_children:
+            added_by_slot[slot].append((self.relations[parent_id].pk, child_id))
+        for slot, field_name in zip(SLOTS, CHILDREN_FIELDS):
+            if added_by_slot[slot]:
+                through = getattr(Relation, field_name).through
+                through.objects.bulk_create(
+                    [through(relation_id=relation_id, person_id=child_id) for relation_id, child_id in added_by_slot[slot]],
+                    ignore_conflicts=True
+                )
+
+        if self.changed_detail_fields:
+            # One upsert writes the changed detail rows and creates the missing ones
+            fields = sorted(set().union(*self.changed_detail_fields.values()))
+            PersonDetail.objects.bulk_create(
+                [
+                    PersonDetail(person_id=person_id, **{field_name: getattr(self.details[person_id], field_name) for field_name in fields})
+                    for person_id in self.changed_detail_fields
+                ],
+                update_conflicts=True, unique_fields=['person'], update_fields=fields
+            )
+            Person.objects.filter(pk__in=list(self.changed_detail_fields)).update(last_modified_date=timezone.now())
+
+        if self.parents_changed:
+            refresh_closure(self.parents_changed)
+        if self.new_relations or changed_relations or self.added_children or self.changed_detail_fields:
+            bump_tree_version()
+
+
+def sync_relations(relations):
+    """
+    Propagate the given saved Relations to the neighbouring Relations and persons.
+
+    Parameters:
+    - relations: An iterable of saved Relation instances.
+    """
+    RelationSync(relations).run()
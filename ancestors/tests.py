@@ -1,11 +1,52 @@
+import io
+import itertools
+import json
+from base64 import urlsafe_b64encode
+from datetime import date
+
+import tablib
+from django.db import connection
+from django.db.models import F
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.test import APIClient
-from .models import Person, Relation
+from .gedcom import GedcomError, GedcomImporter, gedcom_date_to_text, gedcom_lines, parse_gedcom, text_to_gedcom_date
+from .maintenance import bulk_maintenance
+from .merge import merge_persons
+from .dates import DateQualifier, parse_genealogical_date
+from .duplicates import candidate_pairs, detect_duplicates, find_duplicates, load_person_rows
+from .closure import get_ancestor_ids, is_descendant, rebuild_closure
+from .models import AncestorClosure, DuplicateCandidate, Person, PersonAlias, PersonDetail, RefnSequence, Relation, TreeVersion, Union
+from .phonetics import cologne_phonetics
+from .relation_import import RelationImporter
+from .resources import PersonResource, RelationResource
+from .search import search_person_ids
+from .unions import rebuild_unions
+from .versioning import get_tree_version
+from .serializers import PersonListSerializer, PersonSerializer, RelationSerializer, masked_person_values
 from accounts.models import CustomUser
+from discussions.models import Discussion, DiscussionEntry
+from django.contrib.auth.models import Permission
+from django.core.management import call_command
 from django.urls import reverse
 
 
+# The tree version is rolled back with the test transaction, so every test starts from its
+# own block of versions that no earlier test has cached data for
+TREE_VERSION_BLOCKS = itertools.count(start=1)
+TREE_VERSIONS_PER_TEST = 10 ** 6
+
+
+def clear_tree_caches():
+    """
+    Invalidate the tree data cached in this process (the genealogy graph, the snapshots, the
+    statistics) by moving the tree version, like every committed write does.
+    """
+    version = next(TREE_VERSION_BLOCKS) * TREE_VERSIONS_PER_TEST
+    TreeVersion.objects.update_or_create(pk=TreeVersion.ID, defaults={'version': version})
+
+
 class PersonListCreateViewTests(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -31,34 +72,112 @@ class PersonListCreateViewTests(TestCase):
         url = reverse('person-list-create')  # Use 'person-list-create' as the name of the URL
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 3)
+        self.assertEqual(len(response.data['results']), 3)
 
     def test_list_persons_confidential_yes(self):
         """Test that a person with confidential='yes' shows limited fields."""
         response = self.client.get('/api/ancestors/persons/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         # Prüfe, ob vertrauliche Daten korrekt maskiert werden
-        self.assertEqual(response.data[1]['name'], 'vertraulich')
-        self.assertEqual(response.data[1]['surn'], '')
-        self.assertEqual(response.data[1]['givn'], '')
+        persons = {person['id']: person for person in response.data['results']}
+        self.assertEqual(persons[self.person2.id]['name'], 'vertraulich')
+        self.assertEqual(persons[self.person2.id]['surn'], '')
+        self.assertEqual(persons[self.person2.id]['givn'], '')
 
     def test_list_persons_confidential_restricted(self):
         """Test that a person with confidential='restricted' shows partially restricted fields."""
         response = self.client.get('/api/ancestors/persons/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         # Prüfe, ob eingeschränkt vertrauliche Daten korrekt angezeigt werden
-        self.assertEqual(response.data[2]['name'], 'Alice Doe')
-        self.assertEqual(response.data[2]['surn'], '')
-        self.assertEqual(response.data[2]['givn'], '')
+        persons = {person['id']: person for person in response.data['results']}
+        self.assertEqual(persons[self.person3.id]['name'], 'Alice Doe')
+        self.assertEqual(persons[self.person3.id]['surn'], '')
+        self.assertEqual(persons[self.person3.id]['givn'], '')
 
     def test_list_persons_excludes_non_related_families(self):
         """Test that persons from unrelated families are not included."""
         response = self.client.get('/api/ancestors/persons/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         # Stelle sicher, dass Personen aus nicht verwandten Familien ausgeschlossen sind
-        person_ids = [person['id'] for person in response.data]
+        person_ids = [person['id'] for person in response.data['results']]
         self.assertNotIn(self.person4.id, person_ids)
 
+    def test_list_persons_keyset_pagination(self):
+        """Test that the cursor walks through all persons by surname and given name, also when rows are inserted."""
+        Person.objects.create(givn='Carl', surn='Adams', family_1='smith', confidential='none')
+        first_page = self.client.get('/api/ancestors/persons/?page_size=3')
+        self.assertEqual(first_page.status_code, status.HTTP_200_OK)
+        # Vertrauliche Personen werden ohne Namen sortiert und stehen daher vorne
+        self.assertEqual(
+            [person['id'] for person in first_page.data['results'][:2]],
+            [self.person2.id, self.person3.id]
+        )
+        self.assertEqual(first_page.data['results'][2]['givn'], 'Carl')
+        self.assertIsNone(first_page.data['previous'])
+
+        # Eine neue Person vor der aktuellen Position verschiebt die folgenden Seiten nicht
+        Person.objects.create(givn='Aaron', surn='Aal', family_1='smith', confidential='none')
+        second_page = self.client.get(first_page.data['next'])
+        self.assertEqual([person['givn'] for person in second_page.data['results']], ['John'])
+        self.assertIsNone(second_page.data['next'])
+
+        previous_page = self.client.get(second_page.data['previous'])
+        self.assertEqual([person['givn'] for person in previous_page.data['results']], ['', 'Aaron', 'Carl'])
+
+    def test_list_persons_invalid_cursor(self):
+        """Test that a manipulated cursor is rejected."""
+        response = self.client.get('/api/ancestors/persons/?cursor=invalid')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        # Values of the wrong type are rejected before they reach the database
+        for position in ([{'a': 1}, '', 1], ['Smith', ['John'], 1], ['Smith', 'John', '1'], ['Smith', 'John', True]):
+            cursor = urlsafe_b64encode(json.dumps({'p': position}).encode('utf-8')).decode('ascii')
+            response = self.client.get('/api/ancestors/persons/', {'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_persons_date_filters(self):
+        """Test that persons can be filtered by birth and death years and ordered by birth."""
+        for person, birt_date, deat_date in ((self.person1, 'um 1850', '03.1901'), (self.person2, '1860', None), (self.person3, '1855', None)):
+            person.birt_date, person.deat_date = birt_date, deat_date
+            person.save()
+        carl = Person.objects.create(givn='Carl', surn='Adams', family_1='smith', confidential='none', birt_date='BEF 1799', deat_date='12.05.1860')
+
+        def given_names(query):
+            response = self.client.get(f'/api/ancestors/persons/{query}')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return [person['givn'] for person in response.data['results']]
+
+        self.assertEqual(given_names('?born_from=1840&born_to=1870'), ['John'])
+        self.assertEqual(given_names('?born_to=1850'), ['Carl', 'John'])
+        self.assertEqual(given_names('?died_from=1901&died_to=1901'), ['John'])
+        self.assertEqual(given_names('?alive_in=1855'), ['Carl', 'John'])
+        self.assertEqual(given_names('?alive_in=1880'), ['John'])
+        self.assertEqual(given_names('?ordering=birth&page_size=2'), ['Carl', 'John'])
+        self.assertEqual(given_names('?ordering=birth')[2:], ['', ''])
+        self.assertEqual(self.client.get('/api/ancestors/persons/?born_from=früh').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get('/api/ancestors/persons/?ordering=death').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(carl.birt_qualifier, DateQualifier.BEFORE)
+
+    def test_list_persons_ordered_by_descendants(self):
+        """Test that the largest branches come first and the cursor follows that ordering."""
+        carl = Person.objects.create(givn='Carl', surn='Adams', family_1='smith', confidential='none')
+        dave = Person.objects.create(givn='Dave', surn='Adams', family_1='smith', confidential='none')
+        Relation.objects.create(person=dave, fath_refn=carl)
+        Relation.objects.create(person=self.person2, fath_refn=dave)
+
+        first_page = self.client.get('/api/ancestors/persons/?ordering=descendants&page_size=2')
+        self.assertEqual(first_page.status_code, status.HTTP_200_OK)
+        self.assertEqual([person['givn'] for person in first_page.data['results']], ['Carl', 'Dave'])
+        second_page = self.client.get(first_page.data['next'])
+        # Vertrauliche Personen werden wie Personen ohne Nachkommen sortiert
+        self.assertEqual([person['givn'] for person in second_page.data['results']], ['', ''])
+
+        # The stored sort key follows the confidentiality
+        carl.confidential = 'yes'
+        carl.save()
+        first_page = self.client.get('/api/ancestors/persons/?ordering=descendants&page_size=2')
+        self.assertEqual([person['givn'] for person in first_page.data['results']], ['Dave', ''])
+
 
 class PersonDetailViewTests(TestCase):
     def setUp(self):
@@ -133,7 +252,7 @@ class RelationListViewTests(TestCase):
         response = self.client.get('/api/ancestors/relations/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         # Prüfe, ob die Beziehung für die Familie Smith enthalten ist
-        relation_ids = [relation['id'] for relation in response.data]
+        relation_ids = [relation['id'] for relation in response.data['results']]
         self.assertIn(self.relation1.id, relation_ids)
 
     def test_list_relations_excludes_unrelated_families(self):
@@ -141,7 +260,7 @@ class RelationListViewTests(TestCase):
         response = self.client.get('/api/ancestors/relations/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         # Stelle sicher, dass die Beziehung für die Familie Doe/Johnson nicht enthalten ist
-        relation_ids = [relation['id'] for relation in response.data]
+        relation_ids = [relation['id'] for relation in response.data['results']]
         self.assertNotIn(self.relation2.id, relation_ids)
 
 
@@ -180,3 +299,1160 @@ class RelationDetailViewTests(TestCase):
         """Test that retrieving a relation for an unrelated family returns 404."""
         response = self.client.get(f'/api/ancestors/relations/{self.relation2.person.id}/')
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PersonChartViewTests(TestCase):
+    def setUp(self):
+        clear_tree_caches()
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(
+            email='testuser@example.com',
+            password='testpassword',
+            username='testuser@example.com',
+            family_1='smith'
+        )
+        self.user.is_active = True
+        self.user.save()
+        self.client.force_authenticate(user=self.user)
+
+        # Drei Generationen: Großeltern -> Vater (+ Mutter) -> Kind
+        self.grandfather = Person.objects.create(givn='George', surn='Smith', sex='M', family_1='smith')
+        self.grandmother = Person.objects.create(givn='Grace', surn='Smith', sex='F', family_1='smith', confidential='yes')
+        self.father = Person.objects.create(givn='John', surn='Smith', sex='M', family_1='smith')
+        self.mother = Person.objects.create(givn='Mary', surn='Doe', sex='F', family_1='doe')
+        self.child = Person.objects.create(givn='Tom', surn='Smith', sex='M', family_1='smith')
+
+        Relation.objects.create(person=self.father, fath_refn=self.grandfather, moth_refn=self.grandmother)
+        Relation.objects.create(person=self.child, fath_refn=self.father, moth_refn=self.mother)
+
+    def test_pedigree_returns_all_generations_in_one_request(self):
+        """Test that the pedigree contains the person, the parents and the grandparents."""
+        response = self.client.get(f'/api/ancestors/persons/{self.child.id}/pedigree/?generations=2')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        generations = {node['id']: node['generation'] for node in response.data['persons']}
+        self.assertEqual(generations, {
+            self.child.id: 0,
+            self.father.id: 1,
+            self.grandfather.id: 2,
+            self.grandmother.id: 2,
+        })
+        child_node = next(node for node in response.data['persons'] if node['id'] == self.child.id)
+        # Die Mutter gehört zu einem anderen Stammbaum und wird nicht ausgeliefert
+        self.assertEqual(child_node['parents'], [self.father.id])
+
+    def test_pedigree_respects_generation_limit_and_confidentiality(self):
+        """Test that the generation limit is applied and confidential persons are masked."""
+        response = self.client.get(f'/api/ancestors/persons/{self.father.id}/pedigree/?generations=1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        nodes = {node['id']: node for node in response.data['persons']}
+        self.assertEqual(set(nodes), {self.father.id, self.grandfather.id, self.grandmother.id})
+        self.assertEqual(nodes[self.grandmother.id]['name'], 'vertraulich')
+
+    def test_descendants(self):
+        """Test that the descendants chart follows the children links."""
+        response = self.client.get(f'/api/ancestors/persons/{self.grandfather.id}/descendants/?generations=5')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        nodes = {node['id']: node for node in response.data['persons']}
+        self.assertEqual(nodes[self.child.id]['generation'], 2)
+        self.assertEqual(nodes[self.father.id]['children'], [self.child.id])
+
+    def test_graph_follows_relation_changes(self):
+        """Test that the cached graph is rebuilt after a relation was added."""
+        self.client.get(f'/api/ancestors/persons/{self.father.id}/descendants/')
+        with self.captureOnCommitCallbacks(execute=True):
+            second_child = Person.objects.create(givn='Ann', surn='Smith', sex='F', family_1='smith')
+            Relation.objects.create(person=second_child, fath_refn=self.father)
+        response = self.client.get(f'/api/ancestors/persons/{self.father.id}/descendants/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(second_child.id, [node['id'] for node in response.data['persons']])
+
+    def test_invalid_generations(self):
+        """Test that an out of range generations parameter is rejected."""
+        response = self.client.get(f'/api/ancestors/persons/{self.child.id}/pedigree/?generations=99')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PersonNeighboursViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(
+            email='testuser@example.com',
+            password='testpassword',
+            username='testuser@example.com',
+            family_1='smith'
+        )
+        self.user.is_active = True
+        self.user.save()
+        self.client.force_authenticate(user=self.user)
+
+        # Großeltern -> Vater (+ Mutter aus einem anderen Stammbaum) -> Kind
+        self.grandfather = Person.objects.create(givn='George', surn='Smith', sex='M', family_1='smith')
+        self.grandmother = Person.objects.create(givn='Grace', surn='Smith', sex='F', family_1='smith', confidential='yes')
+        self.father = Person.objects.create(givn='John', surn='Smith', sex='M', family_1='smith')
+        self.mother = Person.objects.create(givn='Mary', surn='Doe', sex='F', family_1='doe')
+        self.child = Person.objects.create(givn='Tom', surn='Smith', sex='M', family_1='smith')
+
+        Relation.objects.create(person=self.father, fath_refn=self.grandfather, moth_refn=self.grandmother)
+        Relation.objects.create(person=self.child, fath_refn=self.father, moth_refn=self.mother)
+
+    def test_children_with_expansion_flags(self):
+        """Test that the children carry the flags and the descendant count."""
+        response = self.client.get(f'/api/ancestors/persons/{self.grandfather.id}/children/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['person'], self.grandfather.id)
+        [father] = response.data['children']
+        self.assertEqual(father['id'], self.father.id)
+        self.assertTrue(father['has_parents'])
+        self.assertTrue(father['has_children'])
+        self.assertEqual(father['descendant_count'], 1)
+
+        response = self.client.get(f'/api/ancestors/persons/{self.father.id}/children/')
+        [child] = response.data['children']
+        self.assertFalse(child['has_children'])
+        self.assertEqual(child['descendant_count'], 0)
+
+    def test_descendant_count_includes_invisible_descendants(self):
+        """Test that the stored count includes descendants of other family trees, unlike has_children."""
+        grandchild = Person.objects.create(givn='Paul', surn='Miller', family_1='miller')
+        Relation.objects.create(person=grandchild, fath_refn=self.child)
+        response = self.client.get(f'/api/ancestors/persons/{self.father.id}/children/')
+        [child] = response.data['children']
+        self.assertFalse(child['has_children'])
+        self.assertEqual(child['descendant_count'], 1)
+
+    def test_parents_are_visible_and_masked(self):
+        """Test that only visible parents are returned and confidential parents are masked."""
+        response = self.client.get(f'/api/ancestors/persons/{self.father.id}/parents/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        parents = {node['id']: node for node in response.data['parents']}
+        self.assertEqual(set(parents), {self.grandfather.id, self.grandmother.id})
+        self.assertEqual(parents[self.grandmother.id]['name'], 'vertraulich')
+        self.assertIsNone(parents[self.grandmother.id]['descendant_count'])
+        self.assertFalse(parents[self.grandfather.id]['has_parents'])
+        self.assertEqual(parents[self.grandfather.id]['descendant_count'], 2)
+
+        # Die Mutter gehört zu einem anderen Stammbaum und wird nicht ausgeliefert
+        response = self.client.get(f'/api/ancestors/persons/{self.child.id}/parents/')
+        self.assertEqual([node['id'] for node in response.data['parents']], [self.father.id])
+
+    def test_query_count_does_not_grow_with_the_tree(self):
+        """Test that expanding a node costs the same number of queries for many children."""
+        for number in range(10):
+            grandchild = Person.objects.create(givn=f'Kind{number}', surn='Smith', family_1='smith')
+            Relation.objects.create(person=grandchild, fath_refn=self.child)
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/ancestors/persons/{self.child.id}/children/')
+        self.assertEqual(len(response.data['children']), 10)
+
+    def test_invisible_person(self):
+        """Test that the neighbours of a person of another family tree are not returned."""
+        response = self.client.get(f'/api/ancestors/persons/{self.mother.id}/children/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class AncestorClosureTests(TestCase):
+    def setUp(self):
+        self.grandfather = Person.objects.create(givn='George', surn='Smith', sex='M', family_1='smith')
+        self.father = Person.objects.create(givn='John', surn='Smith', sex='M', family_1='smith')
+        self.mother = Person.objects.create(givn='Mary', surn='Doe', sex='F', family_1='smith')
+        self.child = Person.objects.create(givn='Tom', surn='Smith', sex='M', family_1='smith')
+        self.grandchild = Person.objects.create(givn='Tim', surn='Smith', sex='M', family_1='smith')
+
+        Relation.objects.create(person=self.father, fath_refn=self.grandfather)
+        Relation.objects.create(person=self.child, fath_refn=self.father, moth_refn=self.mother)
+        Relation.objects.create(person=self.grandchild, fath_refn=self.child)
+
+    def closure_rows(self):
+        return set(AncestorClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+
+    def test_closure_is_maintained_by_signals(self):
+        """Test that all ancestors of a person are found with one query."""
+        self.assertEqual(
+            set(get_ancestor_ids(self.grandchild.id)),
+            {self.child.id, self.father.id, self.mother.id, self.grandfather.id}
+        )
+        self.assertTrue(is_descendant(self.grandchild.id, self.grandfather.id))
+        self.assertFalse(is_descendant(self.grandfather.id, self.grandchild.id))
+        self.assertEqual(
+            AncestorClosure.objects.get(ancestor=self.grandfather, descendant=self.grandchild).depth, 3
+        )
+
+    def test_changing_a_parent_updates_all_descendants(self):
+        """Test that removing a parent link also removes the rows of the descendants."""
+        relation = Relation.objects.get(person=self.father)
+        relation.fath_refn = None
+        relation.save()
+        self.assertFalse(is_descendant(self.grandchild.id, self.grandfather.id))
+        self.assertTrue(is_descendant(self.grandchild.id, self.father.id))
+
+    def test_deleting_a_person_updates_its_descendants(self):
+        """Test that the ancestors of a deleted person are no longer ancestors of its children."""
+        self.child.delete()
+        self.assertEqual(set(get_ancestor_ids(self.grandchild.id)), set())
+
+    def test_incremental_rows_match_full_rebuild(self):
+        """Test that the incrementally maintained table matches a full rebuild."""
+        incremental = self.closure_rows()
+        rebuild_closure()
+        self.assertEqual(self.closure_rows(), incremental)
+
+    def generation_stats(self, person):
+        return Person.objects.values_list('descendant_count', 'ancestor_generations', 'generation_index').get(pk=person.pk)
+
+    def test_generation_stats_follow_parent_changes(self):
+        """Test that the stored generation statistics are updated along the changed ancestor chain."""
+        self.assertEqual(self.generation_stats(self.grandfather), (3, 0, 3))
+        self.assertEqual(self.generation_stats(self.child), (1, 2, 1))
+        self.assertEqual(self.generation_stats(self.grandchild), (0, 3, 0))
+
+        relation = Relation.objects.get(person=self.father)
+        relation.fath_refn = None
+        relation.save()
+        self.assertEqual(self.generation_stats(self.grandfather), (0, 0, 0))
+        self.assertEqual(self.generation_stats(self.father), (2, 0, 2))
+        self.assertEqual(self.generation_stats(self.grandchild), (0, 2, 0))
+
+    def test_deleting_a_person_updates_the_generation_stats(self):
+        """Test that the ancestors of a deleted person lose its descendants."""
+        self.grandchild.delete()
+        self.assertEqual(self.generation_stats(self.grandfather), (2, 0, 2))
+        self.assertEqual(self.generation_stats(self.mother), (1, 0, 1))
+
+    def test_generation_stats_command(self):
+        """Test that the bulk recompute restores the statistics."""
+        Person.objects.update(descendant_count=0, ancestor_generations=0, generation_index=0)
+        call_command('update_generation_stats', stdout=io.StringIO())
+        self.assertEqual(self.generation_stats(self.grandfather), (3, 0, 3))
+        self.assertEqual(self.generation_stats(self.grandchild), (0, 3, 0))
+
+
+class RelationshipViewTests(TestCase):
+    def setUp(self):
+        clear_tree_caches()
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(
+            email='testuser@example.com',
+            password='testpassword',
+            username='testuser@example.com',
+            family_1='smith'
+        )
+        self.user.is_active = True
+        self.user.save()
+        self.client.force_authenticate(user=self.user)
+
+        def person(givn, sex):
+            return Person.objects.create(givn=givn, surn='Smith', sex=sex, family_1='smith')
+
+        # Urgroßeltern mit zwei Söhnen, deren Linien jeweils zwei Generationen weitergehen
+        self.great_grandfather = person('Adam', 'M')
+        self.great_grandmother = person('Eva', 'F')
+        self.grandfather_1 = person('Karl', 'M')
+        self.grandfather_2 = person('Otto', 'M')
+        self.parent_1 = person('Paul', 'M')
+        self.parent_2 = person('Emma', 'F')
+        self.cousin_1 = person('Lena', 'F')
+        self.cousin_2 = person('Mia', 'F')
+        self.spouse = person('Hans', 'M')
+
+        for child, father in ((self.grandfather_1, self.great_grandfather), (self.grandfather_2, self.great_grandfather)):
+            Relation.objects.create(person=child, fath_refn=father, moth_refn=self.great_grandmother)
+        Relation.objects.create(person=self.parent_1, fath_refn=self.grandfather_1)
+        Relation.objects.create(person=self.parent_2, fath_refn=self.grandfather_2)
+        Relation.objects.create(person=self.cousin_1, fath_refn=self.parent_1)
+        Relation.objects.create(person=self.cousin_2, moth_refn=self.parent_2)
+        Relation.objects.create(person=self.spouse, marr_spou_refn_1=self.cousin_2)
+
+    def get_relationship(self, person_a, person_b):
+        return self.client.get(f'/api/ancestors/relationship/?a={person_a.id}&b={person_b.id}')
+
+    def test_second_cousins(self):
+        """Test that the label and the common ancestors of second cousins are found."""
+        response = self.get_relationship(self.cousin_1, self.cousin_2)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['label'], 'Cousine 2. Grades')
+        self.assertEqual(
+            {ancestor['id'] for ancestor in response.data['common_ancestors']},
+            {self.great_grandfather.id, self.great_grandmother.id}
+        )
+        self.assertEqual(response.data['generations'], {'a': 3, 'b': 3})
+        self.assertEqual(len(response.data['path']), 7)
+        self.assertEqual(response.data['path'][1]['step'], 'parent')
+
+    def test_direct_line_and_collateral_labels(self):
+        """Test the labels for direct ancestors, uncles and nieces."""
+        self.assertEqual(self.get_relationship(self.cousin_1, self.great_grandfather).data['label'], 'Urgroßvater')
+        self.assertEqual(self.get_relationship(self.parent_1, self.grandfather_2).data['label'], 'Onkel')
+        self.assertEqual(self.get_relationship(self.grandfather_1, self.cousin_2).data['label'], 'Großnichte')
+        self.assertEqual(self.get_relationship(self.parent_1, self.cousin_2).data['label'], 'Cousine (1 Generation versetzt)')
+
+    def test_spouse_and_in_law(self):
+        """Test that spouses and in-laws are recognized without a common ancestor."""
+        self.assertEqual(self.get_relationship(self.cousin_2, self.spouse).data['label'], 'Ehemann')
+        self.assertEqual(self.get_relationship(self.parent_2, self.spouse).data['label'], 'Schwiegersohn')
+        self.assertEqual(self.get_relationship(self.spouse, self.parent_2).data['label'], 'Schwiegermutter')
+
+    def test_half_siblings(self):
+        """Test that siblings sharing only one of two parents are labelled as half siblings."""
+        other_mother = Person.objects.create(givn='Ida', surn='Doe', sex='F', family_1='smith')
+        half_brother = Person.objects.create(givn='Max', surn='Smith', sex='M', family_1='smith')
+        Relation.objects.create(person=half_brother, fath_refn=self.great_grandfather, moth_refn=other_mother)
+        self.assertEqual(self.get_relationship(self.grandfather_1, half_brother).data['label'], 'Halbbruder')
+
+    def test_invalid_and_invisible_persons(self):
+        """Test that missing ids are rejected and persons of other families are not found."""
+        response = self.client.get('/api/ancestors/relationship/?a=1')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        stranger = Person.objects.create(givn='Bob', surn='Johnson', family_1='johnson')
+        self.assertEqual(self.get_relationship(self.cousin_1, stranger).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_path_through_hidden_family(self):
+        """Test that neither the path nor the label pass through a family tree the user cannot see."""
+        hidden_mother = Person.objects.create(givn='Ruth', surn='Johnson', sex='F', family_1='johnson')
+        half_sister = Person.objects.create(givn='Zoe', surn='Smith', sex='F', family_1='smith')
+        relation = Relation.objects.get(person=self.cousin_1)
+        relation.moth_refn = hidden_mother
+        relation.save()
+        Relation.objects.create(person=half_sister, moth_refn=hidden_mother)
+        response = self.get_relationship(self.cousin_1, half_sister)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['label'], response.data['common_ancestors'], response.data['path']), (None, [], []))
+
+
+class TreeSnapshotViewTests(TestCase):
+    def setUp(self):
+        clear_tree_caches()
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(
+            email='testuser@example.com',
+            password='testpassword',
+            username='testuser@example.com',
+            family_1='smith'
+        )
+        self.user.is_active = True
+        self.user.save()
+        self.client.force_authenticate(user=self.user)
+
+        self.father = Person.objects.create(givn='John', surn='Smith', sex='M', family_1='smith', birt_date='ABT 1850')
+        self.mother = Person.objects.create(givn='Mary', surn='Smith', sex='F', family_1='smith', birt_date='03.04.1855')
+        self.child = Person.objects.create(givn='Tom', surn='Smith', sex='M', family_1='smith', confidential='yes', birt_date='1990')
+        self.stranger = Person.objects.create(givn='Bob', surn='Johnson', family_1='johnson')
+        Relation.objects.create(person=self.child, fath_refn=self.father, moth_refn=self.mother)
+
+    def test_snapshot_contains_nodes_and_typed_edges(self):
+        """Test that the snapshot contains the family's persons as columns and the parent and spouse links."""
+        response = self.client.get('/api/ancestors/tree/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        nodes = response.data['nodes']
+        self.assertEqual(nodes['id'], [self.father.id, self.mother.id, self.child.id])
+        self.assertEqual(nodes['birth_year'][:2], [1850, 1855])
+        edges = response.data['edges']
+        self.assertEqual(
+            set(zip(edges['parent']['child'], edges['parent']['parent'])),
+            {(self.child.id, self.father.id), (self.child.id, self.mother.id)}
+        )
+        self.assertEqual(list(zip(edges['spouse']['a'], edges['spouse']['b'])), [(self.father.id, self.mother.id)])
+
+    def test_snapshot_masks_confidential_persons(self):
+        """Test that confidential persons are masked in the snapshot."""
+        nodes = self.client.get('/api/ancestors/tree/').data['nodes']
+        position = nodes['id'].index(self.child.id)
+        self.assertEqual(nodes['name'][position], 'vertraulich')
+        self.assertIsNone(nodes['birth_year'][position])
+        self.assertEqual(nodes['sex'][position], '')
+
+    def test_conditional_request(self):
+        """Test that an unchanged tree is answered with 304 and a change produces a new ETag."""
+        etag = self.client.get('/api/ancestors/tree/')['ETag']
+        response = self.client.get('/api/ancestors/tree/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.father.occu = 'Schmied'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.father.save()
+        response = self.client.get('/api/ancestors/tree/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_change_by_another_process(self):
+        """Test that a write committed by another worker (only the shared version row changes) is not answered from the cache."""
+        etag = self.client.get('/api/ancestors/tree/')['ETag']
+        # Written without signals, as seen from this process: the data and the version row change
+        Person.objects.filter(pk=self.father.pk).update(givn='Johann', name='Johann Smith')
+        TreeVersion.objects.filter(pk=TreeVersion.ID).update(version=F('version') + 1)
+
+        response = self.client.get('/api/ancestors/tree/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('Johann Smith', response.data['nodes']['name'])
+
+    def test_unknown_family(self):
+        """Test that a family tree the user may not view is not found."""
+        response = self.client.get('/api/ancestors/tree/?family=johnson')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class MaskedPersonValuesTests(TestCase):
+    def setUp(self):
+        self.persons = [
+            Person.objects.create(
+                givn='John', surn='Smith', family_1='smith', confidential=confidential,
+                birt_date='03.04.1855', birt_plac='Köln'
+            )
+            for confidential in ('no', 'restricted', 'yes')
+        ]
+        for person in self.persons:
+            person.save_detail(note='Eine lange Notiz', sour='Kirchenbuch')
+
+    def test_fast_path_matches_instance_serialization(self):
+        """Test that the SQL masking produces the same data as serializing the model instances."""
+        for serializer_class in (PersonSerializer, PersonListSerializer):
+            rows = masked_person_values(Person.objects.order_by('id'), serializer_class.Meta.fields)
+            for person, row in zip(self.persons, rows):
+                self.assertEqual(
+                    dict(serializer_class(row).data),
+                    dict(serializer_class(person).data),
+                    msg=f'{serializer_class.__name__} / {person.confidential}'
+                )
+
+    def test_masked_columns_are_replaced_in_sql(self):
+        """Test that notes of confidential persons are not part of the fetched row."""
+        row = masked_person_values(Person.objects.filter(pk=self.persons[2].pk), ['note', 'sour', 'birt_plac']).get()
+        self.assertEqual((row['masked_note'], row['masked_sour'], row['masked_birt_plac']), ('', '', ''))
+
+
+class PersonDetailTableTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(
+            email='testuser@example.com',
+            password='testpassword',
+            username='testuser@example.com',
+            family_1='smith')
+        self.client.force_authenticate(user=self.user)
+        self.person = Person.objects.create(givn='John', surn='Smith', family_1='smith', confidential='no')
+        self.person.save_detail(note='Eine lange Notiz', sour='Kirchenbuch', fath_name='Peter Smith')
+        self.plain = Person.objects.create(givn='Jane', surn='Smith', family_1='smith', confidential='no')
+
+    def test_list_reads_only_person_rows(self):
+        """Test that the person list does not read the detail table."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/ancestors/persons/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertFalse(any('ancestors_persondetail' in query['sql'] for query in queries))
+
+    def test_detail_view_reads_and_writes_details(self):
+        """Test that the notes are shown and updated through the detail row, and found by the search."""
+        response = self.client.get(f'/api/ancestors/persons/{self.person.id}/')
+        self.assertEqual((response.data['note'], response.data['sour']), ('Eine lange Notiz', 'Kirchenbuch'))
+        response = self.client.get(f'/api/ancestors/persons/{self.plain.id}/')
+        self.assertIsNone(response.data['note'])
+
+        response = self.client.patch(f'/api/ancestors/persons/{self.plain.id}/', {'note': 'Bäckermeister', 'occu': 'Bäcker'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['note'], 'Bäckermeister')
+        self.assertEqual(PersonDetail.objects.get(person=self.plain).note, 'Bäckermeister')
+        self.assertEqual(search_person_ids(Person.objects.all(), 'Bäckermeister', 10), [self.plain.id])
+
+    def test_resource_keeps_detail_columns(self):
+        """Test that the import/export of persons still has the detail columns."""
+        exported = PersonResource().export()
+        rows = {row['refn']: row for row in exported.dict}
+        self.assertEqual((rows[self.person.refn]['note'], rows[self.person.refn]['fath_name']), ('Eine lange Notiz', 'Peter Smith'))
+
+        dataset = tablib.Dataset(headers=['refn', 'uid', 'name', 'givn', 'surn', 'family_1', 'note'])
+        dataset.append(['@I900@', '', 'Anna Smith', 'Anna', 'Smith', 'smith', 'Importierte Notiz'])
+        result = PersonResource().import_data(dataset, dry_run=False)
+        self.assertFalse(result.has_errors())
+        self.assertEqual(Person.objects.get(refn='@I900@').detail.note, 'Importierte Notiz')
+
+
+class PersonSearchViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(
+            email='testuser@example.com',
+            password='testpassword',
+            username='testuser@example.com',
+            family_1='smith')
+        self.user.is_active = True
+        self.user.save()
+        self.client.force_authenticate(user=self.user)
+
+        self.baker = Person.objects.create(givn='Johann', surn='Hünten', family_1='smith', confidential='no', occu='Bäcker', birt_plac='Köln')
+        self.smith = Person.objects.create(givn='Peter', surn='Schmidt', family_1='smith', confidential='no')
+        self.smith.save_detail(note='Bäckermeister in Köln')
+        self.restricted = Person.objects.create(givn='Anna', surn='Hünten', family_1='smith', confidential='restricted', occu='Bäckerin')
+        self.secret = Person.objects.create(givn='Maria', surn='Hünten', family_1='smith', confidential='yes')
+        self.other_family = Person.objects.create(givn='Karl', surn='Hünten', family_1='johnson', confidential='no')
+        self.url = reverse('person-search')
+
+    def search(self, query):
+        response = self.client.get(self.url, {'q': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [person['id'] for person in response.data['results']]
+
+    def test_search_ignores_diacritics_and_matches_prefixes(self):
+        """Test that every word is matched as a prefix, regardless of umlauts."""
+        self.assertEqual(self.search('hunt joh'), [self.baker.id])
+
+    def test_search_respects_family_and_confidentiality(self):
+        """Test that other families and confidential persons are not found, restricted persons only by name."""
+        self.assertCountEqual(self.search('hünten'), [self.baker.id, self.restricted.id])
+        self.assertEqual(self.search('bäckerin'), [])
+
+    def test_search_ranks_better_matches_first(self):
+        """Test that a person matching in short fields is ranked above a match in a long note."""
+        self.assertEqual(self.search('bäcker köln'), [self.baker.id, self.smith.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        """Test that the index is updated when a person is saved or deleted."""
+        self.smith.confidential = 'yes'
+        self.smith.save()
+        self.assertEqual(self.search('schmidt'), [])
+        self.baker.delete()
+        self.assertEqual(self.search('johann'), [])
+
+    def test_phonetic_search(self):
+        """Test that the phonetic mode finds historical spellings of a name."""
+        kempe = Person.objects.create(givn='Johann', surn='Kämpe', family_1='smith', confidential='no')
+        self.assertEqual(kempe.surn_phonetic, cologne_phonetics('Kempa'))
+        response = self.client.get(self.url, {'q': 'Kempa Johan', 'mode': 'phonetic'})
+        self.assertEqual([person['id'] for person in response.data['results']], [kempe.id])
+        response = self.client.get(self.url, {'q': 'Huenten', 'mode': 'phonetic'})
+        self.assertCountEqual([person['id'] for person in response.data['results']], [self.baker.id, self.restricted.id])
+
+    def test_unknown_mode(self):
+        """Test that an unknown search mode is rejected."""
+        response = self.client.get(self.url, {'q': 'kempe', 'mode': 'regex'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_empty_query(self):
+        """Test that a query without words is rejected."""
+        response = self.client.get(self.url, {'q': ' '})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ColognePhoneticsTests(TestCase):
+    def test_codes(self):
+        """Test the Kölner Phonetik against known codes."""
+        self.assertEqual(cologne_phonetics('Müller-Lüdenscheidt'), '65752682')
+        self.assertEqual(cologne_phonetics('Breschnew'), '17863')
+        self.assertEqual(cologne_phonetics('Kempe'), cologne_phonetics('Kämpe'))
+        self.assertEqual(cologne_phonetics('Hünten'), cologne_phonetics('Huenten'))
+        self.assertEqual(cologne_phonetics(None), '')
+
+
+class RefnSequenceTests(TestCase):
+    def test_new_persons_get_consecutive_refns(self):
+        """Test that new persons get increasing refns without reading the existing ones."""
+        first = Person.objects.create(givn='John', family_1='smith')
+        with CaptureQueriesContext(connection) as queries:
+            second_refn = Person.reserve_refns(1)[0]
+        self.assertFalse([query for query in queries if 'ancestors_person"' in query['sql']])
+        self.assertEqual(int(second_refn.strip('@I')), int(first.refn.strip('@I')) + 1)
+
+    def test_explicit_refns_are_skipped(self):
+        """Test that a refn given explicitly is never allocated again."""
+        Person.objects.create(givn='John', family_1='smith')
+        Person.objects.create(refn='@I5000@', givn='Jane', family_1='smith')
+        self.assertEqual(Person.objects.create(givn='Bob', family_1='smith').refn, '@I5001@')
+
+    def test_reserve_block(self):
+        """Test that a block of refns is reserved in one update."""
+        refns = Person.reserve_refns(1000)
+        self.assertEqual(len(set(refns)), 1000)
+        self.assertEqual(RefnSequence.objects.get(name=RefnSequence.PERSON).last_value, int(refns[-1].strip('@I')))
+
+    def test_sequence_is_seeded_from_existing_refns(self):
+        """Test that a missing counter row is seeded from the highest existing refn."""
+        Person.objects.create(refn='@I42@', givn='John', family_1='smith')
+        RefnSequence.objects.all().delete()
+        self.assertEqual(Person.reserve_refns(2), ['@I43@', '@I44@'])
+
+
+class RelationSyncTests(TestCase):
+    def setUp(self):
+        self.father = Person.objects.create(givn='Johann', surn='Kempe', sex='M', family_1='kempe')
+        self.mother = Person.objects.create(givn='Anna', surn='Kempe', sex='F', family_1='kempe')
+        self.children = [Person.objects.create(givn=f'Kind {i}', surn='Kempe', sex='M', family_1='kempe') for i in range(3)]
+
+    def test_child_relation_links_parents(self):
+        """Test that saving a child's Relation links the parents as spouses with the child."""
+        Relation.objects.create(person=self.children[0], fath_refn=self.father, moth_refn=self.mother)
+
+        father_relation = Relation.objects.get(person=self.father)
+        mother_relation = Relation.objects.get(person=self.mother)
+        self.assertEqual(father_relation.marr_spou_refn_1, self.mother)
+        self.assertEqual(mother_relation.marr_spou_refn_1, self.father)
+        self.assertEqual(list(father_relation.children_1.all()), [self.children[0]])
+        self.assertEqual(list(mother_relation.children_1.all()), [self.children[0]])
+
+        self.father.refresh_from_db()
+        self.children[0].refresh_from_db()
+        self.assertEqual(self.father.detail.marr_spou_refn_1, self.mother.refn)
+        self.assertEqual(self.father.detail.fam_chil_1, self.children[0].refn)
+        self.assertEqual((self.children[0].detail.fath_refn, self.children[0].detail.moth_refn), (self.father.refn, self.mother.refn))
+        self.assertTrue(is_descendant(self.children[0].id, self.father.id))
+
+    def test_added_children_get_parents(self):
+        """Test that children added to a Relation get the person and the spouse as parents."""
+        relation = Relation.objects.create(person=self.father, marr_spou_refn_1=self.mother, marr_date_1='01.05.1890')
+        relation.children_1.add(*self.children)
+
+        for child in self.children:
+            self.assertEqual(Relation.objects.get(person=child).fath_refn, self.father)
+            child.refresh_from_db()
+            self.assertEqual((child.detail.fath_refn, child.detail.moth_refn), (self.father.refn, self.mother.refn))
+        self.mother.refresh_from_db()
+        self.assertEqual((self.mother.detail.marr_spou_refn_1, self.mother.detail.marr_date_1), (self.father.refn, '01.05.1890'))
+        self.assertEqual(Relation.objects.get(person=self.mother).marr_date_1, '01.05.1890')
+
+    def test_query_budget(self):
+        """Test that propagating a Relation costs a small, fixed number of queries."""
+        relation = Relation.objects.create(person=self.father, marr_spou_refn_1=self.mother)
+        # The sync creates the Relations of these children; the first child has none yet
+        relation.children_1.add(*self.children[1:])
+        self.assertFalse(Relation.objects.filter(person=self.children[0]).exists())
+
+        # Including the savepoints, the upsert of the mirrored refn columns into PersonDetail,
+        # the refresh of the unions (three reads, the inserts of the new union and its child)
+        # and of the closure (five queries)
+        with self.assertNumQueries(31):
+            Relation.objects.create(person=self.children[0], fath_refn=self.father, moth_refn=self.mother, marr_plac_1='Köln')
+        self.assertEqual(Relation.objects.filter(person=self.children[0]).count(), 1)
+
+        relation.marr_date_1 = '01.05.1890'
+        with self.assertNumQueries(24):
+            relation.save()
+
+
+class BulkMaintenanceTests(TestCase):
+    def setUp(self):
+        self.father = Person.objects.create(givn='Johann', surn='Kempe', sex='M', family_1='kempe')
+        self.mother = Person.objects.create(givn='Anna', surn='Kempe', sex='F', family_1='kempe')
+        self.children = [Person.objects.create(givn=f'Kind {i}', surn='Kempe', sex='M', family_1='kempe') for i in range(5)]
+
+    def test_person_saves_cost_one_query(self):
+        """Test that saving a person inside the block only writes the row."""
+        with bulk_maintenance():
+            for child in self.children:
+                child.family_1 = 'huenten'
+                with self.assertNumQueries(1):
+                    child.save()
+
+    def test_replay_at_the_end(self):
+        """Test that the Relation sync, closure and search index are done once at the end of the block."""
+        with bulk_maintenance() as log:
+            for child in self.children:
+                Relation.objects.create(person=child, fath_refn=self.father, moth_refn=self.mother)
+            self.father.occu = 'Schmied'
+            self.father.save()
+            self.assertFalse(Relation.objects.filter(person=self.father).exists())
+            self.assertEqual(len(log.relations), 5)
+
+        father_relation = Relation.objects.get(person=self.father)
+        self.assertEqual(father_relation.marr_spou_refn_1, self.mother)
+        self.assertEqual(father_relation.children_1.count(), 5)
+        self.assertEqual(set(get_ancestor_ids(self.children[0].id)), {self.father.id, self.mother.id})
+        self.children[4].refresh_from_db()
+        self.assertEqual(self.children[4].detail.moth_refn, self.mother.refn)
+        response_ids = search_person_ids(Person.objects.all(), 'schmied', 10)
+        self.assertEqual(response_ids, [self.father.id])
+
+
+class UnionTests(TestCase):
+    def setUp(self):
+        clear_tree_caches()
+        self.father = Person.objects.create(givn='Johann', surn='Kempe', sex='M', family_1='kempe')
+        self.mother = Person.objects.create(givn='Anna', surn='Hünten', sex='F', family_1='kempe')
+        self.second_wife = Person.objects.create(givn='Maria', surn='Schmitz', sex='F', family_1='kempe')
+        self.children = [Person.objects.create(givn=f'Kind {i}', surn='Kempe', sex='M', family_1='kempe') for i in range(3)]
+        self.relation = Relation.objects.create(
+            person=self.father, marr_spou_refn_1=self.mother, marr_date_1='1880', marr_spou_refn_2=self.second_wife
+        )
+        self.relation.children_1.add(self.children[0], self.children[1])
+        self.relation.children_2.add(self.children[2])
+
+    def test_unions_follow_relations(self):
+        """Test that each couple is one union with the children of both Relations, kept up to date by the sync."""
+        union = Union.objects.get(partner_a=self.father, partner_b=self.mother)
+        self.assertEqual((union.slot_a, union.slot_b, union.marr_date), (1, 1, '1880'))
+        self.assertEqual(set(union.children.all()), {self.children[0], self.children[1]})
+        self.assertEqual(Union.objects.count(), 2)
+        self.assertEqual(set(Person.objects.filter(parent_unions__partner_a=self.father)), set(self.children))
+
+        self.relation.children_1.remove(self.children[1])
+        Relation.objects.filter(person=self.mother).get().children_1.remove(self.children[1])
+        self.assertEqual(list(union.children.all()), [self.children[0]])
+        Relation.objects.filter(person=self.second_wife).delete()
+        self.relation.delete()
+        self.assertFalse(Union.objects.filter(partner_b=self.second_wife).exists())
+
+    def test_rebuild_unions(self):
+        """Test that a full rebuild gives the same unions as the incremental refresh."""
+        def unions():
+            return sorted(
+                (union.partner_a_id, union.partner_b_id, union.slot_a, union.slot_b, union.marr_date, sorted(union.children.values_list('id', flat=True)))
+                for union in Union.objects.all()
+            )
+        refreshed = unions()
+        self.assertEqual(rebuild_unions(), 2)
+        self.assertEqual(unions(), refreshed)
+
+    def test_person_unions_view(self):
+        """Test that the unions of a person are returned normalized or in the shape of the Relation endpoint."""
+        client = APIClient()
+        user = CustomUser.objects.create_user(email='testuser@example.com', password='testpassword', username='testuser@example.com', family_1='kempe')
+        client.force_authenticate(user=user)
+        url = reverse('person-unions', args=[self.father.id])
+
+        response = client.get(url)
+        self.assertEqual([(union['partner_b'], union['children']) for union in response.data],
+                         [(self.mother.id, [self.children[0].id, self.children[1].id]), (self.second_wife.id, [self.children[2].id])])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, {'shape': 'relation'})
+        self.assertLessEqual(len(queries), 8)
+        expected = RelationSerializer(Relation.objects.get(person=self.father)).data
+        self.assertEqual(response.data, {field_name: value for field_name, value in expected.items() if field_name != 'id'})
+
+        child_response = client.get(reverse('person-unions', args=[self.children[0].id]), {'shape': 'relation'})
+        self.assertEqual((child_response.data['fath_refn'], child_response.data['moth_refn']), (self.father.id, self.mother.id))
+        self.assertEqual(client.get(reverse('person-unions', args=[999999])).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RelationImportTests(TestCase):
+    def setUp(self):
+        self.father = Person.objects.create(givn='Johann', surn='Kempe', sex='M', family_1='kempe')
+        self.mother = Person.objects.create(givn='Anna', surn='Kempe', sex='F', family_1='kempe')
+        self.children = [Person.objects.create(givn=f'Kind {i}', surn='Kempe', sex='M', family_1='kempe') for i in range(3)]
+        self.rows = [
+            {'person': child.refn, 'fath_refn': self.father.refn, 'moth_refn': self.mother.refn, 'children_1': ''}
+            for child in self.children
+        ] + [{
+            'person': self.father.refn, 'fath_refn': '@I999@', 'moth_refn': '', 'marr_spou_refn_1': self.mother.refn,
+            'marr_date_1': '1880', 'children_1': ','.join(child.refn for child in self.children) + ',@I998@',
+        }, {'person': '@I997@', 'fath_refn': self.father.refn}]
+
+    def test_import_rows(self):
+        """Test that rows are resolved from one refn map and unknown refns are reported."""
+        importer = RelationImporter()
+        with CaptureQueriesContext(connection) as queries:
+            stats = importer.run(self.rows)
+        self.assertEqual(stats, {'created': 4, 'updated': 0, 'skipped': 1})
+        self.assertEqual(importer.unresolved, [(4, 'fath_refn', '@I999@'), (4, 'children_1', '@I998@'), (5, 'person', '@I997@')])
+        self.assertLess(len(queries), 40)
+
+        father_relation = Relation.objects.get(person=self.father)
+        self.assertIsNone(father_relation.fath_refn)
+        self.assertEqual(father_relation.marr_date_1, '1880')
+        self.assertEqual(set(father_relation.children_1.all()), set(self.children))
+        mother_relation = Relation.objects.get(person=self.mother)
+        self.assertEqual(mother_relation.marr_spou_refn_1, self.father)
+        self.assertEqual(set(get_ancestor_ids(self.children[0].id)), {self.father.id, self.mother.id})
+        self.children[0].refresh_from_db()
+        self.assertEqual(self.children[0].detail.fath_refn, self.father.refn)
+
+    def test_reimport_updates(self):
+        """Test that a second import updates the Relations and replaces the children."""
+        RelationImporter().run(self.rows)
+        stats = RelationImporter().run([{'person': self.father.refn, 'children_1': self.children[0].refn}])
+        self.assertEqual(stats['updated'], 1)
+        father_relation = Relation.objects.get(person=self.father)
+        self.assertEqual(list(father_relation.children_1.all()), [self.children[0]])
+        self.assertEqual(father_relation.marr_spou_refn_1, self.mother)
+
+    def test_admin_resource(self):
+        """Test that the admin resource resolves refns from the preloaded map."""
+        headers = RelationResource._meta.fields
+        dataset = tablib.Dataset(headers=headers)
+        row = {'person': self.children[0].refn, 'fath_refn': self.father.refn, 'moth_refn': '@I999@'}
+        dataset.append([row.get(header, '') for header in headers])
+        result = RelationResource().import_data(dataset, dry_run=False)
+        self.assertFalse(result.has_errors())
+        self.assertEqual(result.unresolved_refns, [(1, 'moth_refn', '@I999@')])
+        relation = Relation.objects.get(person=self.children[0])
+        self.assertEqual((relation.fath_refn, relation.moth_refn), (self.father, None))
+
+    def test_admin_resource_dry_run(self):
+        """Test that a dry run of the admin resource neither saves the rows nor bumps the tree version."""
+        headers = RelationResource._meta.fields
+        dataset = tablib.Dataset(headers=headers)
+        row = {'person': self.children[0].refn, 'fath_refn': self.father.refn}
+        dataset.append([row.get(header, '') for header in headers])
+        version = get_tree_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            result = RelationResource().import_data(dataset, dry_run=True)
+        self.assertFalse(result.has_errors())
+        self.assertFalse(Relation.objects.filter(person=self.children[0]).exists())
+        self.assertEqual(get_tree_version(), version)
+
+    def test_export_query_count(self):
+        """Test that exporting relations costs the same number of queries for any number of rows."""
+        RelationImporter().run(self.rows)
+
+        def export_query_count():
+            with CaptureQueriesContext(connection) as queries:
+                dataset = RelationResource().export(Relation.objects.order_by('id'))
+            return len(queries), dataset
+
+        few_queries, _ = export_query_count()
+        for index in range(20):
+            child = Person.objects.create(givn=f'Enkel {index}', surn='Kempe', sex='F', family_1='kempe')
+            Relation.objects.create(person=child, fath_refn=self.children[0])
+        many_queries, dataset = export_query_count()
+        self.assertEqual(few_queries, many_queries)
+        father_row = dataset.dict[[row['person'] for row in dataset.dict].index(self.father.refn)]
+        self.assertEqual(father_row['marr_spou_refn_1'], self.mother.refn)
+        self.assertEqual(set(father_row['children_1'].split(',')), {child.refn for child in self.children})
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        clear_tree_caches()
+        self.admin_user = CustomUser.objects.create_superuser(email='admin@example.com', password='testpassword', username='admin@example.com')
+        self.client.force_login(self.admin_user)
+        self.father = Person.objects.create(givn='Johann', surn='Kempe', sex='M', family_1='kempe')
+        self.father.save_detail(note='Notiz ' * 100)
+        self.mother = Person.objects.create(givn='Anna', surn='Hünten', sex='F', family_1='huenten', family_2='kempe')
+
+    def add_children(self, count):
+        for index in range(count):
+            child = Person.objects.create(givn=f'Kind {index}', surn='Kempe', sex='M', family_1='kempe')
+            child.save_detail(note='Notiz')
+            Relation.objects.create(person=child, fath_refn=self.father, moth_refn=self.mother)
+
+    def changelist_query_counts(self, model_name):
+        url = reverse(f'admin:ancestors_{model_name}_changelist')
+        counts = []
+        for count in (2, 10):
+            self.add_children(count)
+            self.client.get(url)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(queries))
+        return counts, response
+
+    def test_relation_changelist_query_budget(self):
+        """Test that the relation changelist costs the same number of queries for any number of rows."""
+        (few, many), response = self.changelist_query_counts('relation')
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, 12)
+        self.assertContains(response, 'Kind 9')
+
+    def test_person_changelist_note_preview(self):
+        """Test that the person changelist has a fixed query count and shortens the notes."""
+        (few, many), response = self.changelist_query_counts('person')
+        self.assertEqual(few, many)
+        self.assertNotContains(response, self.father.detail.note.strip())
+        self.assertContains(response, 'Notiz Notiz')
+
+    def autocomplete(self, term, user=None):
+        self.client.force_login(user or self.admin_user)
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'term': term, 'app_label': 'ancestors', 'model_name': 'relation', 'field_name': 'children_1',
+        })
+        self.assertEqual(response.status_code, 200)
+        return [result['text'] for result in response.json()['results']]
+
+    def test_autocomplete(self):
+        """Test that the autocomplete finds persons by name prefix, sound and refn within the editor's families."""
+        self.assertEqual(self.autocomplete('kem'), ['Johann Kempe'])
+        self.assertNotContains(self.client.get(reverse('admin:ancestors_relation_add')), 'Anna Hünten')
+        self.assertEqual(self.autocomplete('Hinten An'), ['Anna Hünten'])
+        self.assertEqual(self.autocomplete(self.father.refn), ['Johann Kempe'])
+        self.assertEqual(self.autocomplete('Müller'), [])
+
+        editor = CustomUser.objects.create_user(email='editor@example.com', password='testpassword', username='editor@example.com', family_1='huenten', is_staff=True, is_active=True)
+        editor.user_permissions.add(*Permission.objects.filter(codename__in=['view_person', 'change_relation']))
+        self.assertEqual(self.autocomplete('k', editor), [])
+        self.assertEqual(self.autocomplete('a', editor), ['Anna Hünten'])
+
+
+class GenealogicalDateTests(TestCase):
+    def test_parse(self):
+        """Test that free-text dates in German and GEDCOM notation are parsed into day ranges."""
+        def days(*parts):
+            return date(*parts).toordinal()
+
+        self.assertEqual(parse_genealogical_date('12.03.1855'), (days(1855, 3, 12), days(1855, 3, 12), DateQualifier.EXACT))
+        self.assertEqual(parse_genealogical_date('12 MAR 1855'), (days(1855, 3, 12), days(1855, 3, 12), DateQualifier.EXACT))
+        self.assertEqual(parse_genealogical_date('02.1900'), (days(1900, 2, 1), days(1900, 2, 28), DateQualifier.EXACT))
+        self.assertEqual(parse_genealogical_date('ABT 1850'), (days(1850, 1, 1), days(1850, 12, 31), DateQualifier.ABOUT))
+        self.assertEqual(parse_genealogical_date('ca. 1850'), (days(1850, 1, 1), days(1850, 12, 31), DateQualifier.ESTIMATED))
+        self.assertEqual(parse_genealogical_date('vor 1799'), (None, days(1798, 12, 31), DateQualifier.BEFORE))
+        self.assertEqual(parse_genealogical_date('AFT FEB 1800'), (days(1800, 3, 1), None, DateQualifier.AFTER))
+        self.assertEqual(parse_genealogical_date('zwischen 1850 und 03.1855'), (days(1850, 1, 1), days(1855, 3, 31), DateQualifier.BETWEEN))
+        for text in (None, '', 'Frühjahr 1855', '31.02.1855', 'zwischen 1860 und 1850'):
+            self.assertEqual(parse_genealogical_date(text), (None, None, None))
+
+    def test_marriage_dates_follow_the_relation(self):
+        """Test that the day ranges of the marriage dates are kept up to date by the Relation sync."""
+        husband = Person.objects.create(givn='Johann', surn='Kempe', sex='M', family_1='kempe')
+        wife = Person.objects.create(givn='Anna', surn='Kempe', sex='F', family_1='kempe')
+        Relation.objects.create(person=husband, marr_spou_refn_1=wife, marr_date_1='um 1880')
+        wife.refresh_from_db()
+        self.assertEqual((wife.detail.marr_earliest_1, wife.detail.marr_qualifier_1), (date(1880, 1, 1).toordinal(), DateQualifier.ABOUT))
+
+
+class StatisticsViewTests(TestCase):
+    def setUp(self):
+        clear_tree_caches()
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(email='user@example.com', password='testpassword', username='user@example.com', family_1='kempe')
+        self.client.force_authenticate(user=self.user)
+        self.father = Person.objects.create(givn='Johann', surn='Kempe', sex='M', family_1='kempe', birt_date='12.03.1855', deat_date='1921', birt_plac='Köln')
+        self.mother = Person.objects.create(givn='Anna', surn='Hünten', sex='F', family_1='huenten', family_2='kempe', birt_date='um 1858', birt_plac='Köln')
+        self.child = Person.objects.create(givn='Peter', surn='Kempe', sex='M', family_1='kempe', birt_date='zwischen 1880 und 1885', birt_plac='Bonn')
+        Person.objects.create(givn='Geheim', surn='Kempe', family_1='kempe', confidential='yes', birt_date='1990', birt_plac='Berlin')
+        Person.objects.create(givn='Karl', surn='Schmidt', family_1='huenten', birt_date='1700')
+        Relation.objects.create(person=self.child, fath_refn=self.father, moth_refn=self.mother)
+
+    def test_statistics(self):
+        """Test that the statistics are computed per visible family tree."""
+        response = self.client.get(reverse('statistics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.data), ['kempe'])
+        statistics = response.data['kempe']
+        self.assertEqual(statistics['persons'], 4)
+        self.assertEqual(statistics['births_per_decade'], [{'decade': 1850, 'count': 2}, {'decade': 1880, 'count': 1}])
+        self.assertEqual(statistics['deaths_per_decade'], [{'decade': 1920, 'count': 1}])
+        self.assertEqual(statistics['lifespans'], [{'from': 60, 'to': 69, 'count': 1}])
+        self.assertEqual(statistics['surnames'], [{'value': 'Kempe', 'count': 2}, {'value': 'Hünten', 'count': 1}])
+        self.assertEqual(statistics['birth_places'], [{'value': 'Köln', 'count': 2}, {'value': 'Bonn', 'count': 1}])
+        self.assertEqual(statistics['generations'], [{'generation': 0, 'count': 2}, {'generation': 1, 'count': 1}])
+
+    def test_statistics_cached_per_tree_version(self):
+        """Test that the statistics are cached and computed again after a change."""
+        self.client.get(reverse('statistics'))
+        # Only the tree version is read
+        with self.assertNumQueries(1):
+            self.client.get(reverse('statistics'))
+        self.child.deat_date = '1950'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.child.save()
+        response = self.client.get(reverse('statistics'), {'family': 'kempe'})
+        self.assertEqual(response.data['kempe']['deaths_per_decade'][-1], {'decade': 1950, 'count': 1})
+        self.assertEqual(self.client.get(reverse('statistics'), {'family': 'huenten'}).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_change_by_another_process(self):
+        """Test that a change committed by another worker (only the shared version row changes) invalidates the cached statistics."""
+        self.client.get(reverse('statistics'))
+        Person.objects.filter(pk=self.child.pk).update(deat_date='1950', deat_earliest=date(1950, 1, 1).toordinal(), deat_latest=date(1950, 12, 31).toordinal())
+        TreeVersion.objects.filter(pk=TreeVersion.ID).update(version=F('version') + 1)
+        response = self.client.get(reverse('statistics'), {'family': 'kempe'})
+        self.assertEqual(response.data['kempe']['deaths_per_decade'][-1], {'decade': 1950, 'count': 1})
+
+
+class DuplicateDetectionTests(TestCase):
+    def setUp(self):
+        self.father = Person.objects.create(givn='Johann', surn='Kempe', sex='M', family_1='kempe', birt_date='1820')
+        self.original = Person.objects.create(givn='Peter', surn='Kempe', sex='M', family_1='kempe', birt_date='12.03.1855', birt_plac='Köln')
+        self.duplicate = Person.objects.create(givn='Peter', surn='Kämpe', sex='M', family_1='kempe', birt_date='um 1855', birt_plac='Köln')
+        self.undated = Person.objects.create(givn='Peter', surn='Kempe', sex='M', family_1='kempe')
+        Person.objects.create(givn='Peter', surn='Kempe', sex='M', family_1='kempe', birt_date='1890')
+        Person.objects.create(givn='Petra', surn='Kempe', sex='F', family_1='kempe', birt_date='1855')
+        Person.objects.create(givn='Peter', surn='Hünten', sex='M', family_1='huenten', birt_date='1855')
+        Relation.objects.create(person=self.original, fath_refn=self.father)
+        Relation.objects.create(person=self.undated, fath_refn=self.father)
+
+    def test_find_duplicates(self):
+        """Test that only similar persons in the same block are reported, best matches first."""
+        pairs = [(a, b) for a, b, score, reasons in find_duplicates()]
+        self.assertEqual(pairs, [(self.original.id, self.duplicate.id), (self.original.id, self.undated.id)])
+        rows = load_person_rows()
+        compared = {(a.id, b.id) for a, b in candidate_pairs(rows)}
+        self.assertLess(len(compared), len(rows) * (len(rows) - 1) // 2)
+
+    def test_review(self):
+        """Test that staff users can run the detection and review the stored candidates."""
+        client = APIClient()
+        staff = CustomUser.objects.create_user(email='staff@example.com', password='testpassword', username='staff@example.com', family_1='kempe', is_staff=True)
+        client.force_authenticate(user=staff)
+        response = client.post(reverse('duplicate-list'), {'min_score': 0.6}, format='json')
+        self.assertEqual(response.data, {'found': 2, 'new': 2, 'removed': 0})
+        results = client.get(reverse('duplicate-list')).data['results']
+        self.assertEqual(results[0]['person_b']['id'], self.duplicate.id)
+
+        response = client.patch(reverse('duplicate-detail', args=[results[1]['id']]), {'status': 'rejected', 'score': 0}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        candidate = DuplicateCandidate.objects.get(pk=results[1]['id'])
+        self.assertEqual((candidate.status, candidate.reviewed_by, candidate.score > 0), ('rejected', staff, True))
+
+        # Reviewed pairs are kept, open pairs that are no longer found are removed
+        self.duplicate.birt_date = '1700'
+        self.duplicate.save()
+        self.assertEqual(detect_duplicates(), {'found': 1, 'new': 0, 'removed': 1})
+        self.assertEqual(len(client.get(reverse('duplicate-list')).data['results']), 0)
+        self.assertEqual(client.post(reverse('duplicate-list'), {'min_score': 'hoch'}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MergePersonsTests(TestCase):
+    def setUp(self):
+        self.father = Person.objects.create(givn='Johann', surn='Kempe', sex='M', family_1='kempe')
+        self.mother = Person.objects.create(givn='Anna', surn='Hünten', sex='F', family_1='kempe')
+        self.wife = Person.objects.create(givn='Maria', surn='Schmitz', sex='F', family_1='kempe')
+        self.original = Person.objects.create(givn='Peter', surn='Kempe', sex='M', family_1='kempe', birt_date='1855')
+        self.duplicate = Person.objects.create(givn='Peter', surn='Kempe', sex='M', family_1='kempe', birt_date='um 1855')
+        self.first_child = Person.objects.create(givn='Paul', surn='Kempe', sex='M', family_1='kempe')
+        self.second_child = Person.objects.create(givn='Paula', surn='Kempe', sex='F', family_1='kempe')
+        Relation.objects.create(person=self.original, fath_refn=self.father, marr_spou_refn_1=self.wife).children_1.set([self.first_child])
+        Relation.objects.create(person=self.duplicate, moth_refn=self.mother, marr_spou_refn_1=self.wife, marr_date_1='1880').children_1.set([self.second_child])
+        author = CustomUser.objects.create_user(email='author@example.com', password='testpassword', username='author@example.com')
+        self.discussion = Discussion.objects.create(person=self.duplicate)
+        DiscussionEntry.objects.create(discussion=self.discussion, author=author, content='Gleiche Person?')
+
+    def test_merge_persons(self):
+        """Test that all references to the merged person are rewritten to the kept person."""
+        duplicate_refn = self.duplicate.refn
+        self.duplicate.save_detail(obje_file_1='images/hochzeit.jpg', obje_titl_1='Hochzeit')
+        merge_persons(self.original, self.duplicate)
+
+        self.assertFalse(Person.objects.filter(pk=self.duplicate.pk).exists())
+        self.assertEqual(PersonAlias.objects.get(refn=duplicate_refn).person, self.original)
+        relation = Relation.objects.get(person=self.original)
+        self.assertEqual((relation.fath_refn, relation.moth_refn, relation.marr_spou_refn_1, relation.marr_date_1),
+                         (self.father, self.mother, self.wife, '1880'))
+        self.assertEqual(set(relation.children_1.all()), {self.first_child, self.second_child})
+
+        # The wife had both persons as spouses, now the kept person only once
+        wife_relation = Relation.objects.get(person=self.wife)
+        spouses = [getattr(wife_relation, f'marr_spou_refn_{slot}_id') for slot in (1, 2, 3, 4)]
+        self.assertEqual(spouses.count(self.original.id), 1)
+        self.assertNotIn(self.duplicate.id, spouses)
+        self.assertEqual(Relation.objects.get(person=self.second_child).fath_refn, self.original)
+        self.second_child.refresh_from_db()
+        self.assertEqual(self.second_child.detail.fath_refn, self.original.refn)
+        detail = PersonDetail.objects.get(person=self.original)
+        self.assertEqual((detail.obje_file_1.name, detail.obje_titl_1), (f'images/{self.original.id}_image1.jpg', 'Hochzeit'))
+        self.assertEqual(set(get_ancestor_ids(self.second_child.id)), {self.original.id, self.father.id, self.mother.id})
+        self.assertEqual(Discussion.objects.get(pk=self.discussion.pk).person, self.original)
+
+    def test_merge_admin_action(self):
+        """Test that superusers can merge two selected persons in the admin."""
+        admin_user = CustomUser.objects.create_superuser(email='admin@example.com', password='testpassword', username='admin@example.com')
+        self.client.force_login(admin_user)
+        url = reverse('admin:ancestors_person_changelist')
+        self.client.post(url, {'action': 'merge_selected_persons', '_selected_action': [self.duplicate.pk]})
+        self.assertTrue(Person.objects.filter(pk=self.duplicate.pk).exists())
+
+        self.client.post(url, {'action': 'merge_selected_persons', '_selected_action': [self.original.pk, self.duplicate.pk]})
+        self.assertFalse(Person.objects.filter(pk=self.duplicate.pk).exists())
+        self.assertEqual(Relation.objects.get(person=self.second_child).fath_refn, self.original)
+
+
+GEDCOM_SAMPLE = """0 HEAD
+1 CHAR UTF-8
+0 @I1@ INDI
+1 NAME Johann /Kempe/
+1 SEX M
+1 BIRT
+2 DATE 12 MAR 1855
+2 PLAC Köln
+1 NOTE Erste Zeile
+2 CONT zweite Zeile
+1 FAMS @F1@
+0 @I2@ INDI
+1 NAME Anna /Hünten/
+1 SEX F
+1 FAMS @F1@
+0 @I3@ INDI
+1 NAME Peter /Kempe/
+1 SEX M
+1 FAMC @F1@
+0 @F1@ FAM
+1 HUSB @I1@
+1 WIFE @I2@
+1 CHIL @I3@
+1 MARR
+2 DATE ABT 1880
+0 TRLR
+"""
+
+
+class GedcomImportTests(TestCase):
+    def import_sample(self):
+        return GedcomImporter('kempe').run(parse_gedcom(io.StringIO(GEDCOM_SAMPLE)))
+
+    def test_import_persons_and_families(self):
+        """Test that persons, parents, spouses and children are imported."""
+        stats = self.import_sample()
+        self.assertEqual((stats['persons_created'], stats['relations']), (3, 3))
+
+        father = Person.objects.get(refn='@I1@')
+        self.assertEqual((father.name, father.birt_date, father.detail.note), ('Johann Kempe', '12.03.1855', 'Erste Zeile\nzweite Zeile'))
+        self.assertEqual(father.surn_phonetic, cologne_phonetics('Kempe'))
+        child_relation = Relation.objects.get(person__refn='@I3@')
+        self.assertEqual((child_relation.fath_refn.refn, child_relation.moth_refn.refn), ('@I1@', '@I2@'))
+        father_relation = Relation.objects.get(person=father)
+        self.assertEqual((father_relation.marr_spou_refn_1.refn, father_relation.marr_date_1), ('@I2@', 'um 1880'))
+        self.assertEqual([child.refn for child in father_relation.children_1.all()], ['@I3@'])
+        self.assertEqual(Person.objects.get(refn='@I3@').detail.fath_refn, '@I1@')
+        self.assertEqual(set(get_ancestor_ids(child_relation.person_id)), {father.id, child_relation.moth_refn_id})
+        child = Person.objects.get(refn='@I3@')
+        self.assertEqual((father.descendant_count, father.generation_index, father.sort_descendants), (1, 1, 1))
+        self.assertEqual((child.descendant_count, child.ancestor_generations), (0, 1))
+        self.assertEqual(Person.objects.create(givn='Neu', family_1='kempe').refn, '@I4@')
+
+    def test_reimport_updates(self):
+        """Test that a second import updates the persons and relations instead of duplicating them."""
+        self.import_sample()
+        stats = self.import_sample()
+        self.assertEqual((stats['persons_created'], stats['persons_updated']), (0, 3))
+        self.assertEqual(Person.objects.count(), 3)
+        self.assertEqual(Relation.objects.get(person__refn='@I1@').children_1.count(), 1)
+
+    def test_dates_and_errors(self):
+        """Test the date conversion and that invalid lines are rejected."""
+        self.assertEqual(gedcom_date_to_text('BET 1850 AND MAR 1855'), 'zwischen 1850 und 03.1855')
+        self.assertEqual(gedcom_date_to_text('(unbekannt)'), 'unbekannt')
+        with self.assertRaises(GedcomError):
+            list(parse_gedcom(['0 HEAD', '2 SOUR x']))
+
+
+class GedcomExportViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = CustomUser.objects.create_user(
+            email='staff@example.com',
+            password='testpassword',
+            username='staff@example.com',
+            family_1='kempe',
+            is_staff=True)
+        GedcomImporter('kempe').run(parse_gedcom(io.StringIO(GEDCOM_SAMPLE)))
+        self.url = reverse('gedcom-export')
+
+    def export(self):
+        response = self.client.get(self.url, {'family': 'kempe'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_export_round_trip(self):
+        """Test that an exported family tree is imported again without changes."""
+        self.client.force_authenticate(user=self.staff)
+        exported = self.export()
+        self.assertIn('0 @F1_2@ FAM\n1 HUSB @I1@\n1 WIFE @I2@\n1 CHIL @I3@\n1 MARR\n2 DATE ABT 1880\n', exported)
+        self.assertIn('1 NOTE Erste Zeile\n2 CONT zweite Zeile\n', exported)
+
+        stats = GedcomImporter('kempe').run(parse_gedcom(io.StringIO(exported)))
+        self.assertEqual((stats['persons_created'], stats['persons_updated']), (0, 3))
+        self.assertEqual(self.export(), exported)
+
+    def test_export_requires_staff(self):
+        """Test that only staff users can export and the family must be known."""
+        user = CustomUser.objects.create_user(email='user@example.com', password='testpassword', username='user@example.com', family_1='kempe')
+        self.client.force_authenticate(user=user)
+        self.assertEqual(self.client.get(self.url, {'family': 'kempe'}).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(user=self.staff)
+        self.assertEqual(self.client.get(self.url, {'family': 'unknown'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_lines_and_dates(self):
+        """Test that long values are split into CONC lines and dates are converted back."""
+        lines = gedcom_lines(1, 'NOTE', 'x' * 450)
+        self.assertEqual([line.split(' ')[1] for line in lines], ['NOTE', 'CONC', 'CONC'])
+        self.assertEqual(''.join(line.rstrip('\n').split(' ', 2)[2] for line in lines), 'x' * 450)
+        self.assertEqual(text_to_gedcom_date('12.03.1855'), '12 MAR 1855')
+        self.assertEqual(text_to_gedcom_date('zwischen 1850 und 03.1855'), 'BET 1850 AND MAR 1855')
+        self.assertEqual(text_to_gedcom_date('Frühjahr 1855'), '(Frühjahr 1855)')
@@ -0,0 +1,182 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import IntegerField, Q, Value
+
+from .graph import CHILDREN_FIELDS
+from .models import Relation, Union, UnionChild
+
+
+SLOTS = (1, 2, 3, 4)
+MARRIAGE_FIELDS = ('marr_date', 'marr_plac', 'fam_stat')
+UNION_FIELDS = ('slot_a', 'slot_b') + MARRIAGE_FIELDS
+SPOUSE_FIELDS = tuple(f'marr_spou_refn_{slot}' for slot in SLOTS)
+RELATION_LOAD_FIELDS = ('id', 'person') + SPOUSE_FIELDS + tuple(
+    f'{name}_{slot}' for slot in SLOTS for name in MARRIAGE_FIELDS
+)
+
+
+def collect_unions(relations, children, person_ids=None):
+    """
+    Combine the marriage slots of the Relations into one union per couple.
+
+    A couple is listed in the Relations of both partners; the values of the partner with the
+    lower id win and the children of both slots are combined. A slot without spouse becomes a
+    union of the person alone. Only the first Relation (lowest id) of a person is used.
+
+    Parameters:
+    - relations: The Relations of the partners.
+    - children: Maps (relation id, slot) to the list of child ids of that slot.
+    - person_ids: Only collect the unions with one of these partners (optional, default: all).
+
+    Returns:
+    - dict: Maps (partner_a, partner_b) to the values of the union ('slot_a', 'slot_b',
+      'marr_date', 'marr_plac', 'fam_stat' and the list of 'children')
+    """
+    first_relations = {}
+    for relation in sorted(relations, key=lambda relation: relation.pk):
+        first_relations.setdefault(relation.person_id, relation)
+
+    unions = {}
+    for person_id in sorted(first_relations):
+        relation = first_relations[person_id]
+        for slot in SLOTS:
+            spouse_id = getattr(relation, f'marr_spou_refn_{slot}_id')
+            spouse_id = None if spouse_id == person_id else spouse_id
+            child_ids = children.get((relation.pk, slot), [])
+            values = {name: getattr(relation, f'{name}_{slot}') for name in MARRIAGE_FIELDS}
+            if not spouse_id and not child_ids and not any(values.values()):
+                continue
+            partners = (min(person_id, spouse_id), max(person_id, spouse_id)) if spouse_id else (person_id, None)
+            if person_ids is not None and not person_ids.intersection(partners):
+                continue
+
+            union = unions.setdefault(partners, {'slot_a': None, 'slot_b': None, **dict.fromkeys(MARRIAGE_FIELDS), 'children': []})
+            own_slot = 'slot_a' if person_id == partners[0] else 'slot_b'
+            union[own_slot] = union[own_slot] or slot
+            for name, value in values.items():
+                union[name] = union[name] or value
+            for child_id in child_ids:
+                if child_id not in union['children'] and child_id not in partners:
+                    union['children'].append(child_id)
+    return unions
+
+
+def load_slot_children(through_models, relation_ids=None):
+    """
+    Load the children per (relation id, slot) from the `children_N` through tables, with one
+    UNION ALL query over the four tables.
+
+    Parameters:
+    - through_models: The through models of `children_1` to `children_4`.
+    - relation_ids: Only load the children of these Relations (optional, default: all).
+    """
+    querysets = [
+        (through.objects.all() if relation_ids is None else through.objects.filter(relation_id__in=relation_ids)).annotate(
+            slot=Value(slot, output_field=IntegerField())
+        ).values_list('slot', 'id', 'relation_id', 'person_id')
+        for slot, through in zip(SLOTS, through_models)
+    ]
+    children = {}
+    if relation_ids is not None and not relation_ids:
+        return children
+    for slot, _, relation_id, child_id in sorted(querysets[0].union(*querysets[1:], all=True)):
+        children.setdefault((relation_id, slot), []).append(child_id)
+    return children
+
+
+def create_unions(union_model, child_model, unions, batch_size=500):
+    """
+    Write the collected unions and their children with two bulk inserts.
+    """
+    rows = {
+        partners: union_model(
+            partner_a_id=partners[0], partner_b_id=partners[1],
+            **{name: value for name, value in values.items() if name != 'children'}
+        )
+        for partners, values in unions.items()
+    }
+    union_model.objects.bulk_create(rows.values(), batch_size=batch_size)
+    # bulk_create sets the primary keys of the unions (SQLite 3.35+, PostgreSQL)
+    child_model.objects.bulk_create(
+        [child_model(union_id=rows[partners].pk, child_id=child_id) for partners, values in unions.items() for child_id in values['children']],
+        batch_size=batch_size
+    )
+
+
+def refresh_unions(person_ids):
+    """
+    Update the unions of the given persons from their Relations and the Relations of their spouses.
+
+    Called by the Relation sync for the persons, parents and spouses of the synced Relations.
+    The unions are compared with the stored ones and only the differences are written, so a
+    refresh without changes costs three queries.
+
+    Parameters:
+    - person_ids: The ids of the persons whose marriages or children may have changed.
+    """
+    person_ids = {person_id for person_id in person_ids if person_id}
+    if not person_ids:
+        return
+
+    condition = Q(person_id__in=person_ids)
+    for field_name in SPOUSE_FIELDS:
+        condition |= Q(**{f'{field_name}__in': person_ids})
+    with transaction.atomic():
+        relations = list(Relation.objects.filter(condition).only(*RELATION_LOAD_FIELDS))
+        through_models = [getattr(Relation, field_name).through for field_name in CHILDREN_FIELDS]
+        unions = collect_unions(relations, load_slot_children(through_models, [relation.pk for relation in relations]), person_ids)
+
+        # The stored unions and their children in one query (LEFT JOIN)
+        existing, links = {}, defaultdict(dict)
+        rows = Union.objects.filter(Q(partner_a_id__in=person_ids) | Q(partner_b_id__in=person_ids)).values_list(
+            'id', 'partner_a_id', 'partner_b_id', *UNION_FIELDS, 'child_links__id', 'child_links__child_id'
+        )
+        for union_id, partner_a_id, partner_b_id, *values, link_id, child_id in rows:
+            if (partner_a_id, partner_b_id) not in existing:
+                existing[(partner_a_id, partner_b_id)] = Union(id=union_id, partner_a_id=partner_a_id, partner_b_id=partner_b_id, **dict(zip(UNION_FIELDS, values)))
+            if link_id:
+                links[union_id][child_id] = link_id
+
+        new_unions, changed, changed_fields, added_links, removed_links = {}, [], set(), [], []
+        for partners, values in unions.items():
+            union = existing.get(partners)
+            if union is None:
+                new_unions[partners] = values
+                continue
+            fields = {name for name in UNION_FIELDS if getattr(union, name) != values[name]}
+            for name in fields:
+                setattr(union, name, values[name])
+            if fields:
+                changed.append(union)
+                changed_fields |= fields
+            removed_links += [link_id for child_id, link_id in links[union.pk].items() if child_id not in values['children']]
+            added_links += [UnionChild(union_id=union.pk, child_id=child_id) for child_id in values['children'] if child_id not in links[union.pk]]
+
+        removed = [union.pk for partners, union in existing.items() if partners not in unions]
+        if removed:
+            Union.objects.filter(pk__in=removed).delete()
+        if changed:
+            Union.objects.bulk_update(changed, sorted(changed_fields))
+        if removed_links:
+            UnionChild.objects.filter(pk__in=removed_links).delete()
+        if added_links:
+            UnionChild.objects.bulk_create(added_links)
+        if new_unions:
+            create_unions(Union, UnionChild, new_unions)
+
+
+def rebuild_unions():
+    """
+    Rebuild all unions from the Relations.
+
+    Returns:
+    - int: The number of created unions
+    """
+    with transaction.atomic():
+        Union.objects.all().delete()
+        relations = list(Relation.objects.only(*RELATION_LOAD_FIELDS))
+        through_models = [getattr(Relation, field_name).through for field_name in CHILDREN_FIELDS]
+        unions = collect_unions(relations, load_slot_children(through_models))
+        create_unions(Union, UnionChild, unions)
+    return len(unions)
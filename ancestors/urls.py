@@ -1,9 +1,21 @@
 from django.urls import path
-from .views import PersonListCreateView, PersonDetailView, RelationListCreateView, RelationDetailView
+from .views import DescendantsView, DuplicateCandidateDetailView, DuplicateCandidateListView, GedcomExportView, PedigreeView, PersonChildrenView, PersonListCreateView, PersonDetailView, PersonParentsView, PersonSearchView, PersonUnionsView, RelationListCreateView, RelationDetailView, RelationshipView, StatisticsView, TreeSnapshotView
 
 urlpatterns = [
     path('persons/', PersonListCreateView.as_view(), name='person-list-create'),
+    path('persons/search/', PersonSearchView.as_view(), name='person-search'),
     path('persons/<int:pk>/', PersonDetailView.as_view(), name='person-detail'),
+    path('persons/<int:pk>/pedigree/', PedigreeView.as_view(), name='person-pedigree'),
+    path('persons/<int:pk>/descendants/', DescendantsView.as_view(), name='person-descendants'),
+    path('persons/<int:pk>/parents/', PersonParentsView.as_view(), name='person-parents'),
+    path('persons/<int:pk>/children/', PersonChildrenView.as_view(), name='person-children'),
+    path('persons/<int:pk>/unions/', PersonUnionsView.as_view(), name='person-unions'),
     path('relations/', RelationListCreateView.as_view(), name='relation-list-create'),
     path('relations/<int:person_id>/', RelationDetailView.as_view(), name='relation-detail'),
+    path('relationship/', RelationshipView.as_view(), name='relationship'),
+    path('tree/', TreeSnapshotView.as_view(), name='tree-snapshot'),
+    path('statistics/', StatisticsView.as_view(), name='statistics'),
+    path('duplicates/', DuplicateCandidateListView.as_view(), name='duplicate-list'),
+    path('duplicates/<int:pk>/', DuplicateCandidateDetailView.as_view(), name='duplicate-detail'),
+    path('export/gedcom/', GedcomExportView.as_view(), name='gedcom-export'),
 ]
@@ -0,0 +1,38 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import TreeVersion
+
+
+def get_tree_version():
+    """
+    Return the current version of the family tree data.
+
+    The version is kept in the database (`TreeVersion`), so it is the same for all processes
+    and changes whenever a Person or Relation write is committed.
+
+    Returns:
+    - int: The current tree version
+    """
+    return TreeVersion.objects.filter(pk=TreeVersion.ID).values_list('version', flat=True).first() or 0
+
+
+def _increment_tree_version():
+    if TreeVersion.objects.filter(pk=TreeVersion.ID).update(version=F('version') + 1):
+        return
+    try:
+        with transaction.atomic():
+            TreeVersion.objects.create(pk=TreeVersion.ID, version=1)
+    except IntegrityError:
+        # Created concurrently
+        TreeVersion.objects.filter(pk=TreeVersion.ID).update(version=F('version') + 1)
+
+
+def bump_tree_version():
+    """
+    Mark all data derived from the family tree (graph index, snapshots, statistics) as stale.
+
+    The version is incremented after the surrounding transaction commits (immediately outside
+    of a transaction), so no process can cache a pre-commit state under the new version.
+    """
+    transaction.on_commit(_increment_tree_version)
@@ -1,9 +1,112 @@
-from rest_framework import generics
-from .models import Person, Relation
-from .serializers import PersonListSerializer, PersonSerializer, RelationSerializer
-from rest_framework.permissions import IsAuthenticated
+from django.shortcuts import get_object_or_404
+from rest_framework import generics, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .closure import expansion_annotations
+from .gedcom import GedcomExporter
+from .graph import GenealogyGraph, VisibleGenealogyGraph, get_genealogy_graph
+from .duplicates import MIN_SCORE as MIN_DUPLICATE_SCORE, detect_duplicates
+from .models import CONFIDENTIAL_VALUES, DuplicateCandidate, Person, Relation, Union, UnionChild
+from .dates import year_range
+from .pagination import DuplicateCandidateKeysetPagination, PersonBirthKeysetPagination, PersonDescendantsKeysetPagination, PersonKeysetPagination, RelationKeysetPagination
+from .search import phonetic_search_person_ids, search_person_ids
+from .relationship import describe_relationship, describe_step, find_path
+from .snapshot import get_snapshot_etag, get_tree_snapshot
+from .statistics import get_family_statistics
+from .serializers import DuplicateCandidateSerializer, PersonExpansionSerializer, PersonListSerializer, PersonNodeSerializer, PersonSerializer, RelationSerializer, UnionRelationSerializer, UnionSerializer, masked_person_values
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.decorators import permission_classes
-from django.db.models import Q
+from django.db.models import F, Prefetch, Q
+from django.utils import timezone
+from django.utils.http import parse_etags
+from django.http import StreamingHttpResponse
+from kempeUndCo_backend.constants import FAMILY_CHOICES
+
+
+MAX_CHART_GENERATIONS = 10
+DEFAULT_CHART_GENERATIONS = 4
+DEFAULT_SEARCH_LIMIT = 50
+MAX_SEARCH_LIMIT = 200
+SEARCH_MODES = {
+    'fulltext': search_person_ids,
+    'phonetic': phonetic_search_person_ids,
+}
+PERSON_ORDERINGS = {
+    'name': PersonKeysetPagination,
+    'birth': PersonBirthKeysetPagination,
+    'descendants': PersonDescendantsKeysetPagination,
+}
+# Query parameter -> (range column, first or last day of the year): the filters only match
+# persons whose date certainly lies on the given side of the year
+PERSON_DATE_FILTERS = {
+    'born_from': ('birt_earliest__gte', 0),
+    'born_to': ('birt_latest__lte', 1),
+    'died_from': ('deat_earliest__gte', 0),
+    'died_to': ('deat_latest__lte', 1),
+}
+
+
+def get_allowed_families(user):
+    """
+    Returns the set of family trees the given user is allowed to view.
+    """
+    allowed_families = set()
+
+    if user.family_1:
+        allowed_families.add(user.family_1.lower())
+    if user.family_2:
+        allowed_families.add(user.family_2.lower())
+
+    return allowed_families
+
+
+def get_date_filter(query_params):
+    """
+    Build the condition for the date filters of the person list.
+
+    `born_from`, `born_to`, `died_from` and `died_to` are years and match persons whose
+    birth or death day range lies completely after the start or before the end of the year.
+    `alive_in` matches persons who were certainly born by the end of the year and certainly
+    died after its start. All conditions are lookups on indexed day range columns.
+
+    Parameters:
+    - query_params: The query parameters of the request.
+
+    Returns:
+    - Q: The condition, or None if no date filter is given
+
+    Raises:
+    - ValueError: If a year is not a number between 1 and 9999
+    """
+    conditions = {}
+    for param, (lookup, bound) in PERSON_DATE_FILTERS.items():
+        if param in query_params:
+            conditions[lookup] = year_range(_parse_year(query_params[param], param))[bound]
+    if 'alive_in' in query_params:
+        first_day, last_day = year_range(_parse_year(query_params['alive_in'], 'alive_in'))
+        conditions['birt_latest__lte'] = min(last_day, conditions.get('birt_latest__lte', last_day))
+        conditions['deat_earliest__gte'] = max(first_day, conditions.get('deat_earliest__gte', first_day))
+    return Q(**conditions) if conditions else None
+
+
+def _parse_year(value, param):
+    try:
+        year = int(value)
+    except ValueError:
+        raise ValueError(f'{param} must be a year')
+    if not 1 <= year <= 9999:
+        raise ValueError(f'{param} must be a year')
+    return year
+
+
+def get_visible_persons(user):
+    """
+    Returns the queryset of persons belonging to the family trees that the given user is allowed to view.
+    """
+    allowed_families = get_allowed_families(user)
+    return Person.objects.filter(
+        Q(family_1__in=allowed_families) | Q(family_2__in=allowed_families)
+    )
 
 
 @permission_classes([IsAuthenticated])
@@ -14,9 +117,22 @@ class PersonListCreateView(generics.ListCreateAPIView):
     This view returns a list of persons filtered by the family affiliations
     that the authenticated user is allowed to view. Only persons belonging
     to the family trees that the user is permitted to access are displayed.
-    The user must be authenticated to access these resources.
+    The list is paginated with a keyset cursor ordered by surname, given name and id
+    (`?cursor=...&page_size=...`), with `?ordering=birth` by the earliest possible birth day or
+    with `?ordering=descendants` by the number of descendants (the largest branches first).
+    The list can be filtered by the years of birth and death (`?born_from=1800&born_to=1850`,
+    `died_from`, `died_to`) and by lifetime (`?alive_in=1850`); confidential persons are left
+    out as soon as a date filter is given. The user must be authenticated to access these resources.
     """
     serializer_class = PersonListSerializer
+    pagination_class = PersonKeysetPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            ordering = self.request.query_params.get('ordering', 'name')
+            self._paginator = PERSON_ORDERINGS.get(ordering, self.pagination_class)()
+        return self._paginator
 
     def get_queryset(self):
         """
@@ -31,10 +147,84 @@ class PersonListCreateView(generics.ListCreateAPIView):
         if user.family_2:
             allowed_families.add(user.family_2.lower())
 
-        # Filter relations based on the allowed family trees and the person_id
+        # Filter relations based on the allowed family trees; the filter has no joins, so the rows
+        # are distinct without a DISTINCT that would have to sort the whole list
         return Person.objects.filter(
             Q(family_1__in=allowed_families) | Q(family_2__in=allowed_families)
-        ).distinct()
+        )
+
+    def list(self, request, *args, **kwargs):
+        """
+        Returns one page of persons.
+
+        Only the serialized columns are selected and the confidentiality masking is done in SQL,
+        so the rows are serialized by the fast path of `PersonListSerializer`.
+
+        Returns:
+        - On success: One page of persons.
+        - On failure: An error message and a 400 status code if a year or the ordering is invalid.
+        """
+        if request.query_params.get('ordering', 'name') not in PERSON_ORDERINGS:
+            return Response({'error': 'ordering must be name, birth or descendants'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            date_filter = get_date_filter(request.query_params)
+        except ValueError as error:
+            return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if date_filter is not None:
+            queryset = queryset.filter(date_filter).exclude(confidential__in=CONFIDENTIAL_VALUES)
+        queryset = masked_person_values(queryset, PersonListSerializer.Meta.fields, extra_fields=self.paginator.fields)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+class PersonSearchView(APIView):
+    """
+    API view for the full-text search over persons.
+
+    Query parameters:
+    - q: The search words; every word is matched as a prefix in the names, places,
+      occupation, notes and sources of a person.
+    - limit: The maximum number of results (default 50, at most 200).
+    - mode: 'fulltext' (default) or 'phonetic' for a sounds-like search over the surname,
+      given name and married name (Kölner Phonetik, e.g. 'Kempe' also finds 'Kämpe').
+
+    The full-text search uses an SQLite FTS5 index ranked by BM25. Only persons of the family trees
+    the user is allowed to view are returned, confidential persons are not searchable and
+    restricted persons only by their name.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Returns the best matching persons, best matches first.
+
+        Returns:
+        - On success: The query and the list of persons serialized like the person list.
+        - On failure: An error message and a 400 status code if the query contains no words,
+          the limit is invalid or the mode is unknown.
+        """
+        query = request.query_params.get('q', '')
+        if not query.strip():
+            return Response({'error': 'q must not be empty'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_SEARCH_LIMIT))
+        except ValueError:
+            return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(max(limit, 1), MAX_SEARCH_LIMIT)
+        search = SEARCH_MODES.get(request.query_params.get('mode', 'fulltext'))
+        if search is None:
+            return Response({'error': 'mode must be fulltext or phonetic'}, status=status.HTTP_400_BAD_REQUEST)
+
+        person_ids = search(get_visible_persons(request.user), query, limit)
+        rows = masked_person_values(Person.objects.filter(id__in=person_ids), PersonListSerializer.Meta.fields)
+        rows_by_id = {row['id']: row for row in rows}
+        ranked_rows = [rows_by_id[person_id] for person_id in person_ids if person_id in rows_by_id]
+
+        serializer = PersonListSerializer(ranked_rows, many=True, context={'request': request})
+        return Response({'query': query, 'results': serializer.data})
 
 
 @permission_classes([IsAuthenticated])
@@ -67,6 +257,17 @@ class PersonDetailView(generics.RetrieveUpdateDestroyAPIView):
             Q(family_1__in=allowed_families) | Q(family_2__in=allowed_families)
         ).distinct()
 
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Returns a single person.
+
+        Only the serialized columns are selected and the confidentiality masking is done in SQL,
+        so the notes, sources and places of a confidential person are never loaded.
+        """
+        queryset = masked_person_values(self.get_queryset().filter(pk=kwargs['pk']), PersonSerializer.Meta.fields)
+        serializer = self.get_serializer(get_object_or_404(queryset))
+        return Response(serializer.data)
+
 
 @permission_classes([IsAuthenticated])
 class RelationListCreateView(generics.ListCreateAPIView):
@@ -75,9 +276,11 @@ class RelationListCreateView(generics.ListCreateAPIView):
 
     This view returns a list of relations between persons, filtered by the
     family affiliations that the authenticated user is allowed to view.
-    The user must be authenticated to access these resources.
+    The list is paginated with a keyset cursor ordered by person id
+    (`?cursor=...&page_size=...`). The user must be authenticated to access these resources.
     """
     serializer_class = RelationSerializer
+    pagination_class = RelationKeysetPagination
 
     def get_queryset(self):
         """
@@ -128,3 +331,389 @@ class RelationDetailView(generics.RetrieveUpdateDestroyAPIView):
             Q(person__family_1__in=allowed_families) | Q(person__family_2__in=allowed_families),
             person_id=self.kwargs['person_id']
         ).distinct()
+
+
+class PersonUnionsView(APIView):
+    """
+    API view returning the unions (marriages or partnerships with their children) of a person.
+
+    The unions are read from the normalized `Union` table with a fixed number of queries.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        """
+        Returns the unions of the person with the given id.
+
+        Query parameters:
+        - shape: 'relation' returns the unions in the shape of the Relation endpoint
+          (`fath_refn`, `moth_refn` and the four `marr_spou_refn_N`, `children_N`, ... slots).
+
+        Returns:
+        - On success: The list of unions, or the Relation-shaped data.
+        - On failure: A 404 status code if the person is not visible for the user.
+        """
+        children = Prefetch('children', queryset=Person.objects.only('id'))
+        person = get_visible_persons(request.user).filter(pk=pk).prefetch_related(
+            Prefetch('unions_as_a', queryset=Union.objects.prefetch_related(children)),
+            Prefetch('unions_as_b', queryset=Union.objects.prefetch_related(children)),
+            Prefetch('union_links', queryset=UnionChild.objects.select_related('union__partner_a', 'union__partner_b')),
+        ).only('id').first()
+        if person is None:
+            return Response({'error': 'Person not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        if request.query_params.get('shape') == 'relation':
+            return Response(UnionRelationSerializer(person).data)
+        unions = sorted(list(person.unions_as_a.all()) + list(person.unions_as_b.all()), key=lambda union: union.pk)
+        return Response(UnionSerializer(unions, many=True).data)
+
+
+class PersonChartView(APIView):
+    """
+    Base view for charts that are answered from the in-memory genealogy graph.
+
+    Subclasses set `walk` (the graph traversal returning person ids and their generation)
+    and `link_name`/`links` (the neighbours that are included for every person in the chart)
+    to methods of `GenealogyGraph`.
+    The whole chart is returned in one response, using one query for the persons on top of
+    the (cached) graph; only the node columns are read, masked in SQL (`masked_person_values`).
+    """
+    permission_classes = [IsAuthenticated]
+    link_name = None
+    walk = None
+    links = None
+
+    def get(self, request, pk):
+        """
+        Returns the chart for the person with the given id.
+
+        Query parameters:
+        - generations: The number of generations to include (default 4, maximum 10).
+
+        Returns:
+        - On success: The root id, the number of generations and the list of persons
+          (with their generation and the links to the other persons in the chart).
+        - On failure: An error message and a 400 status code for an invalid `generations`
+          value, or a 404 status code if the person is not visible for the user.
+        """
+        try:
+            generations = int(request.query_params.get('generations', DEFAULT_CHART_GENERATIONS))
+        except ValueError:
+            return Response({'error': 'generations must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= generations <= MAX_CHART_GENERATIONS:
+            return Response(
+                {'error': f'generations must be between 1 and {MAX_CHART_GENERATIONS}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        visible_persons = get_visible_persons(request.user)
+        if not visible_persons.filter(pk=pk).exists():
+            return Response({'error': 'Person not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        graph = get_genealogy_graph()
+        depths = self.walk(graph, pk, generations)
+        persons = masked_person_values(visible_persons.filter(id__in=depths.keys()).order_by('id'), PersonNodeSerializer.Meta.fields)
+        included = {person['id'] for person in persons}
+
+        nodes = []
+        for person in persons:
+            node = PersonNodeSerializer(person).data
+            node['generation'] = depths[person['id']]
+            node[self.link_name] = [linked for linked in self.links(graph, person['id']) if linked in included]
+            nodes.append(node)
+        nodes.sort(key=lambda node: (node['generation'], node['id']))
+
+        return Response({'root': pk, 'generations': generations, 'persons': nodes})
+
+
+class PedigreeView(PersonChartView):
+    """
+    API view returning the ancestors of a person (pedigree chart) up to `generations` generations.
+    """
+    link_name = 'parents'
+    walk = staticmethod(GenealogyGraph.ancestors)
+    links = staticmethod(GenealogyGraph.parents)
+
+
+class DescendantsView(PersonChartView):
+    """
+    API view returning the descendants of a person up to `generations` generations.
+    """
+    link_name = 'children'
+    walk = staticmethod(GenealogyGraph.descendants)
+    links = staticmethod(GenealogyGraph.children)
+
+
+class PersonNeighboursView(APIView):
+    """
+    Base view for expanding one node of an interactive tree: returns the parents or children
+    of a person.
+
+    Subclasses set `link_name`, `closure_link` (the closure rows linking a neighbour to the
+    person: their related name and the column of the person) and `ordering`. Every
+    neighbour carries the flags `has_parents`/`has_children`, which are computed from the
+    closure table in the same query, and the stored `descendant_count`, so a node costs one
+    request and two queries (the visibility check and the neighbours) regardless of the size
+    of the tree.
+    """
+    permission_classes = [IsAuthenticated]
+    link_name = None
+    closure_link = None
+    ordering = ()
+
+    def get(self, request, pk):
+        """
+        Returns the parents or children of the person with the given id.
+
+        Returns:
+        - On success: The person id and the list of neighbours (the fields of a chart node
+          plus `has_parents`, `has_children` and `descendant_count`).
+        - On failure: An error message and a 404 status code if the person is not visible for the user.
+        """
+        visible_persons = get_visible_persons(request.user)
+        if not visible_persons.filter(pk=pk).exists():
+            return Response({'error': 'Person not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        related_name, person_column = self.closure_link
+        neighbours = visible_persons.filter(
+            **{f'{related_name}__{person_column}': pk, f'{related_name}__depth': 1}
+        ).order_by(*self.ordering).only(*PersonNodeSerializer.Meta.fields).annotate(
+            **expansion_annotations(visible_persons)
+        )
+        return Response({'person': pk, self.link_name: PersonExpansionSerializer(neighbours, many=True).data})
+
+
+class PersonParentsView(PersonNeighboursView):
+    """
+    API view returning the visible parents of a person, the father first.
+    """
+    link_name = 'parents'
+    closure_link = ('descendant_links', 'descendant_id')
+    ordering = ('-sex', 'id')
+
+
+class PersonChildrenView(PersonNeighboursView):
+    """
+    API view returning the visible children of a person, ordered by birth.
+    """
+    link_name = 'children'
+    closure_link = ('ancestor_links', 'ancestor_id')
+    ordering = (F('birt_earliest').asc(nulls_last=True), 'id')
+
+
+class RelationshipView(APIView):
+    """
+    API view that calculates the relationship between two persons.
+
+    Query parameters:
+    - a: The id of the first person.
+    - b: The id of the second person.
+
+    The shortest path over parent, child and spouse links is found with a bidirectional
+    search on the in-memory genealogy graph, and the most recent common ancestors are used
+    to label what person b is to person a (e.g. "Cousine 2. Grades"). The search only passes
+    through the family trees the user is allowed to see; confidential persons on the path are masked.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Returns the relationship between the persons `a` and `b`.
+
+        Returns:
+        - On success: The label, the common ancestors, the generations from a and b up to them
+          and the path between both persons.
+        - On failure: An error message and a 400 status code for missing or invalid ids,
+          or a 404 status code if one of the persons is not visible for the user.
+        """
+        try:
+            person_a_id = int(request.query_params['a'])
+            person_b_id = int(request.query_params['b'])
+        except (KeyError, ValueError):
+            return Response({'error': 'a and b must be person ids'}, status=status.HTTP_400_BAD_REQUEST)
+
+        visible_persons = get_visible_persons(request.user)
+        endpoints = {person.id: person for person in visible_persons.filter(id__in=[person_a_id, person_b_id])}
+        if person_a_id not in endpoints or person_b_id not in endpoints:
+            return Response({'error': 'Person not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        person_b = endpoints[person_b_id]
+        sex_b = 'D' if person_b.confidential in CONFIDENTIAL_VALUES else person_b.sex
+
+        graph = VisibleGenealogyGraph(get_genealogy_graph(), set(visible_persons.values_list('id', flat=True)))
+        relationship = describe_relationship(graph, person_a_id, person_b_id, sex_b)
+        path = find_path(graph, person_a_id, person_b_id) or []
+
+        involved_ids = set(path) | set(relationship['common_ancestors'])
+        nodes = {person.id: PersonNodeSerializer(person).data for person in visible_persons.filter(id__in=involved_ids)}
+
+        steps = []
+        for position, person_id in enumerate(path):
+            step = dict(nodes[person_id])
+            step['step'] = describe_step(graph, path[position - 1], person_id) if position else None
+            steps.append(step)
+
+        return Response({
+            'a': person_a_id,
+            'b': person_b_id,
+            'label': relationship['label'],
+            'generations': relationship['generations'],
+            'common_ancestors': [nodes[person_id] for person_id in relationship['common_ancestors']],
+            'path': steps,
+        })
+
+
+class TreeSnapshotView(APIView):
+    """
+    API view returning a whole family tree in one compact, cacheable response.
+
+    Query parameters:
+    - family: Restrict the snapshot to one of the user's family trees (optional,
+      default: all family trees the user is allowed to view).
+
+    The snapshot contains columnar node arrays (id, name, sex, birth and death year) and
+    typed edge arrays for parent and spouse links. It is built once per family tree and
+    tree version and carries an ETag, so clients can reload it with a conditional request
+    (`If-None-Match`) that is answered with 304 Not Modified until a Person or Relation changes.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Returns the snapshot of the requested family trees.
+
+        Returns:
+        - On success: The snapshot with a 200 status code, or an empty 304 response if the
+          client already has the current version.
+        - On failure: An error message and a 404 status code if the family tree is not
+          visible for the user.
+        """
+        families = get_allowed_families(request.user)
+        family = request.query_params.get('family')
+        if family:
+            if family.lower() not in families:
+                return Response({'error': 'Family tree not found'}, status=status.HTTP_404_NOT_FOUND)
+            families = {family.lower()}
+
+        etag = get_snapshot_etag(families)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            etag, snapshot = get_tree_snapshot(families)
+            response = Response(snapshot)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class StatisticsView(APIView):
+    """
+    API view returning statistics of the family trees the user is allowed to view.
+
+    Query parameters:
+    - family: Restrict the statistics to one of the user's family trees (optional,
+      default: all family trees the user is allowed to view).
+
+    Per family tree the response contains the number of persons, births and deaths per decade,
+    the lifespan distribution, the most common surnames, birth and death places and the number
+    of persons per generation. The statistics are computed with aggregates over the structured
+    dates and cached per family tree and tree version. Confidential persons only count in the
+    number of persons.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Returns the statistics per family tree.
+
+        Returns:
+        - On success: A dictionary with the statistics per family tree.
+        - On failure: An error message and a 404 status code if the family tree is not
+          visible for the user.
+        """
+        families = get_allowed_families(request.user)
+        family = request.query_params.get('family')
+        if family:
+            if family.lower() not in families:
+                return Response({'error': 'Family tree not found'}, status=status.HTTP_404_NOT_FOUND)
+            families = {family.lower()}
+        return Response({family: get_family_statistics(family) for family in sorted(families)})
+
+
+class DuplicateCandidateListView(generics.ListAPIView):
+    """
+    API view for the review of probable duplicate persons (staff only).
+
+    GET lists the stored candidates, best matches first, with a keyset cursor
+    (`?status=open|confirmed|rejected`, default open). POST runs the detection again
+    (`min_score` between 0 and 1, optional) and returns the numbers of found, new and
+    removed candidates.
+    """
+    serializer_class = DuplicateCandidateSerializer
+    pagination_class = DuplicateCandidateKeysetPagination
+    permission_classes = [IsAdminUser]
+
+    def get_queryset(self):
+        status_filter = self.request.query_params.get('status', DuplicateCandidate.OPEN)
+        return DuplicateCandidate.objects.filter(status=status_filter).select_related('person_a', 'person_b')
+
+    def post(self, request):
+        """
+        Runs the duplicate detection over all persons.
+
+        Returns:
+        - On success: The numbers of found, new and removed candidates.
+        - On failure: An error message and a 400 status code if min_score is invalid.
+        """
+        try:
+            min_score = float(request.data.get('min_score', MIN_DUPLICATE_SCORE))
+        except (TypeError, ValueError):
+            min_score = -1
+        if not 0 <= min_score <= 1:
+            return Response({'error': 'min_score must be a number between 0 and 1'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(detect_duplicates(min_score))
+
+
+class DuplicateCandidateDetailView(generics.RetrieveUpdateAPIView):
+    """
+    API view to retrieve a duplicate candidate and record the review (staff only).
+
+    Only the status can be changed ('confirmed' or 'rejected', or back to 'open');
+    the reviewing user and the time are stored with it.
+    """
+    serializer_class = DuplicateCandidateSerializer
+    permission_classes = [IsAdminUser]
+    queryset = DuplicateCandidate.objects.select_related('person_a', 'person_b')
+
+    def perform_update(self, serializer):
+        serializer.save(reviewed_date=timezone.now(), reviewed_by=self.request.user)
+
+
+class GedcomExportView(APIView):
+    """
+    API view that exports a family tree as a GEDCOM 5.5.1 file (staff only).
+
+    Query parameters:
+    - family: The family tree to export.
+
+    The file is generated while it is sent (`StreamingHttpResponse`), so the memory use does
+    not grow with the size of the tree. All data is exported unmasked, including confidential
+    persons, so the file can be loaded back into Ahnenblatt without losses.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        """
+        Returns the GEDCOM file of the family tree as a download.
+
+        Returns:
+        - On success: The streamed GEDCOM file.
+        - On failure: An error message and a 400 status code for an unknown family tree.
+        """
+        family = request.query_params.get('family')
+        if family not in dict(FAMILY_CHOICES):
+            return Response({'error': 'Unknown family'}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(GedcomExporter(family), content_type='text/plain; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{family}.ged"'
+        return response
@@ -6,20 +6,22 @@ from django.db.models import Q
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'kempeUndCo_backend.settings')
 django.setup()
 
-from ancestors.models import Person, Relation
+from ancestors.models import Person, PersonDetail, Relation
 
 
 def migrate_children_to_related_data():
-    persons = Person.objects.all()
+    persons = Person.objects.select_related('detail')
     updated_count = 0
 
     for person in persons:
         related_data, created = Relation.objects.get_or_create(person=person)
         updated = False
+        # The legacy refn columns are kept in PersonDetail
+        detail = getattr(person, 'detail', None) or PersonDetail(person=person)
 
         # Kinder aus Ehe 1
         children_1 = Person.objects.filter(
-            (Q(fath_refn=person.refn) & Q(moth_refn=person.marr_spou_refn_1)) | (Q(fath_refn=person.marr_spou_refn_1) & Q(moth_refn=person.refn))
+            (Q(detail__fath_refn=person.refn) & Q(detail__moth_refn=detail.marr_spou_refn_1)) | (Q(detail__fath_refn=detail.marr_spou_refn_1) & Q(detail__moth_refn=person.refn))
         )
         if children_1.exists():
             related_data.children_1.set(children_1)
@@ -27,7 +29,7 @@ def migrate_children_to_related_data():
 
         # Kinder aus Ehe 2
         children_2 = Person.objects.filter(
-            (Q(fath_refn=person.refn) & Q(moth_refn=person.marr_spou_refn_2)) | (Q(fath_refn=person.marr_spou_refn_2) & Q(moth_refn=person.refn))
+            (Q(detail__fath_refn=person.refn) & Q(detail__moth_refn=detail.marr_spou_refn_2)) | (Q(detail__fath_refn=detail.marr_spou_refn_2) & Q(detail__moth_refn=person.refn))
         )
         if children_2.exists():
             related_data.children_2.set(children_2)
@@ -35,7 +37,7 @@ def migrate_children_to_related_data():
 
         # Kinder aus Ehe 3
         children_3 = Person.objects.filter(
-            (Q(fath_refn=person.refn) & Q(moth_refn=person.marr_spou_refn_3)) | (Q(fath_refn=person.marr_spou_refn_3) & Q(moth_refn=person.refn))
+            (Q(detail__fath_refn=person.refn) & Q(detail__moth_refn=detail.marr_spou_refn_3)) | (Q(detail__fath_refn=detail.marr_spou_refn_3) & Q(detail__moth_refn=person.refn))
         )
         if children_3.exists():
             related_data.children_3.set(children_3)
@@ -43,7 +45,7 @@ def migrate_children_to_related_data():
 
         # Kinder aus Ehe 4
         children_4 = Person.objects.filter(
-            (Q(fath_refn=person.refn) & Q(moth_refn=person.marr_spou_refn_4)) | (Q(fath_refn=person.marr_spou_refn_4) & Q(moth_refn=person.refn))
+            (Q(detail__fath_refn=person.refn) & Q(detail__moth_refn=detail.marr_spou_refn_4)) | (Q(detail__fath_refn=detail.marr_spou_refn_4) & Q(detail__moth_refn=person.refn))
         )
         if children_4.exists():
             related_data.children_4.set(children_4)
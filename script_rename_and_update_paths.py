@@ -7,11 +7,11 @@ from django.core.files.storage import default_storage
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'kempeUndCo_backend.settings')
 django.setup()
 
-from ancestors.models import Person
+from ancestors.models import PersonDetail
 
 
 def rename_and_update_paths():
-    for person in Person.objects.all():
+    for person in PersonDetail.objects.all():
         for i in range(1, 7):
             field_name = f'obje_file_{i}'
             file_field = getattr(person, field_name)
@@ -19,7 +19,7 @@ def rename_and_update_paths():
             if file_field and file_field.name:
                 old_path = file_field.path
                 # Neuer Name basierend auf der ID und dem Feldindex
-                new_filename = f"{person.id}_image{i}{os.path.splitext(old_path)[1]}"
+                new_filename = f"{person.pk}_image{i}{os.path.splitext(old_path)[1]}"
                 new_path = os.path.join('images/', new_filename)
 
                 # Pfad innerhalb des MEDIA_ROOT anpassen
@@ -7,6 +7,7 @@ from datetime import datetime
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'kempeUndCo_backend.settings')
 django.setup()
 
+from ancestors.maintenance import bulk_maintenance
 from ancestors.models import Person
 
 
@@ -27,14 +28,15 @@ def is_recent_birth_date(birth_date):
 
 def set_confidentiality():
     persons = Person.objects.all()
-    for person in persons:
-        birth_date = person.birt_date
-        death_date = person.deat_date
-
-        if birth_date and is_valid_date(birth_date) and is_recent_birth_date(birth_date) and not death_date:
-            person.confidential = 'restricted'
-            person.save()
-            print(f"Confidentiality for {person.givn} {person.surn} set to restricted")
+    with bulk_maintenance():
+        for person in persons:
+            birth_date = person.birt_date
+            death_date = person.deat_date
+
+            if birth_date and is_valid_date(birth_date) and is_recent_birth_date(birth_date) and not death_date:
+                person.confidential = 'restricted'
+                person.save()
+                print(f"Confidentiality for {person.givn} {person.surn} set to restricted")
 
 
 if __name__ == "__main__":
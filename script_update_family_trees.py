@@ -5,6 +5,7 @@ import django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'kempeUndCo_backend.settings')
 django.setup()
 
+from ancestors.maintenance import bulk_maintenance
 from ancestors.models import Person
 
 
@@ -12,11 +13,12 @@ def update_family_trees():
     # Setzt family_1 auf 'kempe' für alle Datensätze
     persons = Person.objects.all()
     updated_count = 0
-    for person in persons:
-        if person.family_1 != 'kempe':
-            person.family_1 = 'kempe'
-            person.save()
-            updated_count += 1
+    with bulk_maintenance():
+        for person in persons:
+            if person.family_1 != 'kempe':
+                person.family_1 = 'kempe'
+                person.save()
+                updated_count += 1
     print(f"Updated {updated_count} records to family_1='kempe'.")
 
 